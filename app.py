@@ -1,134 +1,38 @@
-
-import google_ai_studio
-import crawler
-import store
-import unsplash
-
+from collections import deque
 from urllib.parse import urlparse
-import json
+from datetime import datetime
 import os
 import random
-import cms_client
 
 import argparse
 
+import metrics
+from lazy import lazy_import
 
+# Loaded on first use, so runs that exit early don't pay for them
+google_ai_studio = lazy_import('google_ai_studio')
+crawler = lazy_import('crawler')
+store = lazy_import('store')
+unsplash = lazy_import('unsplash')
+search_cache = lazy_import('search_cache')
+image_pool = lazy_import('image_pool')
+downloads = lazy_import('downloads')
+feature_image = lazy_import('feature_image')
+outbox = lazy_import('outbox')
+profiling = lazy_import('profiling')
+targets = lazy_import('targets')
+health = lazy_import('health')
+archive = lazy_import('archive')
+politeness = lazy_import('politeness')
+listings = lazy_import('listings')
+shards = lazy_import('shards')
+parsing = lazy_import('parsing')
+cms_client = lazy_import('cms_client')
 
-def parse_arguments():
-    parser = argparse.ArgumentParser(description='Web crawler application')
-    
-    parser.add_argument('--unsplash-access-key', type=str, help='Unsplash API access key')
-    parser.add_argument('--google-ai-api-key', type=str, help='Google AI Studio API key')
-    
-    parser.add_argument('--cms-admin-api-key', type=str, help='Ghost CMS admin API key')
-    parser.add_argument('--cms-url', type=str, default='', help='Ghost CMS URL')
-    
-    return parser.parse_args()
 
 
 
-
-if __name__ == "__main__":
-    
-    
-    args = parse_arguments()
-
-    key_unsplash_access = args.unsplash_access_key if args.unsplash_access_key else ""
-    key_google_ai = args.google_ai_api_key if args.google_ai_api_key else ""
-    key_cms_admin_api = args.cms_admin_api_key if args.cms_admin_api_key else ""
-    key_cms_url = args.cms_url if args.cms_url else ""
-    
-    # Check if any required keys are missing
-    if not key_unsplash_access or not key_google_ai or not key_cms_admin_api or not key_cms_url:
-        print("Error: Missing required API keys (Need to fill out the arguments)")
-        print(f"Unsplash access key: {'Set' if key_unsplash_access else 'Missing'}")
-        print(f"Google AI API key: {'Set' if key_google_ai else 'Missing'}")
-        print(f"CMS admin API key: {'Set' if key_cms_admin_api else 'Missing'}")
-        print(f"CMS URL: {'Set' if key_cms_url else 'Missing'}")
-        exit()
-    
-    
-    
-    
-    image = unsplash.UnsplashAPI(access_key=key_unsplash_access)
-    s3 = store.URLDatabase()
-    craw = crawler.WebCrawler()
-    ai = google_ai_studio.GeminiClient(api_key=key_google_ai)
-    
-    
-    
-    
-    # Read the target URLs from the JSON file
-    try:
-        json_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'targeturl_base.json')
-        with open(json_path, 'r', encoding='utf-8') as f:
-            target_urls = json.load(f)
-        print(f"Successfully loaded {len(target_urls)} target URLs")
-    except Exception as e:
-        print(f"Error loading target URLs: {e}")
-        target_urls = []
-        
-
-    ghost_client = cms_client.GhostCmsClient(
-        url=key_cms_url,
-        admin_api_key=key_cms_admin_api
-    )
-    
-        
-        
-    # Randomly select 2 URLs from the target list if there are more than 2
-    if len(target_urls) > 2:
-        target_urls = random.sample(target_urls, 2)
-        print(f"Randomly selected {len(target_urls)} URLs for processing")
-    else:
-        print(f"Using all {len(target_urls)} available URLs as the list is small")
-        
-        
-    for buff in target_urls:
-
-        DATA_URI = buff['url']
-        DATA_LIST_PATTERN = buff['list_pattern']
-        DATA_PATTERN = buff['pattern']
-        html_mother = craw.extract_links(url=DATA_URI, css_selectors=DATA_LIST_PATTERN)
-        
-        if not html_mother:
-            print(f"No links found for {DATA_URI}")
-            continue
-        
-        random_link = random.choice(html_mother)
-        parsed_url = urlparse(random_link)
-        
-        if not parsed_url.scheme:
-            base_url = urlparse(DATA_URI)
-            domain = f"{base_url.scheme}://{base_url.netloc}"
-        else:
-            domain = f"{parsed_url.scheme}://{parsed_url.netloc}"
-            
-        path = parsed_url.path
-        
-        if parsed_url.query:
-            path = path + '?' + parsed_url.query
-            
-        if path and not path.startswith('/'):
-            path = '/' + path
-        
-        check_uri = s3.read_by_domain_and_path(domain=domain, uripath=path)
-        
-
-        
-        if check_uri:
-            print(f"Already crawled ({domain}{path})")
-            continue
-        else:
-            print(f"Not crawled yet ({domain}{path})")
-            s3.create(domain=domain, uripath=path)
-        
-        
-        html = craw.get_page_content(url=f'{domain}{path}')
-        
-        
-        post_title = ai.extract_content_from_html(
-                custom_prompt="""
+PROMPT_TITLE = """
 -Translate to Korean.
 -Create a short, clickbait title based on the article.
 -Title should be 20-30 characters.
@@ -137,17 +41,9 @@ if __name__ == "__main__":
 -Return only the title text.
 -Do not include sources.
 -Keep company names and special terms in their original form.
-                """,
-                html_content=html, 
-                selector_map=DATA_PATTERN,
-            )
-        
-
+                """
 
-        
-        
-        post_content = ai.extract_content_from_html(
-                custom_prompt="""
+PROMPT_CONTENT = """
 Summarize the given text and write it in HTML format in Korean.
     -Use <h1~6> for section titles.
     -Use <ul>, <li> for lists and key points.
@@ -169,13 +65,9 @@ Summarize the given text and write it in HTML format in Korean.
     -Do not include sources.
     -Keep company names and product names as is.
     -Write the output in Korean.
-                """,
-                html_content=html, 
-                selector_map=DATA_PATTERN
-            )
-        
-        post_keyword = ai.extract_content_from_html(
-                custom_prompt="""
+                """
+
+PROMPT_KEYWORD = """
 Read the text.
 Choose relevant keywords from the options below.
 The keywords will be used to search images in the Unsplash API.
@@ -183,29 +75,960 @@ Make sure the keywords are short, clear, and specific.
 Avoid using general or cliché terms.
 Use only English.
 Return keywords in a simple comma-separated list (e.g., Electric scooter, Micromobility, Sharing service).
-                """,
-                html_content=html, 
-                selector_map=DATA_PATTERN
-            )
+                """
+
+PROMPTS = {
+    "title": PROMPT_TITLE,
+    "content": PROMPT_CONTENT,
+    "keyword": PROMPT_KEYWORD,
+}
+
+POST_TAGS = [
+    {"name": "News"},
+    {"name": "posts"},
+    {"name": "AI-generated"},
+    {"name": "crawled"},
+]
+
+
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Web crawler application')
+
+    parser.add_argument('--unsplash-access-key', type=str, help='Unsplash API access key')
+    parser.add_argument('--google-ai-api-key', type=str, help='Google AI Studio API key')
+
+    parser.add_argument('--cms-admin-api-key', type=str, help='Ghost CMS admin API key')
+    parser.add_argument('--cms-url', type=str, default='', help='Ghost CMS URL')
+
+    parser.add_argument('--batch', action='store_true', help='Collect every new article of every target and generate them through the Gemini batch API')
+    parser.add_argument('--batch-job', type=str, default='', help='Batch job file (JSONL). Pass an existing file to resume a submitted batch')
+    parser.add_argument('--batch-poll-interval', type=float, default=30, help='Seconds between batch status checks')
+    parser.add_argument('--batch-timeout', type=float, default=6 * 3600, help='Seconds to wait for a batch before releasing its articles to later runs (the job can still be resumed with --batch-job)')
+
+    parser.add_argument('--refresh', nargs='+', metavar='URL', default=[], help='Re-check these published article URLs and update the posts whose source changed')
+
+    parser.add_argument('--crawl-rate', type=float, default=1.0, help='Requests per second per crawled host (robots.txt Crawl-delay can lower it)')
+
+    parser.add_argument('--archive', type=str, default='', metavar='DIR', help='Archive every fetched page (compressed, indexed by URL) in this directory')
+    parser.add_argument('--replay', action='store_true', help='Serve pages from --archive instead of fetching them, and reprocess every archived article (or only the --refresh URLs)')
+
+    parser.add_argument('--shard', type=str, default='', metavar='I/N', help='Run as shard I (0-based) of N: crawl only the targets whose host hashes to this shard')
+    parser.add_argument('--state-dir', type=str, default=None, help='Directory of the crawl state files (default: current directory, or shard-I-of-N with --shard)')
+
+    parser.add_argument('--parse-workers', type=int, default=None, help='Processes parsing fetched pages (default: one per CPU with --batch or --replay, 0 = parse in this process otherwise)')
+
+    parser.add_argument('--publish-workers', type=int, default=4, help='Number of concurrent Ghost publishers')
+    parser.add_argument('--publish-timeout', type=float, default=120, help='Seconds to keep retrying queued posts before leaving them for the next run')
+
+    parser.add_argument('--metrics-file', type=str, default='', help='Write per-stage metrics of the run to this file (Prometheus textfile for .prom, JSON summary otherwise)')
+
+    parser.add_argument('--profile', action='store_true', help='Profile the run per stage: sampled stacks (flamegraph folded format) and allocation peaks')
+    parser.add_argument('--profile-dir', type=str, default='profiles', help='Directory receiving one profile directory per run')
+    parser.add_argument('--profile-no-memory', action='store_true', help='Skip allocation tracking, which slows the run down')
+
+    return parser.parse_args()
+
+
+def report_invalid_targets(problems):
+    if problems:
+        print(f"Skipping invalid targets in {targets.DEFAULT_PATH}:\n" + "\n".join(f"  - {problem}" for problem in problems))
+
+
+def load_target_urls(compile=True):
+    """
+    Load targeturl_base.json with its selectors validated and pre-compiled.
+
+    Every invalid entry or selector is reported here, at load time, and
+    only the targets with problems are left out. If the file as a whole
+    is unusable, the run continues without targets, returning an empty list.
+
+    Args:
+        compile (bool): False to leave the selectors as strings, for runs
+            that may end before parsing; see compile_target_urls
+    """
+    problems = []
+    try:
+        target_urls = targets.load_targets(problems=problems, compile=compile)
+    except targets.TargetConfigError as e:
+        print(f"Error loading target URLs: {e}")
+        return []
+    report_invalid_targets(problems)
+    print(f"Successfully loaded {len(target_urls)} target URLs")
+    return target_urls
+
+
+def compile_target_urls(target_urls):
+    """
+    Compile the selectors of targets from load_target_urls(compile=False).
+
+    Compiling loads soupsieve and bs4, so main() only does it once it
+    knows there is something to parse. Targets with an invalid selector
+    are reported and left out.
+    """
+    problems = []
+    target_urls = targets.compile_selectors(target_urls, problems=problems)
+    report_invalid_targets(problems)
+    return target_urls
+
+
+def resolve_link(list_url, link):
+    """
+    Split a link found on a listing page into the (domain, path) pair stored in the URL database.
+
+    Args:
+        list_url (str): URL of the listing page the link was found on
+        link (str): The href value, absolute or relative
+
+    Returns:
+        tuple: (domain, path), e.g. ("https://example.com", "/news/1?page=2")
+    """
+    parsed_url = urlparse(link)
+
+    if not parsed_url.scheme:
+        base_url = urlparse(list_url)
+        domain = f"{base_url.scheme}://{base_url.netloc}"
+    else:
+        domain = f"{parsed_url.scheme}://{parsed_url.netloc}"
+
+    path = parsed_url.path
+
+    if parsed_url.query:
+        path = path + '?' + parsed_url.query
+
+    if path and not path.startswith('/'):
+        path = '/' + path
+
+    return domain, path
+
+
+def archived_article_urls(target_urls, page_archive):
+    """
+    List the archived article pages of the given targets.
+
+    Every archived URL on a target's host except the listing pages
+    themselves counts as an article.
+
+    Args:
+        target_urls (list): Target definitions
+        page_archive (archive.PageArchive): Archive to look in
+
+    Returns:
+        list: Article URLs, without duplicates
+    """
+    listing_urls = {buff['url'] for buff in target_urls}
+    hosts = dict.fromkeys(urlparse(buff['url']).netloc for buff in target_urls)
+    return [
+        url
+        for host in hosts
+        for url in page_archive.urls(host)
+        if url not in listing_urls
+    ]
+
+
+def fetch_listing(craw, target):
+    """
+    Fetch the document a target's new links are discovered from.
+
+    Targets with a "feed_url" or "sitemap_url" are read from the feed,
+    which is a fraction of the listing page's size and is parsed without
+    bs4. Scraping the listing page with "list_pattern" is the fallback
+    when there is no feed or it yields no links.
+
+    Args:
+        craw (crawler.WebCrawler): Fetches the feed or listing page
+        target (dict): Target definition
+
+    Returns:
+        tuple: (page, links). For a feed, page is its links one per line and
+        links is the list of links, newest first; for a listing page, page
+        is its HTML and links is None, as list_pattern remains to be applied
+    """
+    for key in ('feed_url', 'sitemap_url'):
+        if target.get(key):
+            links = craw.feed_links(target[key])
+            if links:
+                return "\n".join(links), links
+            print(f"No links in {target[key]}, falling back to the listing page")
+    return craw.get_page_content(url=target['url']), None
+
+
+def fetch_new_listings(craw, target_urls, listing_state, target_health=None):
+    """
+    Fetch the listings of the targets and keep those that may have new links.
+
+    A listing (page or feed) that is unchanged since a run found all of its
+    links already crawled is dropped without being parsed. Listings that
+    failed to fetch are kept, so the pipeline records the failure in the
+    target's health.
+
+    Args:
+        craw (crawler.WebCrawler): Fetches the listings
+        target_urls (list): Target definitions
+        listing_state (listings.ListingState): Listings seen before
+        target_health (health.TargetHealth, optional): Quarantined targets are not fetched
+
+    Returns:
+        dict: ctr -> (page, links) as returned by fetch_listing
+    """
+    listing_pages = {}
+    for buff in target_urls:
+        if target_health is not None and not target_health.is_available(buff['ctr']):
+            print(f"Skipping quarantined target {buff['ctr']} ({buff['url']})")
+            continue
+        listing = fetch_listing(craw, buff)
+        if listing_state.is_exhausted(buff['ctr'], listing[0]):
+            print(f"No new links on {buff['url']}")
+            continue
+        listing_pages[buff['ctr']] = listing
+    return listing_pages
+
+
+def has_unpublished(posts):
+    """Return True if the outbox holds posts waiting to be published."""
+    counts = posts.counts()
+    return bool(counts.get(posts.PENDING) or counts.get(posts.PUBLISHING))
+
+
+def group_batch_results(results):
+    """
+    Regroup "<url id>:<field>" batch results into one dict per article.
+
+    Returns:
+        dict: Mapping of url id to {field: text}
+    """
+    articles = {}
+    for key, text in results.items():
+        url_id, _, field = key.partition(":")
+        articles.setdefault(int(url_id), {})[field] = text.strip()
+    return articles
+
+
+def batch_url_ids(batch):
+    """Return the url ids of the articles queued in a batch job, in order."""
+    return sorted({int(line["key"].partition(":")[0]) for line in batch.requests()})
+
+
+class Pipeline:
+    """Crawl -> generate -> image -> publish, wired to the clients and stores of one run."""
+
+    def __init__(self, s3, craw, ai, image, ghost_client, pool=None, feature_images=None, outbox=None, health=None,
+                 listings=None, frontier=None, snapshots=None, parser=None):
+        """
+        Args:
+            s3 (store.URLDatabase): Already crawled URLs
+            craw (crawler.WebCrawler): Fetches listing and article pages
+            ai (google_ai_studio.GeminiClient): Generates title, content and keywords
+            image (unsplash.UnsplashAPI): Feature image search
+            ghost_client (cms_client.GhostCmsClient): Publishing target
+            pool (image_pool.ImagePool, optional): Pre-warmed images served before searching
+            feature_images (feature_image.FeatureImageStage, optional): Re-hosts images on Ghost
+            outbox (outbox.Outbox, optional): Durable queue posts go through instead of direct creation
+            health (health.TargetHealth, optional): Records target health and skips quarantined targets
+            listings (listings.ListingState, optional): Remembers listing pages with no uncrawled links left
+            frontier (store.Frontier, optional): Queue of discovered links; needs snapshots
+            snapshots (listings.LinkSnapshots, optional): Each target's previous link set, so only new links are queued
+            parser (parsing.ParserPool, optional): Worker processes pages are parsed in, instead of this process
+        """
+        self.s3 = s3
+        self.craw = craw
+        self.ai = ai
+        self.image = image
+        self.ghost_client = ghost_client
+        self.pool = pool
+        self.feature_images = feature_images
+        self.outbox = outbox
+        self.health = health
+        self.listings = listings
+        self.frontier = frontier
+        self.snapshots = snapshots
+        self.parser = parser
+
+    def target_available(self, target):
+        """Return False (and say so) if the target is quarantined."""
+        if self.health is not None and not self.health.is_available(target['ctr']):
+            print(f"Skipping quarantined target {target['ctr']} ({target['url']})")
+            return False
+        return True
+
+    def find_links(self, target, listing=None):
+        """
+        Return a target's links from its feed or listing page, recording the outcome in the target's health.
+
+        Args:
+            target (dict): Target definition
+            listing (tuple, optional): (page, links) from fetch_listing, if already fetched
+        """
+        page, links = listing if listing is not None else fetch_listing(self.craw, target)
+        if links is None and page and self.parser is not None:
+            with metrics.timer("parse_links", host=metrics.host(target['url'])):
+                links = self.parser.listing_links(target['ctr'], page).result()
+        elif links is None:
+            links = self.craw.links_from_html(target['url'], page, target['list_pattern'])
+        if self.health is not None:
+            self.health.record_listing(target['ctr'], url=target['url'], links=len(links), fetched=bool(page))
+        return links
+
+    def queue_new_links(self, target, links):
+        """
+        Queue the links that appeared on a target's listing since the last run.
+
+        Only links missing from the target's snapshot are checked against
+        the URL database. The snapshot is replaced after they are queued, so
+        an interrupted run finds the same links new again.
+
+        Returns:
+            int: Number of links added to the frontier
+        """
+        pairs = list(dict.fromkeys(resolve_link(target['url'], link) for link in links))
+        new_links, snapshot = self.snapshots.diff(target['ctr'], [domain + path for domain, path in pairs])
+        new_links = set(new_links)
+        queued = self.frontier.push(target['ctr'], [pair for pair in pairs if pair[0] + pair[1] in new_links])
+        self.snapshots.save(target['ctr'], snapshot)
+        return queued
+
+    def next_link(self, target, links):
+        """
+        Choose the link of a target to crawl next.
+
+        With a frontier, that is the newest queued link, taken out of the
+        frontier; otherwise a random link of the listing.
+
+        Returns:
+            tuple: (domain, path), or None if the frontier has nothing for the target
+        """
+        if self.frontier is None:
+            return resolve_link(target['url'], random.choice(links))
+
+        self.queue_new_links(target, links)
+        entries = self.frontier.pending(target['ctr'], limit=1)
+        if not entries:
+            return None
+        self.frontier.remove(entries[0]['domain'], entries[0]['uripath'])
+        return entries[0]['domain'], entries[0]['uripath']
+
+    def parse_article(self, html, ctr=None):
+        """
+        Start extracting an article's fields in the parser pool.
+
+        Returns:
+            Future: Resolves to the fields, or None without a parser pool or
+            a known target (ctr), in which case finish_article parses the page
+        """
+        if self.parser is not None and ctr:
+            return self.parser.article_fields(ctr, html)
+        return None
+
+    def finish_article(self, source_url, html, selector_map, fields=None, ctr=None):
+        """
+        Parse, record and format the outcome of fetching an article.
+
+        An article that couldn't be fetched or has no content is not worth a
+        Gemini call; it is skipped and, given the target's ctr, counted
+        against the target's health. A page that fails to parse (e.g. its
+        parser worker crashed) says nothing about the target and is only
+        reported, so the caller can release it for another run.
+
+        Args:
+            html (str): The fetched page, "" if the fetch failed
+            selector_map (dict): The target's "pattern", to parse pages parse_article didn't hand to the pool
+            fields (Future, optional): From parse_article
+
+        Returns:
+            str: The formatted fields (see GeminiClient.format_fields), "" if
+            the article was skipped, or None if the page couldn't be parsed
+        """
+        parsed = {}
+        if html:
+            try:
+                # The pool's parse time is the wait for its result
+                with metrics.timer("parse", host=metrics.host(source_url)):
+                    parsed = fields.result() if fields is not None else self.ai.extract_fields(html, selector_map)
+            except Exception as e:
+                print(f"Failed to parse ({source_url}): {e!r}")
+                return None
+        parsed = parsed or {}
+
+        if self.health is not None and ctr:
+            self.health.record_article(ctr, fetched=bool(html), extracted=bool(parsed.get('content')))
+
+        if not html:
+            print(f"Failed to fetch ({source_url})")
+            return ""
+        if not parsed.get('content'):
+            print(f"No content extracted ({source_url})")
+            return ""
+        return self.ai.format_fields(parsed)
+
+    def extract_article(self, source_url, selector_map, ctr=None):
+        """
+        Fetch an article and extract its fields (see finish_article).
+
+        Returns:
+            str: The formatted fields, "" if the article was skipped, or None if it couldn't be parsed
+        """
+        html = self.craw.get_page_content(url=source_url)
+        return self.finish_article(source_url, html, selector_map, self.parse_article(html, ctr) if html else None, ctr)
+
+    def extract_articles(self, articles):
+        """
+        Fetch and extract many articles, parsing ahead while later ones are fetched.
+
+        With a parser pool, up to twice as many pages as it has workers are
+        fetched and handed to it before the first result is used, so a
+        backlog keeps every worker busy. Without one this is extract_article
+        in a loop.
 
+        Args:
+            articles: Iterable of (source_url, selector_map, ctr), consumed lazily
 
-        post_image = image.search_random_photo(keyword=post_keyword, per_page=16)
+        Yields:
+            tuple: ((source_url, selector_map, ctr), extracted) in input order,
+            extracted as extract_article returns it, but "" for a page that
+            couldn't be parsed, so one failure doesn't stop the rest
+        """
+        ahead = 2 * self.parser.workers if self.parser is not None else 0
+        pending = deque()
+        for article in articles:
+            source_url, selector_map, ctr = article
+            html = self.craw.get_page_content(url=source_url)
+            pending.append((article, html, self.parse_article(html, ctr) if html else None))
+            while len(pending) > ahead:
+                article, html, fields = pending.popleft()
+                yield article, self.finish_article(article[0], html, article[1], fields, article[2]) or ""
+        while pending:
+            article, html, fields = pending.popleft()
+            yield article, self.finish_article(article[0], html, article[1], fields, article[2]) or ""
 
-        
-        ghost_client.create_post(
-            head_image_data=post_image,
+    def select_image(self, post_keyword):
+        """
+        Pick a feature image for the article's keywords.
+
+        The image comes from the pre-warmed pool when it has one for the topic,
+        otherwise from an Unsplash search. If the Unsplash quota is exhausted
+        and nothing is cached for the keywords, the post goes out without a
+        feature image rather than losing the already generated content. With
+        a feature image stage, the photo is served from Ghost instead of hotlinked.
+        Errors of the stage are reported, never raised: the post then has no image.
+        """
+        try:
+            post_image = self.pool.take(post_keyword) if self.pool else {}
+            if not post_image:
+                post_image = self.image.search_random_photo(keyword=post_keyword, per_page=16)
+
+            if not post_image and self.image.quota.is_exhausted():
+                print("Image stage deferred: Unsplash quota exhausted")
+            elif self.image.quota_low():
+                print(f"Unsplash quota low: {self.image.quota.snapshot()['remaining']} requests left")
+
+            if post_image and self.feature_images:
+                post_image = self.feature_images.prepare(post_image)
+        except Exception as e:
+            print(f"Image stage failed, publishing without a feature image: {e}")
+            return {}
+
+        return post_image
+
+    def publish_article(self, source_url, post_title, post_content, post_keyword, source_hash=None):
+        """
+        Hand the generated article to Ghost with a feature image.
+
+        With an outbox the post is queued under a slug derived from its source
+        URL and published by the Publisher; otherwise it is created directly.
+        Given the hash of the source content, a post that was queued before
+        becomes an update of that post. The post is queued before the image
+        stage calls Unsplash or Ghost, and the image is attached to the queued
+        post afterwards, so the generated content is stored whatever happens there.
+        """
+        post = dict(
             title=f"{post_title}",
             content=f"""{post_content}""",
             status="published",
             keyword=post_keyword,
-            tags=[
-                {"name": "News"},
-                {"name": "posts"},
-                {"name": "AI-generated"},
-                {"name": "crawled"},
-            ],
+            tags=POST_TAGS,
         )
-        
-        
-    
-    
+
+        if self.outbox is None:
+            with metrics.timer("image"):
+                post_image = self.select_image(post_keyword)
+            return self.ghost_client.create_post(head_image_data=post_image, **post)
+
+        slug = outbox.slug_for(source_url)
+        post_data = self.ghost_client.build_post_data(slug=slug, canonical_url=source_url, **post)
+
+        if source_hash is None:
+            if not self.outbox.enqueue(source_url, post_data, slug=slug):
+                print(f"Already queued ({source_url})")
+                return post_data
+        else:
+            result = self.outbox.upsert(source_url, post_data, source_hash, slug=slug)
+            if result == "unchanged":
+                return post_data
+            if result == "updated":
+                print(f"Queued update ({source_url})")
+
+        with metrics.timer("image"):
+            post_image = self.select_image(post_keyword)
+        if post_image:
+            post_data = self.ghost_client.build_post_data(head_image_data=post_image, slug=slug, canonical_url=source_url, **post)
+            self.outbox.set_payload(source_url, post_data, slug=slug)
+        return post_data
+
+    def generate_article(self, extracted):
+        """
+        Generate title, content and keywords from already extracted source content.
+
+        Returns:
+            tuple: (title, content, keyword)
+        """
+        if not extracted:
+            return "", "", ""
+
+        return tuple(
+            self.ai.get_text_response(self.ai.build_prompt(PROMPTS[field], extracted)).strip()
+            for field in ("title", "content", "keyword")
+        )
+
+    def process_article(self, source_url, selector_map, ctr=None, extracted=None):
+        """
+        Fetch, generate and publish one article.
+
+        The HTML is parsed once for all three prompts. If the source content
+        hashes the same as when the article was last queued, nothing is
+        generated or written; neither is anything for an article without
+        extractable content.
+
+        Args:
+            source_url (str): Article URL
+            selector_map (dict): The target's "pattern"
+            ctr (str, optional): Target id the article's health is recorded under
+            extracted (str, optional): The article as extract_articles already extracted it; fetched otherwise
+
+        Returns:
+            bool: True if the article was (re)generated, None if its page couldn't be parsed
+        """
+        host = metrics.host(source_url)
+        with metrics.timer("article", host=host):
+            if extracted is None:
+                extracted = self.extract_article(source_url, selector_map, ctr=ctr)
+                if extracted is None:
+                    metrics.inc("articles_total", outcome="skipped", host=host)
+                    return None
+            if not extracted:
+                metrics.inc("articles_total", outcome="skipped", host=host)
+                return False
+            source_hash = outbox.content_hash(extracted)
+
+            if self.outbox is not None and self.outbox.stored_hash(source_url) == source_hash:
+                print(f"Unchanged ({source_url})")
+                metrics.inc("articles_total", outcome="unchanged", host=host)
+                return False
+
+            with metrics.timer("generate", host=host):
+                post_title, post_content, post_keyword = self.generate_article(extracted)
+            self.publish_article(source_url, post_title, post_content, post_keyword, source_hash=source_hash)
+
+        metrics.inc("articles_total", outcome="generated", host=host)
+        return True
+
+    def run_interactive(self, target_urls, listing_pages=None):
+        """
+        Process one new link per target (see next_link) with individual generateContent calls.
+
+        Args:
+            target_urls (list): Targets to process
+            listing_pages (dict, optional): ctr -> listing already fetched by fetch_new_listings
+        """
+        listing_pages = listing_pages or {}
+        for buff in target_urls:
+
+            if not self.target_available(buff):
+                continue
+
+            DATA_URI = buff['url']
+            DATA_PATTERN = buff['pattern']
+            listing = listing_pages.get(buff['ctr']) or fetch_listing(self.craw, buff)
+            html_mother = self.find_links(buff, listing=listing)
+
+            if not html_mother:
+                print(f"No links found for {DATA_URI}")
+                continue
+
+            link = self.next_link(buff, html_mother)
+            if link is None:
+                print(f"No new links on {DATA_URI}")
+                if self.listings is not None:
+                    self.listings.update(buff['ctr'], listing[0], 0)
+                continue
+            domain, path = link
+
+            check_uri = self.s3.read_by_domain_and_path(domain=domain, uripath=path)
+
+
+
+            if check_uri:
+                print(f"Already crawled ({domain}{path})")
+            else:
+                print(f"Not crawled yet ({domain}{path})")
+                url_id = self.s3.create(domain=domain, uripath=path)
+
+
+                if self.process_article(f'{domain}{path}', DATA_PATTERN, ctr=buff['ctr']) is None:
+                    # Not the page's fault; unmark and re-queue it for the next run
+                    self.s3.delete(url_id)
+                    if self.frontier is not None:
+                        self.frontier.push(buff['ctr'], [link])
+
+            if self.listings is not None:
+                if self.frontier is not None:
+                    remaining = self.frontier.count(buff['ctr'])
+                else:
+                    remaining = sum(
+                        1 for link in html_mother
+                        if not self.s3.read_by_domain_and_path(*resolve_link(DATA_URI, link))
+                    )
+                self.listings.update(buff['ctr'], listing[0], remaining)
+
+    def refresh(self, target_urls, source_urls):
+        """
+        Re-check already published articles and update the ones whose source changed.
+
+        Args:
+            target_urls (list): Target definitions, used to find each URL's selectors
+            source_urls (list): Article URLs to re-check
+
+        Returns:
+            int: Number of articles that were regenerated
+        """
+        articles = []
+        for source_url in source_urls:
+            netloc = urlparse(source_url).netloc
+            target = next((buff for buff in target_urls if urlparse(buff['url']).netloc == netloc), None)
+            if target is None:
+                print(f"No target configured for {source_url}")
+                continue
+            articles.append((source_url, target['pattern'], target['ctr']))
+
+        # Without parser workers nothing is gained by fetching ahead, and
+        # process_article then fetches and parses each article inside its own timer
+        if self.parser is not None:
+            extracted_articles = self.extract_articles(articles)
+        else:
+            extracted_articles = ((article, None) for article in articles)
+
+        refreshed = 0
+        for (source_url, selector_map, ctr), extracted in extracted_articles:
+            if self.process_article(source_url, selector_map, ctr=ctr, extracted=extracted):
+                refreshed += 1
+        return refreshed
+
+    def collect_batch(self, target_urls, batch):
+        """
+        Queue every not-yet-crawled link of every target into a Gemini batch job.
+
+        Each article contributes one request per entry of PROMPTS, keyed as
+        "<url id>:<field>" so the results can be fanned back out per article.
+        The HTML is parsed once per article and shared by all of its prompts.
+
+        Returns:
+            int: Number of articles queued
+        """
+        queued = 0
+
+        for buff in target_urls:
+
+            if not self.target_available(buff):
+                continue
+
+            DATA_URI = buff['url']
+            html_mother = self.find_links(buff)
+
+            if not html_mother:
+                print(f"No links found for {DATA_URI}")
+                continue
+
+            if self.frontier is not None:
+                self.queue_new_links(buff, html_mother)
+                candidates = [(entry['domain'], entry['uripath']) for entry in self.frontier.pending(buff['ctr'])]
+            else:
+                candidates = [resolve_link(DATA_URI, link) for link in html_mother]
+
+            links = {}
+
+            def uncrawled(buff=buff, candidates=candidates):
+                for domain, path in candidates:
+
+                    if self.s3.read_by_domain_and_path(domain=domain, uripath=path):
+                        continue
+
+                    # Stop spending fetches on a target that broke mid-run
+                    if not self.target_available(buff):
+                        break
+
+                    links[f'{domain}{path}'] = (domain, path)
+                    yield f'{domain}{path}', buff['pattern'], buff['ctr']
+
+            for (source_url, _, _), extracted in self.extract_articles(uncrawled()):
+                if not extracted:
+                    continue
+                domain, path = links[source_url]
+
+                # Marked now, as the batch keys need its id; run_batch unmarks it if the batch fails
+                url_id = self.s3.create(domain=domain, uripath=path)
+
+                for field, prompt in PROMPTS.items():
+                    batch.add(key=f"{url_id}:{field}", prompt=self.ai.build_prompt(prompt, extracted),
+                              metadata={"source_hash": outbox.content_hash(extracted), "domain": domain, "uripath": path})
+
+                queued += 1
+                print(f"Queued for batch ({domain}{path})")
+
+        return queued
+
+    def run_batch(self, target_urls, job_path='', poll_interval=30, timeout=6 * 3600):
+        """
+        Generate every new article of every target through one Gemini batch job, then publish them.
+
+        A batch still running after timeout seconds releases its articles,
+        so the next run collects them again instead of this one blocking;
+        resuming its job file later publishes those not collected since.
+        """
+        job_path = job_path or os.path.join('batch_jobs', f"gemini-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl")
+        batch = google_ai_studio.GeminiBatch(self.ai, job_path=job_path)
+
+        if batch.batch_name:
+            print(f"Resuming batch {batch.batch_name} from {job_path}")
+        else:
+            queued = self.collect_batch(target_urls, batch)
+            if not queued:
+                print("No new articles to process")
+                return
+            print(f"Queued {queued} articles into {job_path}")
+
+        try:
+            results = batch.wait(poll_interval=poll_interval, timeout=timeout)
+        except RuntimeError as e:
+            # Failed, cancelled or expired: the job can't be resumed
+            released = self.release_batch(batch)
+            print(f"Error: {e}. Released {released} articles to be collected again")
+            return
+        except TimeoutError as e:
+            released = self.release_batch(batch)
+            print(f"Error: {e}. Released {released} articles to be collected again. "
+                  f"Resume with --batch-job {job_path}")
+            return
+        except OSError as e:
+            # Timed out, or couldn't submit or poll; the job file resumes it
+            print(f"Error: {e}. Resume with --batch-job {job_path}")
+            return
+        metadata = batch.metadata()
+
+        articles = group_batch_results(results)
+
+        # Every queued article, including those the results leave out
+        for url_id in batch_url_ids(batch):
+            fields = articles.get(url_id, {})
+            if any(fields.get(field, "Error:").startswith("Error:") for field in PROMPTS):
+                print(f"Skipping url id {url_id}: incomplete batch result, released to be collected again")
+                self.s3.delete(url_id)
+                continue
+
+            info = metadata.get(f"{url_id}:title", {})
+            rows = self.s3.read(url_id)
+            if rows:
+                domain, path = rows[0]['domain'], rows[0]['uripath']
+            elif info.get("domain"):
+                # Released when an earlier wait for this batch timed out
+                domain, path = info["domain"], info["uripath"]
+                if self.s3.read_by_domain_and_path(domain=domain, uripath=path):
+                    print(f"Skipping url id {url_id}: collected again since the batch was released")
+                    continue
+                self.s3.create(domain=domain, uripath=path)
+            else:
+                print(f"Skipping url id {url_id}: no longer in the URL database")
+                continue
+
+            self.publish_article(f"{domain}{path}", fields["title"], fields["content"], fields["keyword"],
+                                 source_hash=info.get("source_hash"))
+            if self.frontier is not None:
+                self.frontier.remove(domain, path)
+
+    def release_batch(self, batch):
+        """
+        Unmark the articles of a batch that produced no results, so the next run collects them again.
+
+        Their frontier entries are only removed once published, so they are still queued.
+
+        Returns:
+            int: Number of articles released
+        """
+        return sum(1 for url_id in batch_url_ids(batch) if self.s3.delete(url_id))
+
+
+def main():
+
+
+    args = parse_arguments()
+
+    if args.metrics_file:
+        metrics.enable()
+
+    key_unsplash_access = args.unsplash_access_key if args.unsplash_access_key else ""
+    key_google_ai = args.google_ai_api_key if args.google_ai_api_key else ""
+    key_cms_admin_api = args.cms_admin_api_key if args.cms_admin_api_key else ""
+    key_cms_url = args.cms_url if args.cms_url else ""
+
+    # Check if any required keys are missing
+    if not key_unsplash_access or not key_google_ai or not key_cms_admin_api or not key_cms_url:
+        print("Error: Missing required API keys (Need to fill out the arguments)")
+        print(f"Unsplash access key: {'Set' if key_unsplash_access else 'Missing'}")
+        print(f"Google AI API key: {'Set' if key_google_ai else 'Missing'}")
+        print(f"CMS admin API key: {'Set' if key_cms_admin_api else 'Missing'}")
+        print(f"CMS URL: {'Set' if key_cms_url else 'Missing'}")
+        exit()
+
+
+
+
+    try:
+        shard = shards.Shard.parse(args.shard, state_dir=args.state_dir) if args.shard else shards.Shard(state_dir=args.state_dir)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit()
+
+    target_urls = load_target_urls(compile=False)
+    if shard.count > 1 and not args.refresh:
+        # --refresh names its articles itself and only needs the selectors of every target
+        target_urls = shard.select(target_urls)
+        print(f"Shard {shard}: {len(target_urls)} targets, state in {shard.state_dir}")
+
+    s3 = store.URLDatabase(db_path=shard.path("urls.db"))
+    page_archive = archive.PageArchive(directory=args.archive) if args.archive else None
+    if args.replay and page_archive is None:
+        print("Error: --replay needs --archive DIR")
+        exit()
+    if args.replay:
+        craw = archive.ReplayCrawler(page_archive)
+    else:
+        craw = crawler.WebCrawler(
+            archive=page_archive,
+            politeness=politeness.Politeness(user_agent=crawler.USER_AGENT, rate=args.crawl_rate),
+        )
+
+    posts = outbox.Outbox(db_path=shard.path("outbox.db"))
+    target_health = health.TargetHealth(db_path=shard.path("target_health.db"))
+    listing_state = listings.ListingState(path=shard.path("listing_state.json"))
+    frontier = store.Frontier(s3)
+    snapshots = listings.LinkSnapshots(directory=shard.path("link_snapshots"))
+    pool = None
+    publisher = None
+    parser = None
+
+    # Started once nothing before the try can exit, so finally always writes the profile
+    profiler = None
+    if args.profile:
+        profiler = profiling.Profiler(output_dir=args.profile_dir, memory=not args.profile_no_memory)
+        profiler.start()
+
+    try:
+        listing_pages = None
+        if not (args.replay or args.refresh or args.batch):
+            # Randomly select 2 URLs from the target list if there are more than 2
+            if len(target_urls) > 2:
+                target_urls = random.sample(target_urls, 2)
+                print(f"Randomly selected {len(target_urls)} URLs for processing")
+            else:
+                print(f"Using all {len(target_urls)} available URLs as the list is small")
+
+            listing_pages = fetch_new_listings(craw, target_urls, listing_state, target_health)
+            target_urls = [buff for buff in target_urls if buff['ctr'] in listing_pages]
+            if not target_urls and not has_unpublished(posts):
+                print("Nothing new to crawl or publish")
+                return
+
+        target_urls = compile_target_urls(target_urls)
+
+        image = unsplash.UnsplashAPI(access_key=key_unsplash_access, cache=search_cache.SearchCache(db_path=shard.path("unsplash_cache.db")))
+        ai = google_ai_studio.GeminiClient(api_key=key_google_ai)
+
+
+        ghost_client = cms_client.GhostCmsClient(
+            url=key_cms_url,
+            admin_api_key=key_cms_admin_api
+        )
+
+
+        feature_images = feature_image.FeatureImageStage(
+            ghost_client=ghost_client,
+            downloads=downloads.DownloadManager(api=image, cache_dir=shard.path("image_cache")),
+            cache_path=shard.path("ghost_images.json"),
+        )
+
+        publisher = outbox.Publisher(client=ghost_client, outbox=posts, max_workers=args.publish_workers)
+
+
+        # Top up the image pool in the background while crawling and generation run
+        pool = image_pool.ImagePool(api=image, path=shard.path("image_pool.json"))
+        pool.start()
+
+        # Backlogs are CPU-bound on parsing; a single cron article isn't worth starting workers for
+        parse_workers = args.parse_workers if args.parse_workers is not None else (
+            os.cpu_count() if args.batch or args.replay else 0)
+        if parse_workers:
+            parser = parsing.ParserPool(workers=parse_workers)
+
+        pipeline = Pipeline(
+            s3=s3,
+            craw=craw,
+            ai=ai,
+            image=image,
+            ghost_client=ghost_client,
+            pool=pool,
+            feature_images=feature_images,
+            outbox=posts,
+            # Stale archived pages say nothing about the targets' current health
+            health=None if args.replay else target_health,
+            listings=listing_state,
+            frontier=frontier,
+            snapshots=snapshots,
+            parser=parser,
+        )
+
+        if args.replay:
+            source_urls = args.refresh or archived_article_urls(target_urls, page_archive)
+            refreshed = pipeline.refresh(target_urls, source_urls)
+            print(f"Regenerated {refreshed} of {len(source_urls)} archived articles")
+        elif args.refresh:
+            refreshed = pipeline.refresh(target_urls, args.refresh)
+            print(f"Regenerated {refreshed} of {len(args.refresh)} articles")
+        elif args.batch:
+            pipeline.run_batch(target_urls, job_path=args.batch_job, poll_interval=args.batch_poll_interval,
+                               timeout=args.batch_timeout)
+        else:
+            pipeline.run_interactive(target_urls, listing_pages=listing_pages)
+    finally:
+        if pool is not None:
+            pool.stop()
+
+        if parser is not None:
+            parser.close()
+
+        if publisher is not None:
+            # Also publishes posts left over from earlier runs
+            published = publisher.drain(timeout=args.publish_timeout)
+            print(f"Published {published} posts, outbox: {posts.counts()}")
+
+        if args.metrics_file:
+            metrics.registry.write(args.metrics_file)
+            print(f"Metrics written to {args.metrics_file}")
+
+        if page_archive is not None:
+            page_archive.close()
+
+        if profiler:
+            print(f"Profile written to {profiler.stop()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; without it segments are gzip-compressed
+    zstandard = None
+
+import metrics
+from crawler import WebCrawler
+
+
+ZSTD_SUFFIX = ".warc.zst"
+GZIP_SUFFIX = ".warc.gz"
+
+
+def _compress(data: bytes, suffix: str, level: int) -> bytes:
+    """Compress one record as an independent zstd frame or gzip member."""
+    if suffix == ZSTD_SUFFIX:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    compressor = zlib.compressobj(min(level * 2, 9), zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _decompress(data: bytes, suffix: str) -> bytes:
+    if suffix == ZSTD_SUFFIX:
+        if zstandard is None:
+            raise RuntimeError("This archive segment is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data, 31)
+
+
+def _warc_date(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class PageArchive:
+    """
+    Content-addressed archive of raw fetched pages.
+
+    Each capture is appended to a segment file as a WARC-like record (URL,
+    fetch time, HTTP status and headers, then the body), compressed on its
+    own so it can be read back with a single seek. Bodies are stored once per
+    SHA-256 digest: capturing a page whose body is already archived writes a
+    small "revisit" record pointing at the earlier one. A SQLite index maps
+    URLs to their captures for random access.
+
+    Segments are zstd-compressed (.warc.zst) when the zstandard package is
+    installed and gzip-compressed (.warc.gz) otherwise. Every process writes
+    to segments of its own, so several crawler processes can share an archive.
+    """
+
+    def __init__(self, directory: str = "page_archive", max_segment_bytes: int = 256 * 1024 * 1024, level: int = 3):
+        """Open (or create) an archive directory and its index.
+
+        Args:
+            directory: Directory holding the segment files and index.db
+            max_segment_bytes: Size after which a new segment file is started
+            level: Compression level
+        """
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.level = level
+        self.suffix = ZSTD_SUFFIX if zstandard is not None else GZIP_SUFFIX
+        if zstandard is None:
+            print(f"zstandard is not installed; archiving to {directory} with gzip")
+        self.db_path = os.path.join(directory, "index.db")
+        self._segment = None
+        self._segment_file = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._ensure_table_exists()
+
+    def _get_connection(self) -> Tuple[sqlite3.Connection, sqlite3.Cursor]:
+        """Create and return a database connection and cursor.
+
+        Returns:
+            Tuple of (connection, cursor)
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        return conn, cursor
+
+    def _ensure_table_exists(self) -> None:
+        """Create the index tables if they don't already exist."""
+        conn, cursor = self._get_connection()
+        try:
+            # Where each distinct body is stored
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS payloads (
+                    digest TEXT PRIMARY KEY,
+                    segment TEXT NOT NULL,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS captures (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    host TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    status INTEGER NOT NULL,
+                    digest TEXT NOT NULL,
+                    segment TEXT NOT NULL,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL
+                )
+            """)
+
+            # Latest capture of a URL, and the archived URLs of a host
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_captures_url ON captures(url, fetched_at)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_captures_host ON captures(host, url)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _append(self, record: bytes) -> Tuple[str, int, int]:
+        """Append a compressed record to this process's current segment. Must hold self._lock."""
+        if self._segment_file is not None and self._segment_file.tell() >= self.max_segment_bytes:
+            self._segment_file.close()
+            self._segment_file = None
+
+        if self._segment_file is None:
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            self._segment = f"pages-{stamp}-{os.getpid()}-{time.monotonic_ns() % 10**6:06d}{self.suffix}"
+            self._segment_file = open(os.path.join(self.directory, self._segment), "ab")
+
+        data = _compress(record, self.suffix, self.level)
+        offset = self._segment_file.tell()
+        self._segment_file.write(data)
+        self._segment_file.flush()
+        return self._segment, offset, len(data)
+
+    def store(self, url: str, status: int, headers: Dict[str, str], body: bytes,
+              fetched_at: Optional[float] = None) -> str:
+        """Archive one fetched page.
+
+        Args:
+            url: URL the page was fetched from
+            status: HTTP status code
+            headers: Response headers
+            body: Raw response body
+            fetched_at: Fetch time (defaults to now)
+
+        Returns:
+            The body's SHA-256 digest
+        """
+        fetched_at = fetched_at if fetched_at is not None else time.time()
+        digest = hashlib.sha256(body).hexdigest()
+
+        warc_headers = [
+            ("WARC-Type", "response"),
+            ("WARC-Target-URI", url),
+            ("WARC-Date", _warc_date(fetched_at)),
+            ("WARC-Payload-Digest", f"sha256:{digest}"),
+        ]
+        http_block = f"HTTP/1.1 {status}\r\n" + "".join(
+            f"{name}: {value}\r\n" for name, value in headers.items()
+        ) + "\r\n"
+
+        with self._lock:
+            conn, cursor = self._get_connection()
+            try:
+                cursor.execute("SELECT 1 FROM payloads WHERE digest = ?", (digest,))
+                is_new = cursor.fetchone() is None
+
+                block = http_block.encode("utf-8")
+                if is_new:
+                    block += body
+                else:
+                    warc_headers[0] = ("WARC-Type", "revisit")
+                    warc_headers.append(("WARC-Profile", "identical-payload-digest"))
+                header = "WARC/1.1\r\n" + "".join(f"{name}: {value}\r\n" for name, value in warc_headers)
+                header += f"Content-Length: {len(block)}\r\n\r\n"
+
+                segment, offset, length = self._append(header.encode("utf-8") + block + b"\r\n\r\n")
+
+                if is_new:
+                    cursor.execute(
+                        "INSERT OR IGNORE INTO payloads (digest, segment, offset, length) VALUES (?, ?, ?, ?)",
+                        (digest, segment, offset, length)
+                    )
+                cursor.execute(
+                    "INSERT INTO captures (url, host, fetched_at, status, digest, segment, offset, length) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (url, urlparse(url).netloc, fetched_at, status, digest, segment, offset, length)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+        metrics.inc("archive_records_total", kind="response" if is_new else "revisit")
+        return digest
+
+    def _read(self, segment: str, offset: int, length: int) -> Tuple[Dict[str, str], bytes]:
+        """Read one record back, returning its WARC headers and block."""
+        with open(os.path.join(self.directory, segment), "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        suffix = ZSTD_SUFFIX if segment.endswith(ZSTD_SUFFIX) else GZIP_SUFFIX
+        record = _decompress(data, suffix)
+
+        head, _, rest = record.partition(b"\r\n\r\n")
+        warc_headers = dict(
+            line.split(": ", 1) for line in head.decode("utf-8").split("\r\n")[1:]
+        )
+        return warc_headers, rest[:int(warc_headers["Content-Length"])]
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the latest capture of a URL.
+
+        Args:
+            url: Page URL
+
+        Returns:
+            A dictionary with url, status, headers, body (bytes), digest and
+            fetched_at, or None if the URL was never archived
+        """
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute(
+                "SELECT * FROM captures WHERE url = ? ORDER BY fetched_at DESC, id DESC LIMIT 1",
+                (url,)
+            )
+            capture = cursor.fetchone()
+            if capture is None:
+                return None
+            cursor.execute("SELECT * FROM payloads WHERE digest = ?", (capture["digest"],))
+            payload = cursor.fetchone()
+        finally:
+            conn.close()
+
+        _, block = self._read(capture["segment"], capture["offset"], capture["length"])
+        http_head, _, body = block.partition(b"\r\n\r\n")
+        if (payload["segment"], payload["offset"]) != (capture["segment"], capture["offset"]):
+            _, payload_block = self._read(payload["segment"], payload["offset"], payload["length"])
+            body = payload_block.partition(b"\r\n\r\n")[2]
+
+        headers = dict(
+            line.split(": ", 1) for line in http_head.decode("utf-8").split("\r\n")[1:] if line
+        )
+        return {
+            "url": url,
+            "status": capture["status"],
+            "headers": headers,
+            "body": body,
+            "digest": capture["digest"],
+            "fetched_at": capture["fetched_at"],
+        }
+
+    def get_text(self, url: str) -> str:
+        """Return the latest capture of a URL decoded as text, or "" if it was never archived.
+
+        The body is decoded with the charset of its Content-Type header,
+        falling back to UTF-8.
+        """
+        page = self.get(url)
+        if page is None:
+            return ""
+        content_type = next((value for name, value in page["headers"].items() if name.lower() == "content-type"), "")
+        charset = "utf-8"
+        for parameter in content_type.split(";")[1:]:
+            name, _, value = parameter.strip().partition("=")
+            if name.lower() == "charset" and value:
+                charset = value.strip('"')
+        try:
+            return page["body"].decode(charset, errors="replace")
+        except LookupError:
+            return page["body"].decode("utf-8", errors="replace")
+
+    def urls(self, host: Optional[str] = None) -> Iterator[str]:
+        """Yield every archived URL, optionally only those of one host (netloc)."""
+        conn, cursor = self._get_connection()
+        try:
+            if host is None:
+                cursor.execute("SELECT DISTINCT url FROM captures ORDER BY url")
+            else:
+                cursor.execute("SELECT DISTINCT url FROM captures WHERE host = ? ORDER BY url", (host,))
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+        for row in rows:
+            yield row["url"]
+
+    def stats(self) -> Dict[str, int]:
+        """Return capture, URL and payload counts and the total size of the segment files."""
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute("SELECT COUNT(*), COUNT(DISTINCT url) FROM captures")
+            captures, urls = cursor.fetchone()
+            cursor.execute("SELECT COUNT(*) FROM payloads")
+            payloads = cursor.fetchone()[0]
+        finally:
+            conn.close()
+        size = sum(
+            os.path.getsize(os.path.join(self.directory, name))
+            for name in os.listdir(self.directory)
+            if name.endswith((ZSTD_SUFFIX, GZIP_SUFFIX))
+        )
+        return {"captures": captures, "urls": urls, "payloads": payloads, "bytes": size}
+
+    def close(self) -> None:
+        """Close the current segment file."""
+        with self._lock:
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
+
+
+class ReplayCrawler(WebCrawler):
+    """
+    A WebCrawler that serves pages from a PageArchive instead of the network.
+
+    Lets the extraction and generation stages be re-run after changing
+    selectors or prompts without fetching the source sites again. Pages that
+    were never archived come back empty, like a failed fetch.
+    """
+
+    def __init__(self, archive):
+        """
+        Args:
+            archive (PageArchive): Archive to read pages from
+        """
+        super().__init__()
+        self.archive = archive
+
+    def get_page_content(self, url):
+        with metrics.timer("replay", host=metrics.host(url)):
+            html = self.archive.get_text(url)
+        if not html:
+            print(f"Not in archive ({url})")
+        return html
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a page archive")
+    parser.add_argument("--dir", type=str, default="page_archive", help="Archive directory")
+    parser.add_argument("--list", nargs="?", const="", metavar="HOST", help="List archived URLs, optionally of one host")
+    parser.add_argument("--show", type=str, metavar="URL", help="Print the latest capture of a URL")
+    args = parser.parse_args()
+
+    page_archive = PageArchive(directory=args.dir)
+    if args.list is not None:
+        for url in page_archive.urls(args.list or None):
+            print(url)
+    elif args.show:
+        page = page_archive.get(args.show)
+        if page is None:
+            print(f"Not in archive ({args.show})")
+            return
+        print(f"{page['status']} {_warc_date(page['fetched_at'])} sha256:{page['digest']}")
+        for name, value in page["headers"].items():
+            print(f"{name}: {value}")
+        print()
+        print(page_archive.get_text(args.show))
+    else:
+        stats = page_archive.stats()
+        print(f"{stats['captures']} captures of {stats['urls']} URLs, "
+              f"{stats['payloads']} distinct bodies, {stats['bytes'] / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
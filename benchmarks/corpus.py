@@ -0,0 +1,203 @@
+"""
+Recorded HTML corpus for the benchmarks.
+
+Every target in targeturl_base.json gets a listing page and an article page
+under benchmarks/corpus/<ctr>/. The pages are generated from the target's own
+list_pattern and pattern selectors, so their DOM has the shape the selectors
+expect, padded with the navigation, scripts, ads and related-article blocks
+of a real news page to production size. Regenerate them (deterministically)
+after changing targeturl_base.json:
+
+    python -m benchmarks.corpus
+"""
+import gzip
+import json
+import os
+import random
+import re
+from html import escape
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+TARGETS_PATH = os.path.join(ROOT, "targeturl_base.json")
+
+WORDS = (
+    "cloud security network server data platform service model release update "
+    "company market users developer software hardware chip device mobile system "
+    "research report analysis growth revenue launch feature support open source "
+    "infrastructure performance storage cost region customer partner product"
+).split()
+
+COMPOUND = re.compile(r"^([a-zA-Z][a-zA-Z0-9]*)?((?:[#.][\w-]+)*)$")
+
+
+def load_targets():
+    with open(TARGETS_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def sentence(rng, words=14):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def parse_compound(compound):
+    """Split a compound selector such as "div.a.b#c" into (tag, id, classes)."""
+    match = COMPOUND.match(compound)
+    if not match:
+        raise ValueError(f"Unsupported selector part for the corpus: {compound}")
+    tag = match.group(1) or "div"
+    element_id = None
+    classes = []
+    for token in re.findall(r"[#.][\w-]+", match.group(2)):
+        if token[0] == "#":
+            element_id = token[1:]
+        else:
+            classes.append(token[1:])
+    return tag, element_id, classes
+
+
+def open_tag(tag, element_id=None, classes=()):
+    attrs = ""
+    if element_id:
+        attrs += f' id="{element_id}"'
+    if classes:
+        attrs += f' class="{" ".join(classes)}"'
+    return f"<{tag}{attrs}>"
+
+
+class Node:
+    """A trie of selector steps; selectors sharing a prefix share their ancestors."""
+
+    def __init__(self, combinator=None, compound=None):
+        self.combinator = combinator
+        self.compound = compound
+        self.children = {}
+        self.roles = []
+
+    def insert(self, selector, role):
+        node = self
+        combinator = " "
+        for token in selector.replace(">", " > ").split():
+            if token == ">":
+                combinator = ">"
+                continue
+            node = node.children.setdefault((combinator, token), Node(combinator, token))
+            combinator = " "
+        node.roles.append(role)
+
+
+def render_listing_items(rng, tag, element_id, classes, domain):
+    """Render the repeated element a list selector matches, each holding article links."""
+    count = 1 if element_id or tag in ("main", "section") else rng.randint(8, 14)
+    parts = []
+    for _ in range(count):
+        anchors = []
+        for _ in range(rng.randint(1, 3) if count > 1 else 20):
+            article_id = rng.randint(100000, 999999)
+            href = rng.choice((f"/news/articles/{article_id}.html", f"{domain}/article/{article_id}?from=list"))
+            anchors.append(
+                f'<a href="{href}"><img src="/img/{article_id}.jpg" alt=""><span class="headline">{escape(sentence(rng, 8))}</span></a>'
+                f'<p class="lead">{escape(sentence(rng, 24))}</p><time>2025-01-{rng.randint(1, 28):02d}</time>'
+            )
+        parts.append(open_tag(tag, element_id, classes) + "".join(anchors) + f"</{tag}>")
+    return "".join(parts)
+
+
+def render_article_field(rng, tag, element_id, classes, role):
+    if role == "title":
+        return open_tag(tag, element_id, classes) + escape(sentence(rng, 10)) + f"</{tag}>"
+
+    blocks = []
+    for index in range(rng.randint(30, 45)):
+        if index % 9 == 4:
+            blocks.append("<h2>" + escape(sentence(rng, 6)) + "</h2>")
+        elif index % 11 == 7:
+            blocks.append("<ul>" + "".join(f"<li>{escape(sentence(rng, 10))}</li>" for _ in range(4)) + "</ul>")
+        elif index % 13 == 10:
+            blocks.append('<div class="ad-inline"><script>window.ads=window.ads||[];ads.push({slot:"inline"});</script></div>')
+        else:
+            blocks.append("<p>" + " ".join(escape(sentence(rng, rng.randint(12, 28))) for _ in range(4)) + "</p>")
+    blocks.append('<div class="share-buttons">' + "".join(f'<a href="https://share.example/{n}">{n}</a>' for n in ("x", "facebook", "line")) + "</div>")
+    return open_tag(tag, element_id, classes) + "".join(blocks) + f"</{tag}>"
+
+
+def render(node, rng, kind, domain):
+    parts = []
+    for child in node.children.values():
+        tag, element_id, classes = parse_compound(child.compound)
+
+        if child.children:
+            inner = render(child, rng, kind, domain)
+            # A list selector can also end on an inner step, e.g. "#a" next to "#a > ul > li"
+            if child.roles and kind == "listing":
+                inner += render_listing_items(rng, "div", None, ["item"], domain)
+            html = open_tag(tag, element_id, classes) + inner + f"</{tag}>"
+        elif kind == "listing":
+            html = render_listing_items(rng, tag, element_id, classes, domain)
+        else:
+            html = render_article_field(rng, tag, element_id, classes, child.roles[0])
+
+        # Descendant steps get an extra wrapper so they don't degrade into child steps
+        if child.combinator == " " and node.compound is not None:
+            html = '<div class="wrap">' + html + "</div>"
+        parts.append(html)
+    return "".join(parts)
+
+
+def boilerplate(rng, domain):
+    nav = "".join(f'<li><a href="/category/{rng.choice(WORDS)}/{n}">{rng.choice(WORDS).title()}</a></li>' for n in range(120))
+    scripts = "".join(
+        f"<script>(function(){{var d={json.dumps([sentence(rng, 6) for _ in range(6)])};window.__c{n}=d;}})();</script>"
+        for n in range(25)
+    )
+    styles = "<style>" + "".join(f".c{n}{{margin:{n}px;padding:{n % 7}px;color:#{n * 4111 % 0xffffff:06x}}}" for n in range(400)) + "</style>"
+    related = '<aside class="related-articles"><h3>Related</h3><ul>' + "".join(
+        f'<li><a href="/news/articles/{rng.randint(100000, 999999)}.html">{escape(sentence(rng, 8))}</a></li>' for _ in range(30)
+    ) + "</ul></aside>"
+    footer = "<footer>" + "".join(f'<a href="/info/{n}">{escape(sentence(rng, 3))}</a>' for n in range(60)) + "</footer>"
+    head = f"<head><meta charset=\"utf-8\"><title>{escape(sentence(rng, 6))}</title>{styles}{scripts}</head>"
+    return head, f'<header><nav class="global-nav"><ul>{nav}</ul></nav></header>', related + footer
+
+
+def build_page(target, kind):
+    """Build the listing or article page of a target."""
+    rng = random.Random(f"{target['ctr']}:{kind}")
+    domain = "https://" + target["url"].split("/")[2]
+
+    root = Node()
+    if kind == "listing":
+        for selector in target["list_pattern"]:
+            root.insert(selector, "list")
+    else:
+        for role, selector in target["pattern"].items():
+            root.insert(selector, role)
+
+    head, header, footer = boilerplate(rng, domain)
+    body = render(root, rng, kind, domain)
+    return f"<!DOCTYPE html><html>{head}<body>{header}{body}{footer}</body></html>"
+
+
+def page_path(ctr, kind):
+    return os.path.join(CORPUS_DIR, ctr, f"{kind}.html.gz")
+
+
+def load(ctr, kind):
+    """Return the recorded listing or article page of a target as text."""
+    with gzip.open(page_path(ctr, kind), "rt", encoding="utf-8") as f:
+        return f.read()
+
+
+def generate():
+    for target in load_targets():
+        for kind in ("listing", "article"):
+            path = page_path(target["ctr"], kind)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            html = build_page(target, kind)
+            # mtime=0 keeps the files byte-identical between regenerations
+            with open(path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+                f.write(html.encode("utf-8"))
+            print(f"{path}: {len(html) // 1024} KiB")
+
+
+if __name__ == "__main__":
+    generate()
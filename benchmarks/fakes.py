@@ -0,0 +1,354 @@
+"""
+Local stand-ins for Gemini, Unsplash, Ghost and the crawled news sites.
+
+One threaded HTTP server answers all of them under different path prefixes:
+
+    /v1beta/models/<model>:generateContent     Gemini
+    /unsplash/search/photos                    Unsplash search
+    /unsplash/photos/<id>/download             Unsplash download endpoint
+    /unsplash/images/<id>.jpg                  Unsplash image CDN
+    /ghost/api/admin/...                       Ghost Admin API (posts, tags, users, images)
+    /site<n>/  and  /site<n>/articles/<i>.html Target listing and article pages
+    /site<n>/feed.xml                          RSS feed of the listing's articles
+
+Every service has a ServiceProfile with its latency and the share of
+requests answered with 5xx errors or 429 throttling, so the pipeline can be
+load tested without spending real API quota.
+"""
+import io
+import json
+import random
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+try:
+    from PIL import Image
+except ImportError:  # Without Pillow the fake CDN serves bytes that are never decoded
+    Image = None
+
+
+SERVICES = ("gemini", "unsplash", "ghost", "site")
+
+LIST_PATTERN = ["ul.article-list li"]
+ARTICLE_PATTERN = {"title": "h1.article-title", "content": "div.article-body"}
+
+
+class ServiceProfile:
+    """Latency and failure behaviour of one fake service."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1):
+        """
+        Args:
+            latency (float): Mean response delay in seconds
+            jitter (float): Maximum random deviation from the mean delay in seconds
+            error_rate (float): Share of requests answered with 503
+            throttle_rate (float): Share of requests answered with 429
+            retry_after (int): Retry-After seconds sent with 429 and 503 responses
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+
+    def delay(self, rng):
+        return max(self.latency + rng.uniform(-self.jitter, self.jitter), 0)
+
+    def fault(self, rng):
+        """Return the status of an injected failure, or None to answer normally."""
+        roll = rng.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+
+def sample_jpeg(width=2400, height=1600):
+    """Return a JPEG of roughly the size of an Unsplash "regular" photo."""
+    if Image is None:
+        return b"\xff\xd8\xff\xe0" + bytes(200_000)
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+class FakeServices:
+    """Threaded HTTP server answering as Gemini, Unsplash, Ghost and the target sites."""
+
+    def __init__(self, profiles=None, sites=4, articles_per_site=25, host="127.0.0.1", port=0, seed=0):
+        """
+        Args:
+            profiles (dict, optional): ServiceProfile per entry of SERVICES; missing ones answer instantly
+            sites (int): Number of fake target sites
+            articles_per_site (int): Links on each site's listing page
+            host (str): Interface to listen on
+            port (int): Port to listen on, 0 for any free port
+            seed (int): Seed of the latency and failure rolls
+        """
+        self.profiles = {service: ServiceProfile() for service in SERVICES}
+        self.profiles.update(profiles or {})
+        self.sites = sites
+        self.articles_per_site = articles_per_site
+        self.image_bytes = sample_jpeg()
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._posts = {}
+        self._tags = {}
+
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def gemini_url(self):
+        return f"{self.url}/v1beta"
+
+    @property
+    def unsplash_url(self):
+        return f"{self.url}/unsplash/"
+
+    @property
+    def ghost_url(self):
+        return self.url
+
+    def targets(self, feeds=False):
+        """
+        Return target definitions in the targeturl_base.json format for the fake sites.
+
+        Args:
+            feeds (bool): Give every target a "feed_url"
+        """
+        return [
+            {
+                "ctr": f"site{n}",
+                "url": f"{self.url}/site{n}/",
+                "list_pattern": LIST_PATTERN,
+                "pattern": ARTICLE_PATTERN,
+                **({"feed_url": f"{self.url}/site{n}/feed.xml"} if feeds else {}),
+            }
+            for n in range(self.sites)
+        ]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        """Return the number of responses per service and status code."""
+        with self._lock:
+            return {service: dict(statuses) for service, statuses in self._stats.items()}
+
+    def reset(self):
+        """Forget the recorded statistics and published posts, e.g. between load test runs."""
+        with self._lock:
+            self._stats.clear()
+            self._posts.clear()
+            self._tags.clear()
+
+    def _record(self, service, status):
+        with self._lock:
+            statuses = self._stats.setdefault(service, {})
+            statuses[status] = statuses.get(status, 0) + 1
+
+    def _roll(self, service):
+        """Return (delay, injected failure status) for one request."""
+        profile = self.profiles[service]
+        with self._lock:
+            return profile.delay(self._rng), profile.fault(self._rng)
+
+    # --- Responses ---------------------------------------------------------
+
+    def gemini(self, method, path, query, body):
+        prompt = json.loads(body)["contents"][0]["parts"][0]["text"] if body else ""
+        if "Return keywords" in prompt:
+            text = "cloud computing, data center"
+        elif "Create a short, clickbait title" in prompt:
+            text = "[USA] Cloud platform update"
+        else:
+            text = "<h2>Event</h2><ul>" + "".join(f"<li>Point {n}</li>" for n in range(12)) + "</ul>"
+        return 200, {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}],
+            # Roughly four characters per token
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4},
+        }, {}
+
+    def unsplash(self, method, path, query, body):
+        headers = {"X-Ratelimit-Limit": "5000", "X-Ratelimit-Remaining": "4999"}
+        if path == "/unsplash/search/photos":
+            per_page = int(query.get("per_page", ["10"])[0])
+            keyword = query.get("query", [""])[0]
+            results = []
+            for n in range(per_page):
+                photo_id = f"{re.sub(r'[^a-z0-9]+', '-', keyword.lower())}-{n}"
+                results.append({
+                    "id": photo_id,
+                    "description": keyword,
+                    "alt_description": keyword,
+                    "urls": {key: f"{self.url}/unsplash/images/{photo_id}.jpg" for key in ("regular", "small", "thumb")},
+                    "links": {"download": f"{self.url}/unsplash/photos/{photo_id}/download"},
+                    "user": {"name": "Load Test", "links": {"html": f"{self.url}/unsplash/@load"}},
+                })
+            return 200, {"total": per_page, "results": results}, headers
+
+        match = re.fullmatch(r"/unsplash/photos/([^/]+)/download", path)
+        if match:
+            return 200, {"url": f"{self.url}/unsplash/images/{match.group(1)}.jpg"}, headers
+
+        if path.startswith("/unsplash/images/"):
+            return 200, self.image_bytes, {"Content-Type": "image/jpeg"}
+
+        return 404, {"errors": [{"message": "Not found"}]}, headers
+
+    def ghost(self, method, path, query, body):
+        resource = path[len("/ghost/api/admin/"):].strip("/").split("/")[0]
+
+        if resource == "posts" and method == "GET":
+            canonical_url = re.search(r"canonical_url:'(.*)'", query.get("filter", [""])[0])
+            with self._lock:
+                posts = [post for post in self._posts.values()
+                         if canonical_url and post.get("canonical_url") == canonical_url.group(1)]
+            return 200, {"posts": posts[:1]}, {}
+
+        if resource == "posts" and method in ("POST", "PUT"):
+            post = json.loads(body)["posts"][0]
+            with self._lock:
+                post_id = path.strip("/").split("/")[-1] if method == "PUT" else f"post-{len(self._posts) + 1}"
+                post = {**post, "id": post_id, "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())}
+                self._posts[post_id] = post
+            return (200 if method == "PUT" else 201), {"posts": [post]}, {}
+
+        if resource == "tags" and method == "GET":
+            with self._lock:
+                return 200, {"tags": list(self._tags.values())}, {}
+
+        if resource == "tags" and method == "POST":
+            name = json.loads(body)["tags"][0]["name"]
+            with self._lock:
+                tag = self._tags.setdefault(name.lower(), {"id": f"tag-{len(self._tags) + 1}", "name": name,
+                                                           "slug": name.lower()})
+            return 201, {"tags": [tag]}, {}
+
+        if resource == "users":
+            return 200, {"users": [{"id": "user-1", "name": "Load Test", "slug": "load", "email": "load@example.com"}]}, {}
+
+        if resource == "images":
+            ref = re.search(rb'name="ref"\r\n\r\n([^\r]*)', body or b"")
+            name = ref.group(1).decode() if ref else "image"
+            return 201, {"images": [{"url": f"{self.url}/content/images/{name}.webp", "ref": name}]}, {}
+
+        return 404, {"errors": [{"message": "Resource not found"}]}, {}
+
+    def site(self, method, path, query, body):
+        match = re.fullmatch(r"/site(\d+)/(?:articles/(\d+)\.html|(feed\.xml))?", path)
+        if not match or int(match.group(1)) >= self.sites:
+            return 404, "<html><body>Not found</body></html>", {}
+        site = match.group(1)
+
+        if match.group(3):
+            # Article n was published n hours ago
+            now = time.time()
+            items = "".join(
+                f"<item><title>Headline {n}</title><link>{self.url}/site{site}/articles/{n}.html</link>"
+                f"<pubDate>{formatdate(now - n * 3600)}</pubDate></item>"
+                for n in range(self.articles_per_site)
+            )
+            feed = f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Site {site}</title>{items}</channel></rss>'
+            return 200, feed.encode("utf-8"), {"Content-Type": "application/rss+xml"}
+
+        if match.group(2) is None:
+            items = "".join(
+                f'<li><a class="headline" href="/site{site}/articles/{n}.html">Headline {n}</a></li>'
+                for n in range(self.articles_per_site)
+            )
+            return 200, f'<html><body><nav><a href="/">Home</a></nav><ul class="article-list">{items}</ul></body></html>', {}
+
+        paragraphs = "".join(
+            f"<p>Paragraph {n} of article {match.group(2)} on site {site}. " + "Cloud platform news text. " * 20 + "</p>"
+            for n in range(12)
+        )
+        return 200, (
+            f'<html><body><nav>Menu</nav><h1 class="article-title">Article {match.group(2)}</h1>'
+            f'<div class="article-body">{paragraphs}</div><footer>Footer</footer></body></html>'
+        ), {}
+
+    # --- HTTP plumbing -----------------------------------------------------
+
+    def _service_for(self, path):
+        if path.startswith("/v1beta/"):
+            return "gemini"
+        if path.startswith("/unsplash/"):
+            return "unsplash"
+        if path.startswith("/ghost/"):
+            return "ghost"
+        return "site"
+
+    def _handler_class(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+
+                service = services._service_for(parsed.path)
+                delay, fault = services._roll(service)
+                time.sleep(delay)
+
+                headers = {}
+                if fault:
+                    status = fault
+                    payload = {"error": {"code": status, "message": "Injected failure"}}
+                    headers["Retry-After"] = str(services.profiles[service].retry_after)
+                    if service == "unsplash" and status == 429:
+                        headers["X-Ratelimit-Remaining"] = "0"
+                else:
+                    status, payload, headers = getattr(services, service)(
+                        self.command, parsed.path, parse_qs(parsed.query), body
+                    )
+
+                if isinstance(payload, bytes):
+                    data = payload
+                    content_type = headers.pop("Content-Type", "application/octet-stream")
+                elif isinstance(payload, str):
+                    data = payload.encode("utf-8")
+                    content_type = "text/html; charset=utf-8"
+                else:
+                    data = json.dumps(payload).encode("utf-8")
+                    content_type = "application/json"
+
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+                services._record(service, status)
+
+            do_GET = do_POST = do_PUT = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,283 @@
+"""
+End-to-end load test of the pipeline against local fake services.
+
+Starts benchmarks.fakes.FakeServices and runs the real Pipeline (crawler,
+Gemini, Unsplash, feature images, outbox and Publisher) against it once per
+concurrency setting. Each run happens in its own subprocess so peak RSS is
+measured per setting, with fresh databases and caches in a temporary directory.
+
+    python -m benchmarks.load
+    python -m benchmarks.load --concurrency 1,4,16 --articles 100
+    python -m benchmarks.load --latency gemini=1.5,ghost=0.2 --throttle-rate ghost=0.05 --error-rate gemini=0.02
+
+Reported per run: posts published per minute (wall time from the first
+listing fetch until the outbox is drained), p50/p99 per-article latency
+(fetch, generation, image and enqueue of one article) and peak RSS. With
+--output, the per-stage metrics of every run are saved alongside; with
+--profile, each run also writes a profile (folded stacks, allocation peaks).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.fakes import FakeServices, ServiceProfile, SERVICES
+
+# Typical production latencies in seconds
+DEFAULT_LATENCY = {"gemini": 0.8, "unsplash": 0.15, "ghost": 0.2, "site": 0.1}
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers (None for an empty list)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def parse_service_values(text, default=None):
+    """Parse "gemini=0.8,ghost=0.2" into a dict, filling unspecified services with default."""
+    values = {service: (default or {}).get(service, 0.0) for service in SERVICES}
+    for item in filter(None, text.split(",")):
+        service, _, value = item.partition("=")
+        if service not in SERVICES:
+            raise argparse.ArgumentTypeError(f"Unknown service '{service}', expected one of {', '.join(SERVICES)}")
+        values[service] = float(value)
+    return values
+
+
+def run_worker(args):
+    """Run the pipeline once against already running fake services and write the measurements as JSON."""
+    import app
+    import cms_client
+    import crawler
+    import downloads
+    import feature_image
+    import google_ai_studio
+    import metrics
+    import outbox
+    import profiling
+    import search_cache
+    import store
+    import targets
+    import unsplash
+
+    metrics.enable()
+    base_url = args.base_url
+    target_urls = targets.compile_targets(json.loads(args.targets))
+    workdir = tempfile.mkdtemp(prefix="load-")
+
+    image = unsplash.UnsplashAPI(
+        access_key="load-test",
+        cache=search_cache.SearchCache(db_path=os.path.join(workdir, "unsplash_cache.db")),
+        base_url=f"{base_url}/unsplash/",
+    )
+    ghost_client = cms_client.GhostCmsClient(url=base_url, admin_api_key="load:" + "00" * 32)
+    posts = outbox.Outbox(db_path=os.path.join(workdir, "outbox.db"))
+    publisher = outbox.Publisher(client=ghost_client, outbox=posts, max_workers=args.publish_workers)
+
+    pipeline = app.Pipeline(
+        s3=store.URLDatabase(db_path=os.path.join(workdir, "urls.db")),
+        craw=crawler.WebCrawler(),
+        ai=google_ai_studio.GeminiClient(api_key="load-test", base_url=f"{base_url}/v1beta"),
+        image=image,
+        ghost_client=ghost_client,
+        feature_images=feature_image.FeatureImageStage(
+            ghost_client=ghost_client,
+            downloads=downloads.DownloadManager(api=image, cache_dir=os.path.join(workdir, "image_cache")),
+            cache_path=os.path.join(workdir, "ghost_images.json"),
+        ),
+        outbox=posts,
+    )
+
+    profiler = None
+    if args.profile:
+        profiler = profiling.Profiler(output_dir=os.path.join(args.profile, f"concurrency-{args.concurrency}"))
+        profiler.start()
+
+    started = time.perf_counter()
+
+    jobs = []
+    for target in target_urls:
+        for link in pipeline.craw.extract_links(url=target["url"], css_selectors=target["list_pattern"]):
+            domain, path = app.resolve_link(target["url"], link)
+            if not pipeline.s3.read_by_domain_and_path(domain=domain, uripath=path):
+                pipeline.s3.create(domain=domain, uripath=path)
+                jobs.append((f"{domain}{path}", target["pattern"]))
+    jobs = jobs[:args.articles]
+
+    latencies = []
+    latency_lock = threading.Lock()
+
+    def process(job):
+        job_started = time.perf_counter()
+        pipeline.process_article(*job)
+        with latency_lock:
+            latencies.append(time.perf_counter() - job_started)
+
+    # Publish while articles are still being generated, as the outbox would in production
+    generating = threading.Event()
+    generating.set()
+    published = 0
+
+    def publish():
+        nonlocal published
+        while generating.is_set():
+            published += publisher.drain(timeout=0)
+            time.sleep(0.05)
+
+    publisher_thread = threading.Thread(target=publish, name="load-publisher")
+    publisher_thread.start()
+
+    concurrency = int(args.concurrency)
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load-article") as executor:
+            list(executor.map(process, jobs))
+    finally:
+        generating.clear()
+        publisher_thread.join()
+    published += publisher.drain(timeout=args.publish_timeout)
+
+    wall = time.perf_counter() - started
+    if profiler:
+        profiler.stop()
+
+    result = {
+        "concurrency": concurrency,
+        "articles": len(jobs),
+        "published": published,
+        "wall_seconds": round(wall, 3),
+        "throughput_per_minute": round(published / wall * 60, 1) if wall else None,
+        "p50_seconds": percentile(latencies, 0.50),
+        "p99_seconds": percentile(latencies, 0.99),
+        "peak_rss_mb": peak_rss_mb(),
+        "outbox": posts.counts(),
+        "metrics": metrics.registry.summary(),
+    }
+    with open(args.result, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+def run_load(args):
+    """Start the fake services and run one worker subprocess per concurrency setting."""
+    latency = parse_service_values(args.latency, DEFAULT_LATENCY)
+    jitter = parse_service_values(args.jitter)
+    error_rate = parse_service_values(args.error_rate)
+    throttle_rate = parse_service_values(args.throttle_rate)
+    profiles = {
+        service: ServiceProfile(
+            latency=latency[service],
+            jitter=jitter[service] or latency[service] * 0.25,
+            error_rate=error_rate[service],
+            throttle_rate=throttle_rate[service],
+            retry_after=args.retry_after,
+        )
+        for service in SERVICES
+    }
+
+    sites = max(1, args.sites)
+    fakes = FakeServices(profiles=profiles, sites=sites, articles_per_site=-(-args.articles // sites)).start()
+    targets = json.dumps(fakes.targets())
+    rows = []
+
+    try:
+        for concurrency in [int(value) for value in args.concurrency.split(",") if value]:
+            fakes.reset()
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+                result_path = f.name
+
+            command = [
+                sys.executable, "-m", "benchmarks.load", "--worker",
+                "--base-url", fakes.url,
+                "--targets", targets,
+                "--concurrency", str(concurrency),
+                "--articles", str(args.articles),
+                "--publish-workers", str(args.publish_workers),
+                "--publish-timeout", str(args.publish_timeout),
+                "--result", result_path,
+            ]
+            if args.profile:
+                command += ["--profile", os.path.abspath(args.profile)]
+            output = None if args.verbose else subprocess.DEVNULL
+            subprocess.run(command, cwd=ROOT, check=True, stdout=output)
+
+            with open(result_path, "r", encoding="utf-8") as f:
+                row = json.load(f)
+            os.remove(result_path)
+
+            row["responses"] = fakes.stats()
+            rows.append(row)
+            print(
+                f"concurrency {row['concurrency']:3d}: "
+                f"{row['published']:4d}/{row['articles']} published in {row['wall_seconds']:7.1f}s  "
+                f"{row['throughput_per_minute']:7.1f} posts/min  "
+                f"p50 {row['p50_seconds'] or 0:6.2f}s  p99 {row['p99_seconds'] or 0:6.2f}s  "
+                f"peak RSS {row['peak_rss_mb']} MB",
+                flush=True,
+            )
+    finally:
+        fakes.stop()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Pipeline load test against local fake services")
+    parser.add_argument("--concurrency", type=str, default="1,2,4,8", help="Comma-separated article worker counts")
+    parser.add_argument("--articles", type=int, default=40, help="Articles processed per run")
+    parser.add_argument("--sites", type=int, default=4, help="Number of fake target sites")
+    parser.add_argument("--publish-workers", type=int, default=4, help="Concurrent Ghost publishers")
+    parser.add_argument("--publish-timeout", type=float, default=120, help="Seconds to wait for retried posts at the end of a run")
+    parser.add_argument("--latency", type=str, default="", help="Mean latency per service in seconds, e.g. gemini=0.8,ghost=0.2")
+    parser.add_argument("--jitter", type=str, default="", help="Latency jitter per service in seconds (default: 25%% of the latency)")
+    parser.add_argument("--error-rate", type=str, default="", help="Share of 503 responses per service, e.g. gemini=0.02")
+    parser.add_argument("--throttle-rate", type=str, default="", help="Share of 429 responses per service, e.g. ghost=0.05")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with injected failures")
+    parser.add_argument("--output", type=str, default="", help="Write the results of all runs to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    parser.add_argument("--profile", type=str, default="", help="Profile every run into this directory (see profiling.Profiler); skews the timings")
+
+    # Used by run_load to start the per-concurrency worker processes
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", type=str, help=argparse.SUPPRESS)
+    parser.add_argument("--targets", type=str, help=argparse.SUPPRESS)
+    parser.add_argument("--result", type=str, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.worker:
+        run_worker(args)
+    else:
+        run_load(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Offline benchmarks for the parsing and storage hot paths and for startup.
+
+Runs against the recorded corpus in benchmarks/corpus/ and temporary SQLite
+databases, so no network access or API keys are needed.
+
+    python -m benchmarks.run                  # run everything, compare with baseline.json
+    python -m benchmarks.run --filter store   # only cases whose name contains "store"
+    python -m benchmarks.run --sizes 10000    # URLDatabase sizes to benchmark
+    python -m benchmarks.run --save           # record the results as the new baseline
+    python -m benchmarks.run --check          # exit 1 if any case regressed
+
+Commit an updated baseline.json together with changes that move the numbers,
+so the difference shows up in review.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import app
+import store
+import targets
+from crawler import WebCrawler
+from google_ai_studio import GeminiClient
+from benchmarks import corpus, startup
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+CASES = []
+
+
+def case(name):
+    """Register a benchmark. The decorated function does the setup and returns the callable to time."""
+    def register(setup):
+        CASES.append((name, setup))
+        return setup
+    return register
+
+
+def measure(fn, min_time=0.2, repeat=5):
+    """
+    Time fn, calibrating the loop count so each round lasts at least min_time.
+
+    Returns:
+        Median seconds per call over repeat rounds
+    """
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    rounds = [elapsed / loops]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        rounds.append((time.perf_counter() - started) / loops)
+    return statistics.median(rounds)
+
+
+# --- Parsing -----------------------------------------------------------------
+
+def register_parsing_cases():
+    # Selectors compiled as app.load_target_urls does
+    for target in targets.compile_targets(corpus.load_targets()):
+        ctr = target["ctr"]
+
+        def extract_links_setup(target=target):
+            crawler = WebCrawler()
+            html = corpus.load(target["ctr"], "listing")
+            patcher = patch.object(WebCrawler, "get_page_content", return_value=html)
+            patcher.start()
+            CLEANUPS.append(patcher.stop)
+            return lambda: crawler.extract_links(target["url"], target["list_pattern"])
+
+        def extract_content_setup(target=target):
+            client = GeminiClient(api_key="")
+            html = corpus.load(target["ctr"], "article")
+            return lambda: client.extract_content_from_html(html, target["pattern"])
+
+        case(f"extract_links[{ctr}]")(extract_links_setup)
+        case(f"extract_content_from_html[{ctr}]")(extract_content_setup)
+
+
+@case("resolve_link[10k]")
+def resolve_link_setup():
+    rng = random.Random(0)
+    links = [
+        rng.choice((f"/news/articles/{n}.html", f"https://news.example/article/{n}?from=list", f"articles/{n}"))
+        for n in range(10_000)
+    ]
+
+    def run():
+        for link in links:
+            app.resolve_link("https://news.example/list/", link)
+    return run
+
+
+# --- URLDatabase -------------------------------------------------------------
+
+CLEANUPS = []
+
+
+def populated_db(rows):
+    """Create a URLDatabase holding rows entries, filled in bulk for speed."""
+    directory = tempfile.mkdtemp(prefix="bench-urls-")
+    CLEANUPS.append(lambda: shutil.rmtree(directory, ignore_errors=True))
+    db = store.URLDatabase(db_path=os.path.join(directory, "urls.db"))
+
+    conn = sqlite3.connect(db.db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO urls (url_hash, domain, uripath) VALUES (?, ?, ?)",
+            ((store.url_hash(domain, uripath), domain, uripath) for domain, uripath in
+             ((f"https://site{n % 50}.example", f"/news/articles/{n}.html?from=list") for n in range(rows)))
+        )
+    conn.close()
+    return db
+
+
+def register_store_cases(sizes):
+    for rows in sizes:
+        label = f"{rows // 1000}k" if rows < 1_000_000 else f"{rows // 1_000_000}M"
+
+        def hit_setup(rows=rows):
+            db = populated_db(rows)
+            rng = random.Random(1)
+            return lambda: db.read_by_domain_and_path(
+                domain=f"https://site{(n := rng.randrange(rows)) % 50}.example",
+                uripath=f"/news/articles/{n}.html?from=list",
+            )
+
+        def miss_setup(rows=rows):
+            db = populated_db(rows)
+            return lambda: db.read_by_domain_and_path(domain="https://site1.example", uripath="/missing")
+
+        def create_setup(rows=rows):
+            db = populated_db(rows)
+            counter = iter(range(10**9))
+            return lambda: db.create(domain="https://new.example", uripath=f"/a/{next(counter)}")
+
+        def search_setup(rows=rows):
+            db = populated_db(rows)
+            return lambda: db.search("articles/4242")
+
+        case(f"store.read_by_domain_and_path_hit[{label}]")(hit_setup)
+        case(f"store.read_by_domain_and_path_miss[{label}]")(miss_setup)
+        case(f"store.create[{label}]")(create_setup)
+        case(f"store.search[{label}]")(search_setup)
+
+
+# --- Startup -----------------------------------------------------------------
+
+def register_startup_cases():
+    # Wall time of a fresh interpreter, as paid by every cron invocation
+    for scenario, command in startup.SCENARIOS.items():
+        case(f"startup[{scenario}]")(lambda command=command: lambda: startup.run_scenario(command))
+
+
+# --- Runner ------------------------------------------------------------------
+
+def load_baseline():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+
+def save_baseline(results):
+    baseline = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "results": {name: round(seconds, 9) for name, seconds in sorted(results.items())},
+    }
+    with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2)
+        f.write("\n")
+
+
+def format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.2f} ns"
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Offline benchmarks")
+    parser.add_argument("--filter", type=str, default="", help="Only run cases whose name contains this text")
+    parser.add_argument("--sizes", type=str, default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated URLDatabase row counts")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per timing round")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Slowdown ratio over baseline reported as a regression")
+    parser.add_argument("--save", action="store_true", help="Write the results to baseline.json")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if any case regressed")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    register_parsing_cases()
+    register_store_cases(sizes)
+    register_startup_cases()
+
+    baseline = load_baseline()
+    results = {}
+    regressions = []
+
+    for name, setup in CASES:
+        if args.filter not in name:
+            continue
+        try:
+            seconds = measure(setup(), min_time=args.min_time)
+        finally:
+            while CLEANUPS:
+                CLEANUPS.pop()()
+        results[name] = seconds
+
+        line = f"{name:55s} {format_time(seconds)}"
+        if name in baseline:
+            ratio = seconds / baseline[name]
+            line += f"   {ratio:5.2f}x baseline"
+            if ratio > 1 + args.threshold:
+                line += "   REGRESSION"
+                regressions.append(name)
+        print(line, flush=True)
+
+    if args.save:
+        # Keep baseline entries of cases that were filtered out of this run
+        save_baseline({**baseline, **results})
+        print(f"Baseline written to {BASELINE_PATH}")
+
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
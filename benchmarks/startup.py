@@ -0,0 +1,161 @@
+"""
+Startup cost of the cron entry point, measured with python -X importtime.
+
+    python -m benchmarks.startup                # import breakdown of each scenario
+    python -m benchmarks.startup --top 30       # show more modules
+    python -m benchmarks.startup --check        # exit 1 if an early exit loads a heavy module
+
+Scenarios run app.py in a fresh interpreter each time. "import" only imports
+the module; "missing-keys" is a run that stops at the API key check and so
+must not load any of HEAVY_MODULES. "nothing-new" is a cron run that fetches
+its listings (served locally, see nothing_new) and finds them unchanged; it
+needs the HTTP client and the crawler, but must not load anything that
+parses, generates or publishes. Wall-clock times of the same scenarios are
+part of python -m benchmarks.run (cases "startup[...]") and tracked in
+baseline.json.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "import": [sys.executable, "-c", "import app"],
+    "missing-keys": [sys.executable, "app.py"],
+    "nothing-new": [sys.executable, "-m", "benchmarks.startup", "--nothing-new"],
+}
+
+HEAVY_MODULES = ("requests", "bs4", "soupsieve", "jwt", "PIL", "google_ai_studio", "unsplash", "cms_client", "crawler",
+                 "extraction", "parsing")
+# Scenarios that end before parsing a page, and the heavy modules they may load
+EARLY_EXIT_SCENARIOS = {
+    "import": (),
+    "missing-keys": (),
+    "nothing-new": ("requests", "crawler"),
+}
+
+
+def forbidden_modules(scenario):
+    """Heavy modules an early-exit scenario must not load."""
+    return [name for name in HEAVY_MODULES if name not in EARLY_EXIT_SCENARIOS[scenario]]
+
+
+def nothing_new():
+    """
+    Run app.main() down its "nothing new to crawl" exit, without the network.
+
+    Every listing fetch returns the same page, and each target's listing
+    state already says that page has no uncrawled links left, so the run
+    ends after fetching its listings.
+    """
+    import json
+    import shutil
+    import tempfile
+
+    import app
+    import crawler
+    import listings
+    import targets
+
+    page = "<html><body><ul><li><a href=\"/news/1\">1</a></li></ul></body></html>"
+    crawler.WebCrawler.get_page_content = lambda self, url: page
+    crawler.WebCrawler.feed_links = lambda self, url, **kwargs: []
+
+    state_dir = tempfile.mkdtemp(prefix="startup-")
+    try:
+        state = listings.ListingState(path=os.path.join(state_dir, "listing_state.json"))
+        with open(targets.DEFAULT_PATH, "r", encoding="utf-8") as f:
+            for target in json.load(f):
+                state.update(target["ctr"], page, 0)
+
+        sys.argv = ["app.py", "--unsplash-access-key", "key", "--google-ai-api-key", "key",
+                    "--cms-admin-api-key", "id:00", "--cms-url", "http://127.0.0.1:9", "--state-dir", state_dir]
+        app.main()
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+
+def run_scenario(command):
+    """Run a command under -X importtime and return its wall time in seconds."""
+    started = time.perf_counter()
+    subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+    return time.perf_counter() - started
+
+
+def import_times(command):
+    """
+    Run a command with -X importtime.
+
+    Returns:
+        list: (module, self microseconds, cumulative microseconds, depth) per imported module
+    """
+    result = subprocess.run(
+        [command[0], "-X", "importtime", *command[1:]],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+def interpreter_modules():
+    """Modules every interpreter imports at startup, which app.py can't avoid."""
+    return {name for name, _, _, _ in import_times([sys.executable, "-c", "pass"])}
+
+
+def report(scenario, command, baseline_modules, top):
+    """Print the import breakdown of a scenario and return the heavy modules it loaded."""
+    samples = [import_times(command) for _ in range(3)]
+    # Median run by total import time, to keep the breakdown consistent
+    samples.sort(key=lambda modules: sum(c for name, _, c, depth in modules if depth == 0 and name not in baseline_modules))
+    modules = samples[len(samples) // 2]
+
+    own = [module for module in modules if module[0] not in baseline_modules]
+    total = sum(cumulative for name, _, cumulative, depth in own if depth == 0)
+    wall = statistics.median(run_scenario(command) for _ in range(5))
+    print(f"{scenario}: {len(own)} modules, {total / 1000:.1f} ms importing, {wall * 1000:.1f} ms wall")
+    for name, self_us, cumulative_us, depth in sorted(own, key=lambda module: -module[2])[:top]:
+        print(f"  {cumulative_us / 1000:8.2f} ms  {self_us / 1000:8.2f} ms self  {name}")
+
+    loaded = {name.split(".")[0] for name, _, _, _ in own}
+    return [name for name in HEAVY_MODULES if name in loaded]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup import-time benchmark")
+    parser.add_argument("--top", type=int, default=15, help="Modules listed per scenario, by cumulative import time")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if an early-exit scenario loads a heavy module")
+    parser.add_argument("--nothing-new", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.nothing_new:
+        nothing_new()
+        return
+
+    baseline_modules = interpreter_modules()
+    problems = []
+    for scenario, command in SCENARIOS.items():
+        heavy = report(scenario, command, baseline_modules, args.top)
+        if scenario in EARLY_EXIT_SCENARIOS:
+            heavy = [name for name in heavy if name in forbidden_modules(scenario)]
+            if heavy:
+                problems.append(f"{scenario} loads {', '.join(heavy)}")
+        print()
+
+    for problem in problems:
+        print(f"TOO HEAVY: {problem}")
+    if problems and args.check:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,51 @@
 import requests
 from datetime import datetime, timezone
+import mimetypes
+import os
+import threading
 import time
 import jwt
 
+import metrics
+
+
+def nql_string(value):
+    """Quote a value for a Ghost NQL filter, escaping backslashes and single quotes"""
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
 
 
 
 
 class GhostCmsClient:
-    def __init__(self, url, admin_api_key):
+    def __init__(self, url, admin_api_key, metadata_refresh_interval=3600):
         self.url = url.rstrip("/")
         self.admin_api_key = admin_api_key
         self.session = requests.Session()
         self.token = None
         self.token_expiry = 0
+        # Publishers share one client across threads
+        self._token_lock = threading.Lock()
+        
+        # Site tags and authors, fetched once and refreshed periodically
+        self.metadata_refresh_interval = metadata_refresh_interval
+        self._tags = {}
+        self._tags_fetched_at = 0
+        self._authors = {}
+        self._authors_fetched_at = 0
+        self._metadata_lock = threading.Lock()
+        self._tag_create_lock = threading.Lock()
     
     def get_token(self):
         """Get a valid JWT token, creating a new one if necessary"""
-        current_time = time.time()
-        
-        # If token exists and is not expired (with 30-second buffer), return it
-        if self.token and self.token_expiry > current_time + 30:
-            return self.token
+        with self._token_lock:
+            current_time = time.time()
             
-        # Otherwise create a new token
-        return self._create_new_token()
+            # If token exists and is not expired (with 30-second buffer), return it
+            if self.token and self.token_expiry > current_time + 30:
+                return self.token
+                
+            # Otherwise create a new token
+            return self._create_new_token()
     
     def _create_new_token(self):
         """Create JWT token for Ghost Admin API authentication"""
@@ -56,17 +77,36 @@ class GhostCmsClient:
             return None
         
         
-    def create_post(self, title, content, status="draft", tags=None, featured=False, head_image_data=None, keyword=None):
-        """Create a new post using the JWT token authentication"""
-        # Get a valid token
+    def _request(self, method, path, **kwargs):
+        """Send an authenticated Admin API request, renewing the token once on 401 (None without a token)"""
         token = self.get_token()
         if not token:
             print("Failed to get authentication token")
-            return False
+            return None
         
-        create_url = f"{self.url}/ghost/api/admin/posts/?source=html"
+        request_url = f"{self.url}/ghost/api/admin/{path}"
+        headers = dict(kwargs.pop("headers", None) or {})
         
+        headers["Authorization"] = f"Ghost {token}"
+        resource = path.split("/")[0]
+        with metrics.timer("ghost", resource=resource):
+            response = self.session.request(method, request_url, headers=headers, **kwargs)
             
+            if response.status_code == 401:
+                # Token might be invalid despite our checks - force a new one
+                print("Token rejected - creating a new one")
+                metrics.inc("retries_total", stage="ghost")
+                self.token = None
+                token = self.get_token()
+                if token:
+                    headers["Authorization"] = f"Ghost {token}"
+                    response = self.session.request(method, request_url, headers=headers, **kwargs)
+        
+        metrics.inc("http_responses_total", stage="ghost", resource=resource, status=response.status_code)
+        return response
+    
+    def build_post_data(self, title, content, status="draft", tags=None, featured=False, head_image_data=None, keyword=None, slug=None, canonical_url=None, authors=None):
+        """Build the Admin API payload for a post, applying Ghost's field length limits"""
         post_title = title
         
         # Check post_title length and truncate if over 90 bytes
@@ -168,24 +208,205 @@ class GhostCmsClient:
             }]
         }
         
-        headers = {
-            "Authorization": f"Ghost {token}",
-            "Content-Type": "application/json"
-        }
+        if slug:
+            post_data["posts"][0]["slug"] = slug
+        if canonical_url:
+            post_data["posts"][0]["canonical_url"] = canonical_url
+        if authors:
+            post_data["posts"][0]["authors"] = authors
+        
+        return post_data
+        
+    def _fetch_all(self, resource, fields):
+        """Fetch every item of an Admin API collection (e.g. tags, users)"""
+        response = self._request("GET", f"{resource}/?limit=all&fields={fields}")
+        if response is None:
+            raise requests.RequestException("Failed to get authentication token")
+        response.raise_for_status()
+        return response.json()[resource]
+    
+    def get_tags(self, force=False):
+        """Return the site's tags keyed by lowercased name, refreshing the cache when it is stale"""
+        with self._metadata_lock:
+            if force or time.time() - self._tags_fetched_at > self.metadata_refresh_interval:
+                tags = self._fetch_all("tags", "id,name,slug")
+                self._tags = {tag["name"].lower(): tag for tag in tags}
+                self._tags_fetched_at = time.time()
+            return self._tags
+    
+    def get_authors(self, force=False):
+        """Return the site's staff users keyed by lowercased email, slug and name, refreshing the cache when it is stale"""
+        with self._metadata_lock:
+            if force or time.time() - self._authors_fetched_at > self.metadata_refresh_interval:
+                authors = {}
+                for user in self._fetch_all("users", "id,name,slug,email"):
+                    for key in ("email", "slug", "name"):
+                        if user.get(key):
+                            authors.setdefault(user[key].lower(), user)
+                self._authors = authors
+                self._authors_fetched_at = time.time()
+            return self._authors
+    
+    def create_tags(self, names):
+        """Create tags that don't exist yet and add them to the cache. Returns the created tags"""
+        created = []
+        # The Admin API has no bulk endpoint, so missing tags are created in one pass up front
+        for name in names:
+            response = self._request(
+                "POST",
+                "tags/",
+                json={"tags": [{"name": name}]},
+                headers={"Content-Type": "application/json"},
+            )
+            if response is None or response.status_code not in (200, 201):
+                print(f"Failed to create tag '{name}': {response.status_code if response is not None else 'no token'}")
+                continue
+            tag = response.json()["tags"][0]
+            created.append(tag)
+            with self._metadata_lock:
+                self._tags[tag["name"].lower()] = tag
+        return created
+    
+    def resolve_tags(self, tags):
+        """Map tags given by name ({"name": ...} or plain strings) to {"id": ...} references
+        
+        Missing tags are created once and cached. If the site's tags can't be
+        fetched, tags are sent by name and Ghost resolves them itself.
+        """
+        if not tags:
+            return []
+        
+        try:
+            with self._metadata_lock:
+                fetched_at = self._tags_fetched_at
+            known = self.get_tags()
+            with self._metadata_lock:
+                just_fetched = self._tags_fetched_at != fetched_at
+        except requests.RequestException as e:
+            print(f"Could not load tags, sending them by name: {e}")
+            return [tag if isinstance(tag, dict) else {"name": tag} for tag in tags]
+        
+        def missing_names(known):
+            names = []
+            for tag in tags:
+                if isinstance(tag, dict) and tag.get("id"):
+                    continue
+                name = tag.get("name") if isinstance(tag, dict) else tag
+                if name and name.lower() not in known and name not in names:
+                    names.append(name)
+            return names
+        
+        # Serialized so concurrent publishers don't create the same tag twice
+        with self._tag_create_lock:
+            names = missing_names(known)
+            if names and not just_fetched:
+                # The tags may have been added on the site since the last fetch
+                try:
+                    names = missing_names(self.get_tags(force=True))
+                except requests.RequestException:
+                    pass
+            if names:
+                self.create_tags(names)
+        
+        # Refreshes replace the cache and create_tags adds to it, both under the lock
+        with self._metadata_lock:
+            known = dict(self._tags)
+        
+        resolved = []
+        for tag in tags:
+            if isinstance(tag, dict) and tag.get("id"):
+                resolved.append({"id": tag["id"]})
+                continue
+            name = tag.get("name") if isinstance(tag, dict) else tag
+            cached = known.get(name.lower())
+            resolved.append({"id": cached["id"]} if cached else {"name": name})
+        return resolved
+    
+    def resolve_authors(self, authors):
+        """Map authors given by email, slug or name to {"id": ...} references, dropping unknown ones"""
+        if not authors:
+            return []
+        
+        try:
+            known = self.get_authors()
+        except requests.RequestException as e:
+            print(f"Could not load authors, using the default author: {e}")
+            return []
+        
+        resolved = []
+        for author in authors:
+            key = (author.get("email") or author.get("slug") or author.get("name")) if isinstance(author, dict) else author
+            user = known.get((key or "").lower())
+            if user:
+                resolved.append({"id": user["id"]})
+            else:
+                print(f"Unknown author '{key}'")
+        return resolved
+    
+    def send_post(self, post_data, method="POST", path="posts/?source=html"):
+        """Send a payload from build_post_data and return the raw response (None without a token)
+        
+        Tag names and authors in the payload are resolved to ids from the
+        cached site metadata first, so Ghost doesn't look them up per request.
+        """
+        post = dict(post_data["posts"][0])
+        if post.get("tags"):
+            post["tags"] = self.resolve_tags(post["tags"])
+        if post.get("authors"):
+            post["authors"] = self.resolve_authors(post["authors"])
+            if not post["authors"]:
+                del post["authors"]
+        
+        return self._request(
+            method,
+            path,
+            json={"posts": [post]},
+            headers={"Content-Type": "application/json"},
+        )
+    
+    def find_post_by_canonical_url(self, canonical_url):
+        """Return the post whose canonical_url is the given source URL, or None"""
+        response = self._request(
+            "GET",
+            "posts/",
+            params={
+                "filter": f"canonical_url:{nql_string(canonical_url)}",
+                "fields": "id,slug,title,updated_at,canonical_url",
+                "limit": 1,
+            },
+        )
+        if response is None:
+            raise requests.RequestException("Failed to get authentication token")
+        response.raise_for_status()
+        posts = response.json().get("posts", [])
+        return posts[0] if posts else None
+    
+    def update_post(self, post_id, post_data, updated_at):
+        """Replace an existing post with a payload from build_post_data and return the raw response
+        
+        Ghost rejects the update with 409 if updated_at doesn't match the
+        stored post, i.e. it was edited since it was read.
+        """
+        post = dict(post_data["posts"][0])
+        post["updated_at"] = updated_at
+        # Keep the original publication date on updates
+        post.pop("published_at", None)
+        return self.send_post({"posts": [post]}, method="PUT", path=f"posts/{post_id}/?source=html")
+    
+    def create_post(self, title, content, status="draft", tags=None, featured=False, head_image_data=None, keyword=None, slug=None, canonical_url=None, authors=None):
+        """Create a new post using the JWT token authentication"""
+        post_data = self.build_post_data(
+            title, content, status=status, tags=tags, featured=featured,
+            head_image_data=head_image_data, keyword=keyword, slug=slug, canonical_url=canonical_url,
+            authors=authors,
+        )
         
         # Debug print
         # print(f"Creating post with content: {content[:100]}...")  # Print first 100 chars for debugging
         
-        response = self.session.post(create_url, json=post_data, headers=headers)
-        
-        if response.status_code == 401:
-            # Token might be invalid despite our checks - force a new one
-            print("Token rejected - creating a new one")
-            self.token = None
-            token = self.get_token()
-            if token:
-                headers["Authorization"] = f"Ghost {token}"
-                response = self.session.post(create_url, json=post_data, headers=headers)
+        response = self.send_post(post_data)
+        if response is None:
+            return False
         
         if response.status_code == 201 or response.status_code == 200:
             print(f"Post '{title}' created successfully")
@@ -195,6 +416,36 @@ class GhostCmsClient:
             print(response.text)
             return False
     
+    def upload_image(self, file_path, ref=None):
+        """Upload an image through the Ghost images API and return its hosted URL (None on failure)"""
+        filename = os.path.basename(file_path)
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        
+        data = {"purpose": "image"}
+        if ref:
+            data["ref"] = ref
+        
+        # Read once so the upload can be resent after a token renewal
+        with open(file_path, "rb") as f:
+            file_bytes = f.read()
+        
+        # requests sets the multipart Content-Type (with boundary) itself
+        response = self._request(
+            "POST",
+            "images/upload/",
+            files={"file": (filename, file_bytes, content_type)},
+            data=data,
+        )
+        if response is None:
+            return None
+        
+        if response.status_code == 201 or response.status_code == 200:
+            return response.json()["images"][0]["url"]
+        else:
+            print(f"Failed to upload image: {response.status_code}")
+            print(response.text)
+            return None
+    
     def is_authenticated(self):
         """Check if we can authenticate with the API"""
         token = self.get_token()
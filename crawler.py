@@ -1,10 +1,154 @@
 import requests
 from requests.exceptions import RequestException
+import sqlite3
 import time
-from bs4 import BeautifulSoup
+import zlib
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from xml.etree.ElementTree import XMLPullParser, ParseError
+
+import metrics
+import targets
+from politeness import parse_retry_after
+
+
+def _local_name(tag):
+    """Strip the namespace from an ElementTree tag: "{http://www.w3.org/2005/Atom}entry" -> "entry"."""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _feed_date(text):
+    """Parse an RFC 822 (RSS) or ISO 8601 (Atom, sitemaps) date into an aware datetime, or None."""
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(text)
+        except (TypeError, ValueError):
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_feed(chunks):
+    """
+    Incrementally parse an RSS, RDF, Atom, sitemap or sitemap index document.
+
+    Entries are yielded as soon as their closing tag has been read and then
+    removed from their parent, so memory stays flat however long the
+    document is.
+
+    Args:
+        chunks: Iterable of bytes (e.g. response.iter_content())
+
+    Yields:
+        tuple: (kind, url, published) where kind is "entry" for an article
+        and "sitemap" for a child sitemap of a sitemap index, and published
+        is an aware datetime or None
+    """
+    parser = XMLPullParser(events=('start', 'end'))
+    # Elements still open, innermost last: the parent of an element that ends is open[-1]
+    open_elements = []
+    decompressor = None
+    first = True
+    for chunk in chunks:
+        if first and chunk[:2] == b'\x1f\x8b':
+            # Gzipped sitemap (sitemap.xml.gz) served without Content-Encoding
+            decompressor = zlib.decompressobj(31)
+        first = False
+        parser.feed(decompressor.decompress(chunk) if decompressor else chunk)
+
+        for event, element in parser.read_events():
+            if event == 'start':
+                open_elements.append(element)
+                continue
+            open_elements.pop()
+            name = _local_name(element.tag)
+            if name not in ('item', 'entry', 'url', 'sitemap'):
+                continue
+
+            url = None
+            dates = {}
+            for child in element.iter():
+                child_name = _local_name(child.tag)
+                text = (child.text or '').strip()
+                if child_name == 'link' and url is None:
+                    # Atom links are attributes; RSS links are text
+                    if child.get('href') and child.get('rel', 'alternate') == 'alternate':
+                        url = child.get('href')
+                    elif text:
+                        url = text
+                elif child_name == 'loc' and text and url is None:
+                    url = text
+                elif child_name == 'guid' and text and child.get('isPermaLink', 'true') == 'true':
+                    dates.setdefault('guid', text)
+                elif child_name in ('publication_date', 'published', 'pubDate', 'date', 'updated', 'lastmod'):
+                    dates.setdefault(child_name, text)
+
+            url = url or dates.get('guid')
+            published = next(
+                (parsed for key in ('publication_date', 'published', 'pubDate', 'date', 'updated', 'lastmod')
+                 if (parsed := _feed_date(dates.get(key)))),
+                None
+            )
+            # Cleared entries would otherwise pile up in the channel, feed or urlset
+            if open_elements:
+                open_elements[-1].remove(element)
+            element.clear()
+            if url:
+                yield ('sitemap' if name == 'sitemap' else 'entry'), url, published
+
+    parser.close()
+
+
+def parse_links(html_content, css_selectors):
+    """
+    Extract the links inside the elements matching any of the selectors.
+    
+    Args:
+        html_content (str): HTML of a listing page
+        css_selectors (list): CSS selector strings or selectors compiled by targets.load_targets
+        
+    Returns:
+        list: Distinct href values, in page order
+    """
+    # Imported here so runs that never parse a page don't load bs4
+    from bs4 import BeautifulSoup
+    
+    # Parse HTML
+    soup = BeautifulSoup(html_content, 'html.parser')
+    
+    # Extract links from each selector
+    links = []
+    for selector in css_selectors:
+        # Find elements matching the selector
+        elements = targets.select(soup, selector)
+        
+        # Extract all anchor tags from these elements
+        for element in elements:
+            anchors = element.find_all('a')
+            for anchor in anchors:
+                href = anchor.get('href')
+                if href:
+                    # Add to our links list if it's not already there
+                    if href not in links:
+                        links.append(href)
+    
+    return links
+
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 
 class WebCrawler:
-    def __init__(self, timeout=10, max_retries=3, retry_delay=2):
+    # Longest Retry-After honoured by sleeping; a longer one gives up on the URL
+    MAX_RETRY_AFTER = 60
+
+    # Feeds and sitemaps larger than this are cut off
+    MAX_FEED_BYTES = 50 * 1024 * 1024
+
+    def __init__(self, timeout=10, max_retries=3, retry_delay=2, archive=None, politeness=None):
         """
         Initialize the WebCrawler with configurable parameters.
         
@@ -12,14 +156,18 @@ class WebCrawler:
             timeout (int): Request timeout in seconds
             max_retries (int): Number of retry attempts
             retry_delay (int): Delay between retries in seconds
+            archive (archive.PageArchive, optional): Archive receiving every successfully fetched page
+            politeness (politeness.Politeness, optional): Per-host pacing, robots.txt and circuit breakers
         """
         self.timeout = timeout
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.archive = archive
+        self.politeness = politeness
         
         # Default headers to mimic a browser
         self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'User-Agent': USER_AGENT,
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
         }
@@ -34,38 +182,146 @@ class WebCrawler:
         Returns:
             str: HTML content of the page body or empty string if failed
         """
-        for attempt in range(self.max_retries):
-            try:
-                response = requests.get(
-                    url,
-                    headers=self.headers,
-                    timeout=self.timeout
-                )
-                
-                # Check if request was successful
-                if response.status_code == 200:
-                    return response.text
-                
-                # If we get a rate limit or temporary failure, try again after delay
-                if response.status_code in (429, 503, 504):
-                    time.sleep(self.retry_delay * (attempt + 1))
-                    continue
+        host = metrics.host(url)
+        with metrics.timer("fetch", host=host):
+            for attempt in range(self.max_retries):
+                if attempt:
+                    metrics.inc("retries_total", stage="fetch", host=host)
+                if self.politeness is not None and not self.politeness.acquire(url):
+                    return ""
+                try:
+                    response = requests.get(
+                        url,
+                        headers=self.headers,
+                        timeout=self.timeout
+                    )
+                    metrics.inc("http_responses_total", stage="fetch", host=host, status=response.status_code)
+                    if self.politeness is not None:
+                        self.politeness.record(url, response.status_code, response.headers.get('Retry-After'))
                     
-                # Other failure status codes
-                return ""
-                
-            except RequestException:
-                # Wait before retrying
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay * (attempt + 1))
-                continue
-            except Exception:
-                # Catch any other exceptions
-                return ""
+                    # Check if request was successful
+                    if response.status_code == 200:
+                        if metrics.registry.enabled:
+                            metrics.inc("fetch_bytes_total", len(response.content), host=host)
+                        if self.archive is not None:
+                            self._archive_response(url, response)
+                        return response.text
+                    
+                    # If we get a rate limit or temporary failure, try again after delay
+                    if response.status_code in (429, 503, 504):
+                        # With politeness, acquire() waits out the host's pause before the retry
+                        if self.politeness is None:
+                            delay = parse_retry_after(response.headers.get('Retry-After'))
+                            if delay is not None and delay > self.MAX_RETRY_AFTER:
+                                return ""
+                            time.sleep(delay if delay is not None else self.retry_delay * (attempt + 1))
+                        continue
+                        
+                    # Other failure status codes
+                    return ""
+                    
+                except RequestException:
+                    if self.politeness is not None:
+                        self.politeness.record(url)
+                    # Wait before retrying
+                    elif attempt < self.max_retries - 1:
+                        time.sleep(self.retry_delay * (attempt + 1))
+                    continue
+                except Exception:
+                    # Catch any other exceptions
+                    return ""
         
         # If we've exhausted all retries
         return ""
     
+    def _feed_entries(self, url):
+        """Stream a feed or sitemap and return its (kind, url, published) entries, or [] if it failed."""
+        host = metrics.host(url)
+        if self.politeness is not None and not self.politeness.acquire(url):
+            return []
+        entries = []
+        with metrics.timer("fetch_feed", host=host):
+            try:
+                with requests.get(url, headers=self.headers, timeout=self.timeout, stream=True) as response:
+                    metrics.inc("http_responses_total", stage="fetch_feed", host=host, status=response.status_code)
+                    if self.politeness is not None:
+                        self.politeness.record(url, response.status_code, response.headers.get('Retry-After'))
+                    if response.status_code != 200:
+                        return []
+
+                    received = 0
+                    def chunks():
+                        nonlocal received
+                        for chunk in response.iter_content(chunk_size=64 * 1024):
+                            received += len(chunk)
+                            if received > self.MAX_FEED_BYTES:
+                                print(f"Feed larger than {self.MAX_FEED_BYTES} bytes, stopping ({url})")
+                                return
+                            yield chunk
+
+                    for entry in parse_feed(chunks()):
+                        entries.append(entry)
+                    if metrics.registry.enabled:
+                        metrics.inc("fetch_bytes_total", received, host=host)
+            except RequestException:
+                if self.politeness is not None:
+                    self.politeness.record(url)
+                return []
+            except (ParseError, zlib.error) as e:
+                # Keep what was parsed before the document broke off
+                print(f"Malformed feed {url}: {e}")
+        return entries
+    
+    def feed_links(self, url, limit=100, max_age=7 * 86400, max_child_sitemaps=3):
+        """
+        Discover article URLs from an RSS/Atom feed or a (news) sitemap.
+        
+        A sitemap index is followed into its most recently modified child
+        sitemaps. Entries older than max_age are dropped; entries without a
+        date are kept after the dated ones.
+        
+        Args:
+            url (str): Feed, sitemap or sitemap index URL
+            limit (int): Maximum number of URLs returned
+            max_age (float): Maximum entry age in seconds (None keeps everything)
+            max_child_sitemaps (int): Child sitemaps read from a sitemap index
+            
+        Returns:
+            list: Article URLs, newest first
+        """
+        entries = self._feed_entries(url)
+        sitemaps = [entry for entry in entries if entry[0] == 'sitemap']
+        if sitemaps:
+            # Most recent child sitemaps first; undated ones keep the index order (usually oldest first)
+            sitemaps.sort(key=lambda entry: entry[2] or datetime.min.replace(tzinfo=timezone.utc), reverse=True)
+            if all(entry[2] is None for entry in sitemaps):
+                sitemaps.reverse()
+            for _, child_url, _ in sitemaps[:max_child_sitemaps]:
+                entries.extend(entry for entry in self._feed_entries(child_url) if entry[0] == 'entry')
+
+        cutoff = datetime.now(timezone.utc).timestamp() - max_age if max_age is not None else None
+        dated = []
+        undated = []
+        seen = set()
+        for kind, link, published in entries:
+            if kind != 'entry' or link in seen:
+                continue
+            seen.add(link)
+            if published is None:
+                undated.append(link)
+            elif cutoff is None or published.timestamp() >= cutoff:
+                dated.append((published, link))
+
+        dated.sort(key=lambda entry: entry[0], reverse=True)
+        return ([link for _, link in dated] + undated)[:limit]
+    
+    def _archive_response(self, url, response):
+        """Store a fetched page in the archive; a failing archive doesn't fail the fetch."""
+        try:
+            self.archive.store(url, response.status_code, dict(response.headers), response.content)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Failed to archive {url}: {e}")
+    
     def set_headers(self, headers):
         """
         Set custom headers for requests.
@@ -81,35 +337,30 @@ class WebCrawler:
         
         Args:
             url (str): URL to crawl
-            css_selectors (list[str]): List of CSS selectors to target
+            css_selectors (list): CSS selector strings or selectors compiled by targets.load_targets
             
         Returns:
             list: List of extracted href URLs
         """
         # Get the page content
         html_content = self.get_page_content(url)
+        return self.links_from_html(url, html_content, css_selectors)
+    
+    def links_from_html(self, url, html_content, css_selectors):
+        """
+        Extract links from an already fetched listing page.
         
+        Args:
+            url (str): URL the page was fetched from
+            html_content (str): HTML of the page
+            css_selectors (list): CSS selector strings or selectors compiled by targets.load_targets
+            
+        Returns:
+            list: List of extracted href URLs
+        """
         if not html_content:
             return []
         
-        # Parse HTML
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Extract links from each selector
-        links = []
-        for selector in css_selectors:
-            # Find elements matching the selector
-            elements = soup.select(selector)
-            
-            # Extract all anchor tags from these elements
-            for element in elements:
-                anchors = element.find_all('a')
-                for anchor in anchors:
-                    href = anchor.get('href')
-                    if href:
-                        # Add to our links list if it's not already there
-                        if href not in links:
-                            links.append(href)
-        
-        return links
+        with metrics.timer("parse_links", host=metrics.host(url)):
+            return parse_links(html_content, css_selectors)
     
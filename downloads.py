@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Union
+
+
+CONTENT_TYPE_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/avif": ".avif",
+    "image/gif": ".gif",
+}
+
+
+def stream_to_file(response, file_path: str, chunk_size: int = 64 * 1024) -> str:
+    """
+    Stream a response body to disk and atomically move it into place.
+
+    The body is written chunk by chunk to a temporary file in the target
+    directory and renamed over file_path only once it is complete, so a
+    crash never leaves a truncated image behind.
+
+    Args:
+        response: A requests response opened with stream=True
+        file_path: Final path of the file
+        chunk_size: Bytes read per chunk
+
+    Returns:
+        SHA-256 hex digest of the written content
+    """
+    directory = os.path.dirname(file_path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    f.write(chunk)
+                    digest.update(chunk)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        response.close()
+
+    return digest.hexdigest()
+
+
+class DownloadManager:
+    """
+    Downloads Unsplash photos into a content-addressed on-disk cache.
+
+    Files are stored once per content hash under objects/ and an index maps
+    photo ids onto them, so a photo id is only ever downloaded once and two
+    ids with identical bytes share one file. Downloads stream to disk in
+    chunks and run on a bounded thread pool over the client's pooled session.
+    """
+
+    def __init__(self, api, cache_dir: str = "image_cache", max_workers: int = 4,
+                 chunk_size: int = 64 * 1024, timeout: float = 30):
+        """
+        Initialize the manager and load the cache index.
+
+        Args:
+            api: UnsplashAPI instance (its session and download endpoint are used)
+            cache_dir: Root directory of the cache
+            max_workers: Maximum number of concurrent downloads
+            chunk_size: Bytes read per chunk while streaming
+            timeout: Request timeout in seconds
+        """
+        self.api = api
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self._lock = threading.Lock()
+        self._id_locks: Dict[str, threading.Lock] = {}
+        self.index = self._load_index()
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable download index {self.index_path}: {e}")
+            return {}
+
+    def _save_index(self) -> None:
+        """Write the index atomically. Callers hold self._lock."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # A unique temp name, so processes sharing the cache never write into each other's
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _id_lock(self, photo_id: str) -> threading.Lock:
+        with self._lock:
+            return self._id_locks.setdefault(photo_id, threading.Lock())
+
+    def cached_path(self, photo_id: str) -> Optional[str]:
+        """
+        Return the cached file for a photo id, if it was downloaded before and still exists.
+
+        Args:
+            photo_id: The Unsplash photo ID
+        """
+        with self._lock:
+            entry = self.index.get(photo_id)
+        if entry:
+            path = os.path.join(self.cache_dir, entry["path"])
+            if os.path.exists(path):
+                return path
+        return None
+
+    def download(self, photo: Union[str, Dict[str, Any]]) -> str:
+        """
+        Download a photo unless it is already cached.
+
+        Args:
+            photo: Photo ID or photo info dict with an "id"
+
+        Returns:
+            Path to the cached image file
+        """
+        photo_id = photo if isinstance(photo, str) else photo.get("id")
+        if not photo_id:
+            raise ValueError("Photo ID not found")
+
+        cached = self.cached_path(photo_id)
+        if cached:
+            return cached
+
+        # Concurrent requests for the same id wait for the first download instead of repeating it
+        with self._id_lock(photo_id):
+            cached = self.cached_path(photo_id)
+            if cached:
+                return cached
+
+            # Unsplash requires hitting the download endpoint, which also returns the file URL
+            download_url = self.api.track_download(photo_id)
+
+            img_response = self.api.session.get(download_url, stream=True, timeout=self.timeout)
+            img_response.raise_for_status()
+
+            content_type = img_response.headers.get("Content-Type", "").split(";")[0].strip()
+            extension = CONTENT_TYPE_EXTENSIONS.get(content_type, ".jpg")
+
+            tmp_path = os.path.join(self.cache_dir, "tmp", f"{photo_id}{extension}")
+            sha256 = stream_to_file(img_response, tmp_path, chunk_size=self.chunk_size)
+
+            relative_path = os.path.join("objects", sha256[:2], f"{sha256}{extension}")
+            object_path = os.path.join(self.cache_dir, relative_path)
+            if os.path.exists(object_path):
+                # Same bytes already stored under another photo id
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                os.replace(tmp_path, object_path)
+
+            with self._lock:
+                self.index[photo_id] = {
+                    "path": relative_path,
+                    "sha256": sha256,
+                    "size": os.path.getsize(object_path),
+                }
+                self._save_index()
+
+            return object_path
+
+    def download_many(self, photos: List[Union[str, Dict[str, Any]]]) -> Dict[str, Union[str, Exception]]:
+        """
+        Download several photos concurrently on the bounded worker pool.
+
+        Args:
+            photos: Photo IDs or photo info dicts
+
+        Returns:
+            Mapping of photo ID to the cached path, or to the exception that download raised
+        """
+        ids = [photo if isinstance(photo, str) else photo.get("id") for photo in photos]
+        results: Dict[str, Union[str, Exception]] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="photo-download") as executor:
+            futures = {photo_id: executor.submit(self.download, photo_id) for photo_id in dict.fromkeys(ids)}
+            for photo_id, future in futures.items():
+                try:
+                    results[photo_id] = future.result()
+                except Exception as e:
+                    results[photo_id] = e
+
+        return results
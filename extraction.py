@@ -0,0 +1,227 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+import metrics
+import targets
+
+# Never article text, wherever they appear
+NON_CONTENT_TAGS = frozenset((
+    "script", "style", "noscript", "template", "iframe", "svg", "canvas",
+    "button", "input", "select", "textarea", "object", "embed",
+))
+# Page chrome; inside a selected element these are sidebars, not the article
+BOILERPLATE_TAGS = frozenset(("nav", "aside", "footer"))
+# class/id words of share buttons, ads, related-article and comment blocks
+BOILERPLATE_WORDS = frozenset((
+    "ad", "ads", "advert", "advertisement", "banner", "breadcrumb", "comment", "comments",
+    "cookie", "newsletter", "outbrain", "popup", "promo", "recommend", "related", "share",
+    "sns", "social", "sponsor", "sponsored", "subscribe", "taboola",
+))
+# Elements that start a new line of text
+BLOCK_TAGS = frozenset((
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "figcaption",
+    "figure", "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main",
+    "ol", "p", "pre", "section", "table", "td", "th", "tr", "ul",
+))
+PARAGRAPH_TAGS = ("p", "pre", "blockquote", "li", "td")
+
+TEXT_TYPES = (NavigableString, CData)
+WHITESPACE = re.compile("[\\s\u200b\u200c\u200d\ufeff]+")
+ATTRIBUTE_WORDS = re.compile(r"[^a-z0-9]+")
+CLAUSE_MARKS = re.compile(r"[,.;:!?、。，．！？]")
+
+
+@lru_cache(maxsize=4096)
+def _boilerplate_name(name: str) -> bool:
+    """Whether a class or id names boilerplate; pages repeat the same few names."""
+    return any(word in BOILERPLATE_WORDS for word in ATTRIBUTE_WORDS.split(name.lower()))
+
+
+def is_boilerplate(tag: Tag) -> bool:
+    """Return True for an element whose text never belongs to an article."""
+    if tag.name in NON_CONTENT_TAGS or tag.name in BOILERPLATE_TAGS:
+        return True
+    attrs = tag.attrs
+    if not attrs:
+        return False
+    if "hidden" in attrs or attrs.get("aria-hidden") == "true":
+        return True
+    if any(_boilerplate_name(name) for name in attrs.get("class") or ()):
+        return True
+    element_id = attrs.get("id")
+    return bool(element_id) and _boilerplate_name(element_id)
+
+
+def _text_parts(element: Tag, parts: List[str]) -> None:
+    """Append the text of an element's children to parts, with a line break around each block."""
+    for child in element.contents:
+        if isinstance(child, Tag):
+            if is_boilerplate(child):
+                continue
+            if child.name in BLOCK_TAGS:
+                parts.append("\n")
+                _text_parts(child, parts)
+                parts.append("\n")
+            else:
+                _text_parts(child, parts)
+        elif type(child) in TEXT_TYPES:
+            parts.append(WHITESPACE.sub(" ", child))
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace within lines and drop empty lines."""
+    lines = (" ".join(line.split()) for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def element_text(element: Tag) -> str:
+    """
+    Return the text of an element without its boilerplate.
+
+    Scripts, styles, form controls, navigation, sidebars and blocks such as
+    share buttons, ads, comments and related articles (recognized by their
+    class or id) are skipped; the element itself is never skipped. Block
+    elements become line breaks and all other whitespace is collapsed, so
+    paragraphs stay apart without spending tokens on indentation.
+
+    Args:
+        element: Element selected from a parsed page
+
+    Returns:
+        str: Normalized text, one block per line
+    """
+    parts: List[str] = []
+    _text_parts(element, parts)
+    return normalize_text("".join(parts))
+
+
+def _link_length(element: Tag) -> int:
+    """Characters of link text in an element, boilerplate excluded."""
+    length = 0
+    for child in element.children:
+        if isinstance(child, Tag) and not is_boilerplate(child):
+            length += len(element_text(child)) if child.name == "a" else _link_length(child)
+    return length
+
+
+def main_content(soup, min_length: int = 200):
+    """
+    Find the element holding a page's article body, for when the content selector misses.
+
+    Paragraph-like elements (and divs carrying their own text, as in
+    <br>-separated layouts) score by length and clause count. Each score
+    goes to the paragraph's container and half of it to the container's
+    parent, so the element around the densest run of paragraphs wins.
+    Scores are scaled down by the share of link text, which is what
+    navigation and related-article lists are made of.
+
+    Args:
+        soup: Parsed page
+        min_length: Fewest characters of text the winner must have
+
+    Returns:
+        The best element, or None if no element holds enough text
+    """
+    # id(element) -> [element, score]; Tags compare by content, not identity
+    scores = {}
+
+    def add(element, score):
+        if isinstance(element, Tag):
+            scores.setdefault(id(element), [element, 0.0])[1] += score
+
+    candidates = [(paragraph, paragraph.parent) for paragraph in soup.find_all(PARAGRAPH_TAGS)]
+    for div in soup.find_all("div"):
+        if any(type(child) in TEXT_TYPES and len(child.strip()) >= 25 for child in div.children):
+            candidates.append((div, div))
+
+    # id(element) -> whether it or an ancestor is boilerplate; candidates share most ancestors
+    excluded = {}
+
+    def in_boilerplate(element):
+        key = id(element)
+        if key not in excluded:
+            parent = element.parent
+            excluded[key] = is_boilerplate(element) or (parent is not None and parent.name is not None
+                                                        and in_boilerplate(parent))
+        return excluded[key]
+
+    for paragraph, container in candidates:
+        if container is None or in_boilerplate(paragraph):
+            continue
+        text = " ".join(paragraph.get_text().split())
+        if len(text) < 25:
+            continue
+        score = 1 + len(CLAUSE_MARKS.findall(text)) + min(len(text) // 100, 3)
+        add(container, score)
+        add(container.parent, score / 2)
+
+    best, best_score = None, 0.0
+    for element, score in scores.values():
+        text = element_text(element)
+        if len(text) < min_length:
+            continue
+        score *= 1 - min(_link_length(element) / len(text), 1.0)
+        if score > best_score:
+            best, best_score = element, score
+    return best
+
+
+def parse_fields(html_content: str, selector_map: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[bool]]:
+    """
+    extract_fields without the metrics, for parsing workers whose metrics the parent records.
+
+    Returns:
+        tuple: (fields, fallback) where fallback is None if the content
+        selector matched, else whether main_content found the content
+    """
+    soup = BeautifulSoup(html_content, 'html.parser')
+    result = {}
+
+    for key, selector in selector_map.items():
+        elements = targets.select(soup, selector)
+        if elements:
+            # If multiple elements found, collect them in a list
+            if len(elements) > 1:
+                result[key] = [element_text(elem) for elem in elements]
+            else:
+                result[key] = element_text(elements[0])
+        else:
+            result[key] = None
+
+    fallback = None
+    if "content" in result and result["content"] is None:
+        element = main_content(soup)
+        fallback = element is not None
+        if element is not None:
+            result["content"] = element_text(element)
+
+    return result, fallback
+
+
+def count_fallback(fallback: Optional[bool]) -> None:
+    """Count a content fallback reported by parse_fields."""
+    if fallback is not None:
+        metrics.inc("content_fallback_total", result="found" if fallback else "missed")
+
+
+def extract_fields(html_content: str, selector_map: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract the text of each field of a page using CSS selectors.
+
+    Every field's text comes from element_text. If the "content" selector
+    matches nothing, the content is taken from main_content instead, and
+    the attempt is counted in content_fallback_total.
+
+    Args:
+        html_content: HTML content to parse
+        selector_map: Field -> CSS selector (a string or compiled by targets.load_targets)
+
+    Returns:
+        dict: Field -> text, a list of texts if several elements matched, or None if none did
+    """
+    fields, fallback = parse_fields(html_content, selector_map)
+    count_fallback(fallback)
+    return fields
@@ -0,0 +1,168 @@
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+from cms_client import GhostCmsClient
+from downloads import DownloadManager
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow is optional; without it the original file is uploaded as is
+    Image = None
+    features = None
+
+
+# Widths our theme declares in package.json "image_sizes". Ghost derives the
+# /size/w{N}/ variants from the uploaded original, so the upload itself only
+# needs to be as wide as the largest breakpoint.
+THEME_BREAKPOINTS = (300, 600, 1000, 2000)
+
+# Preferred output encodings, first supported one wins
+OUTPUT_FORMATS = ("WEBP", "AVIF")
+
+FORMAT_EXTENSIONS = {
+    "WEBP": ".webp",
+    "AVIF": ".avif",
+    "JPEG": ".jpg",
+}
+
+
+class FeatureImageStage:
+    """
+    Turns an Unsplash photo record into a feature image hosted by Ghost itself.
+
+    The photo is downloaded through the DownloadManager, scaled down to the
+    largest theme breakpoint, re-encoded (WebP by default) and uploaded once
+    through the Ghost images API. The resulting Ghost URL is cached by photo
+    id, so a photo that is reused is never uploaded again.
+    """
+
+    def __init__(self, ghost_client: GhostCmsClient, downloads: DownloadManager,
+                 cache_path: str = "ghost_images.json", breakpoints: Tuple[int, ...] = THEME_BREAKPOINTS,
+                 formats: Tuple[str, ...] = OUTPUT_FORMATS, quality: int = 80):
+        """
+        Initialize the stage and load the uploaded-image cache.
+
+        Args:
+            ghost_client: Client used for the upload
+            downloads: Download manager providing the original files
+            cache_path: JSON file mapping photo ids to Ghost image URLs
+            breakpoints: Theme image widths; the upload is capped at the largest
+            formats: Output encodings in order of preference
+            quality: Encoder quality (0-100)
+        """
+        self.ghost_client = ghost_client
+        self.downloads = downloads
+        self.cache_path = cache_path
+        self.max_width = max(breakpoints)
+        self.formats = formats
+        self.quality = quality
+        self._lock = threading.Lock()
+        self.uploaded: Dict[str, str] = self._load_cache()
+
+    def _load_cache(self) -> Dict[str, str]:
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable feature image cache {self.cache_path}: {e}")
+            return {}
+
+    def _save_cache(self) -> None:
+        """Write the cache atomically. Callers hold self._lock."""
+        # A unique temp name, so processes sharing the file never write into each other's
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.cache_path) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.uploaded, f)
+            os.replace(tmp_path, self.cache_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def output_format(self) -> Optional[str]:
+        """Return the first configured encoding this Pillow build supports, or None without Pillow."""
+        if Image is None:
+            return None
+        for name in self.formats:
+            if name == "JPEG" or features.check(name.lower()):
+                return name
+        return None
+
+    def optimize(self, source_path: str, photo_id: str) -> str:
+        """
+        Scale an image down to the largest breakpoint and re-encode it.
+
+        Args:
+            source_path: Original image file
+            photo_id: Photo ID, used to name the output
+
+        Returns:
+            Path of the optimized file, or source_path if it can't be optimized here
+        """
+        output_format = self.output_format()
+        if output_format is None:
+            return source_path
+
+        output_dir = os.path.join(self.downloads.cache_dir, "optimized")
+        output_path = os.path.join(output_dir, f"{photo_id}-w{self.max_width}{FORMAT_EXTENSIONS[output_format]}")
+        if os.path.exists(output_path):
+            return output_path
+
+        os.makedirs(output_dir, exist_ok=True)
+        with Image.open(source_path) as image:
+            if image.width > self.max_width:
+                height = round(image.height * self.max_width / image.width)
+                image = image.resize((self.max_width, height), Image.LANCZOS)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGB")
+
+            tmp_path = f"{output_path}.tmp"
+            image.save(tmp_path, format=output_format, quality=self.quality)
+        os.replace(tmp_path, output_path)
+
+        return output_path
+
+    def prepare(self, photo: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Return the photo record with its "url" pointing at the Ghost-hosted copy.
+
+        Any failure leaves the record unchanged, so the post falls back to the Unsplash URL.
+
+        Args:
+            photo: Photo info dict as returned by UnsplashAPI or ImagePool
+
+        Returns:
+            The photo info dict, with "url" replaced when the image is hosted by Ghost
+        """
+        photo_id = photo.get("id") if photo else None
+        if not photo_id:
+            return photo
+
+        with self._lock:
+            hosted_url = self.uploaded.get(photo_id)
+        if hosted_url:
+            return {**photo, "url": hosted_url}
+
+        try:
+            source_path = self.downloads.download(photo)
+            upload_path = self.optimize(source_path, photo_id)
+            hosted_url = self.ghost_client.upload_image(upload_path, ref=photo_id)
+        except Exception as e:
+            # Including requests errors of the upload: the post must not be lost over its image
+            print(f"Feature image preparation failed for {photo_id}: {e}")
+            return photo
+
+        if not hosted_url:
+            return photo
+
+        with self._lock:
+            self.uploaded[photo_id] = hosted_url
+            self._save_cache()
+
+        return {**photo, "url": hosted_url}
@@ -1,37 +1,56 @@
 import requests
 import json
-from bs4 import BeautifulSoup
+import os
+import time
+
+import extraction
+import metrics
+
+
+def response_text(response):
+    """
+    Pull the generated text out of a generateContent response.
+    
+    Args:
+        response (dict): A GenerateContentResponse as a dictionary
+        
+    Returns:
+        str: The generated text response or error message
+    """
+    try:
+        return response["candidates"][0]["content"]["parts"][0]["text"]
+    except (KeyError, IndexError, TypeError):
+        return f"Error: {response.get('error', {}).get('message', 'Unknown error')}"
+
 
 class GeminiClient:
     """A client for interacting with Google's Gemini API."""
     
     BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
     
-    def __init__(self, api_key):
+    def __init__(self, api_key, base_url=None):
         """
         Initialize the Gemini client.
         
         Args:
             api_key (str): Your Gemini API key
+            base_url (str, optional): Override for the API root (e.g. a local stand-in server)
         """
         self.api_key = api_key
-        
-    def generate_content(self, model="gemini-2.0-flash-lite", prompt="", temperature=None, max_tokens=None):
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+    
+    def build_request(self, prompt, temperature=None, max_tokens=None):
         """
-        Generate content using the Gemini API.
+        Build a generateContent request body.
         
         Args:
-            model (str): Model name to use (default: gemini-2.0-flash-lite)
             prompt (str): Text prompt for the model
             temperature (float, optional): Controls randomness (0.0-1.0)
             max_tokens (int, optional): Maximum number of tokens to generate
             
         Returns:
-            dict: The API response as a dictionary
+            dict: The request payload
         """
-        url = f"{self.BASE_URL}/models/{model}:generateContent?key={self.api_key}"
-        
-        # Prepare request payload
         payload = {
             "contents": [{
                 "parts": [{"text": prompt}]
@@ -47,12 +66,40 @@ class GeminiClient:
             
         if generation_config:
             payload["generationConfig"] = generation_config
+        
+        return payload
+        
+    def generate_content(self, model="gemini-2.0-flash-lite", prompt="", temperature=None, max_tokens=None):
+        """
+        Generate content using the Gemini API.
+        
+        Args:
+            model (str): Model name to use (default: gemini-2.0-flash-lite)
+            prompt (str): Text prompt for the model
+            temperature (float, optional): Controls randomness (0.0-1.0)
+            max_tokens (int, optional): Maximum number of tokens to generate
+            
+        Returns:
+            dict: The API response as a dictionary
+        """
+        url = f"{self.base_url}/models/{model}:generateContent?key={self.api_key}"
+        
+        # Prepare request payload
+        payload = self.build_request(prompt, temperature=temperature, max_tokens=max_tokens)
             
         # Make the API call
         headers = {"Content-Type": "application/json"}
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
+        with metrics.timer("gemini", model=model):
+            response = requests.post(url, headers=headers, data=json.dumps(payload))
         
-        return response.json()
+        result = response.json()
+        if metrics.registry.enabled:
+            metrics.inc("http_responses_total", stage="gemini", status=response.status_code)
+            usage = result.get("usageMetadata", {}) if isinstance(result, dict) else {}
+            metrics.inc("gemini_tokens_total", usage.get("promptTokenCount", 0), kind="prompt", model=model)
+            metrics.inc("gemini_tokens_total", usage.get("candidatesTokenCount", 0), kind="output", model=model)
+        
+        return result
     
     def get_text_response(self, prompt, model="gemini-2.0-flash-lite"):
         """
@@ -66,51 +113,301 @@ class GeminiClient:
             str: The generated text response or error message
         """
         response = self.generate_content(model=model, prompt=prompt)
-        
-        try:
-            return response["candidates"][0]["content"]["parts"][0]["text"]
-        except (KeyError, IndexError):
-            return f"Error: {response.get('error', {}).get('message', 'Unknown error')}"
+        return response_text(response)
 
 
-    def extract_content_from_html(self, html_content, selector_map, custom_prompt=None):
+    def extract_fields(self, html_content, selector_map):
+        """
+        Extract the text of each field of a page using CSS selectors.
+        
+        Texts leave out scripts, share buttons, ads and other boilerplate
+        inside the selected elements. If the "content" selector matches
+        nothing, the content is taken from the page's densest block of text
+        instead (see extraction.extract_fields).
+        
+        Args:
+            html_content (str): HTML content to parse
+            selector_map (dict): Dictionary mapping keys to CSS selectors
+                (strings or selectors compiled by targets.load_targets)
+                Example: {"title": "h1.main-title", "price": "span.price"}
+                
+        Returns:
+            dict: Field -> text, a list of texts if several elements matched, or None if none did
+        """
+        return extraction.extract_fields(html_content, selector_map)
+    
+    def format_fields(self, fields):
+        """
+        Format extracted fields as "-key : value" lines.
+        
+        Args:
+            fields (dict): Output of extract_fields()
+            
+        Returns:
+            str: Formatted string with one "-key : value" pair per line
+        """
+        formatted_result = ""
+        for key, value in fields.items():
+            value_str = str(value) if value is not None else ""
+            formatted_result += f"-{key} : {value_str}\n"
+        return formatted_result
+    
+    def format_extracted(self, html_content, selector_map):
         """
         Extract content from HTML using CSS selectors and format as key-value pairs.
         
         Args:
             html_content (str): HTML content to parse
             selector_map (dict): Dictionary mapping keys to CSS selectors
+                (strings or selectors compiled by targets.load_targets)
                 Example: {"title": "h1.main-title", "price": "span.price"}
-            custom_prompt (str, optional): Custom prompt to guide extraction process
                 
         Returns:
             str: Formatted string with extracted content as "-key : value" pairs
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
-        result = {}
-        formatted_result = ""
+        return self.format_fields(self.extract_fields(html_content, selector_map))
+    
+    def build_prompt(self, custom_prompt, extracted):
+        """
+        Combine a custom prompt with already extracted content.
         
-        for key, selector in selector_map.items():
-            elements = soup.select(selector)
-            if elements:
-                # If multiple elements found, collect them in a list
-                if len(elements) > 1:
-                    result[key] = [elem.get_text(strip=True) for elem in elements]
-                else:
-                    result[key] = elements[0].get_text(strip=True)
-            else:
-                result[key] = None
+        Args:
+            custom_prompt (str): Instructions for the model
+            extracted (str): Output of format_extracted()
+            
+        Returns:
+            str: The full prompt text
+        """
+        return f"{custom_prompt}\n\nExtracted content:\n{extracted}"
+
+    def extract_content_from_html(self, html_content, selector_map, custom_prompt=None):
+        """
+        Extract content from HTML using CSS selectors and format as key-value pairs.
+        
+        Args:
+            html_content (str): HTML content to parse
+            selector_map (dict): Dictionary mapping keys to CSS selectors
+                Example: {"title": "h1.main-title", "price": "span.price"}
+            custom_prompt (str, optional): Custom prompt to guide extraction process
                 
-            # Format as "-key : value"
-            value_str = str(result[key]) if result[key] is not None else ""
-            formatted_result += f"-{key} : {value_str}\n"
+        Returns:
+            str: Formatted string with extracted content as "-key : value" pairs
+        """
+        formatted_result = self.format_extracted(html_content, selector_map)
         
         # Apply custom prompt to format or enhance the extraction if provided
         if custom_prompt and formatted_result:
-            prompt = f"{custom_prompt}\n\nExtracted content:\n{formatted_result}"
-            formatted_result = self.get_text_response(prompt)
+            formatted_result = self.get_text_response(self.build_prompt(custom_prompt, formatted_result))
             
         return formatted_result.strip()
 
 
 
+class GeminiBatch:
+    """
+    Runs many prompts through the Gemini batch API instead of one generateContent call each.
+    
+    Prompts are appended to a JSONL job file as they are added (one
+    ``{"key": ..., "request": ...}`` object per line), so a job survives a
+    crashed run. Once submitted, the batch name is written next to the job
+    file and later runs resume polling the same batch instead of paying for
+    it twice.
+    """
+    
+    TERMINAL_STATES = ("BATCH_STATE_SUCCEEDED", "BATCH_STATE_FAILED", "BATCH_STATE_CANCELLED", "BATCH_STATE_EXPIRED")
+    
+    def __init__(self, client, job_path, model="gemini-2.0-flash-lite", display_name=None):
+        """
+        Initialize a batch job.
+        
+        Args:
+            client (GeminiClient): Client providing the API key and base URL
+            job_path (str): Path of the JSONL job file
+            model (str): Model name to use for every request in the batch
+            display_name (str, optional): Name shown for the batch in AI Studio
+        """
+        self.client = client
+        self.job_path = job_path
+        self.state_path = f"{job_path}.state.json"
+        self.model = model
+        self.display_name = display_name or os.path.splitext(os.path.basename(job_path))[0]
+        self.batch_name = self._load_state().get("name")
+    
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _save_state(self, state):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+    
+    def add(self, key, prompt, temperature=None, max_tokens=None, metadata=None):
+        """
+        Append a prompt to the job file.
+        
+        Args:
+            key (str): Identifier used to match the result back to its prompt
+            prompt (str): Text prompt for the model
+            temperature (float, optional): Controls randomness (0.0-1.0)
+            max_tokens (int, optional): Maximum number of tokens to generate
+            metadata (dict, optional): Local data kept with the request in the job file (not sent)
+        """
+        if self.batch_name:
+            raise RuntimeError(f"Batch {self.batch_name} was already submitted")
+        
+        directory = os.path.dirname(self.job_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        line = {
+            "key": str(key),
+            "request": self.client.build_request(prompt, temperature=temperature, max_tokens=max_tokens),
+        }
+        if metadata:
+            line["metadata"] = metadata
+        with open(self.job_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    
+    def requests(self):
+        """
+        Read the requests accumulated in the job file.
+        
+        Returns:
+            list: List of {"key", "request"} dictionaries
+        """
+        if not os.path.exists(self.job_path):
+            return []
+        with open(self.job_path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    
+    def metadata(self):
+        """
+        Read the local metadata stored with the requests.
+        
+        Returns:
+            dict: Mapping of key to metadata for requests added with metadata
+        """
+        return {line["key"]: line["metadata"] for line in self.requests() if "metadata" in line}
+    
+    def submit(self):
+        """
+        Submit the job file as a batch, unless it was submitted before.
+        
+        Returns:
+            str: The batch name (e.g. "batches/123")
+        """
+        if self.batch_name:
+            return self.batch_name
+        
+        lines = self.requests()
+        if not lines:
+            raise ValueError(f"No requests in {self.job_path}")
+        
+        url = f"{self.client.base_url}/models/{self.model}:batchGenerateContent?key={self.client.api_key}"
+        payload = {
+            "batch": {
+                "display_name": self.display_name,
+                "input_config": {
+                    "requests": {
+                        "requests": [
+                            {"request": line["request"], "metadata": {"key": line["key"]}}
+                            for line in lines
+                        ]
+                    }
+                }
+            }
+        }
+        
+        headers = {"Content-Type": "application/json"}
+        response = requests.post(url, headers=headers, data=json.dumps(payload))
+        response.raise_for_status()
+        
+        self.batch_name = response.json()["name"]
+        self._save_state({"name": self.batch_name, "model": self.model, "count": len(lines)})
+        print(f"Submitted batch {self.batch_name} with {len(lines)} requests")
+        return self.batch_name
+    
+    def poll(self):
+        """
+        Fetch the current batch operation.
+        
+        Returns:
+            dict: The batch operation as a dictionary
+        """
+        if not self.batch_name:
+            raise RuntimeError("Batch has not been submitted")
+        
+        url = f"{self.client.base_url}/{self.batch_name}?key={self.client.api_key}"
+        response = requests.get(url)
+        response.raise_for_status()
+        return response.json()
+    
+    @classmethod
+    def is_done(cls, operation):
+        """Return True once the batch operation has reached a terminal state."""
+        if operation.get("done"):
+            return True
+        return operation.get("metadata", {}).get("state") in cls.TERMINAL_STATES
+    
+    def results(self, operation):
+        """
+        Map a finished batch operation back to texts by key.
+        
+        Args:
+            operation (dict): A finished batch operation
+            
+        Returns:
+            dict: Mapping of key to generated text (or an "Error: ..." string)
+        """
+        output = operation.get("response") or operation.get("metadata", {}).get("output") or {}
+        inlined = output.get("inlinedResponses", [])
+        if isinstance(inlined, dict):
+            inlined = inlined.get("inlinedResponses", [])
+        
+        results = {}
+        for item in inlined:
+            key = item.get("metadata", {}).get("key")
+            if key is None:
+                continue
+            if "response" in item:
+                results[key] = response_text(item["response"])
+            else:
+                results[key] = f"Error: {item.get('error', {}).get('message', 'Unknown error')}"
+        return results
+    
+    def wait(self, poll_interval=30, timeout=None):
+        """
+        Submit the batch if necessary and block until its results are available.
+        
+        Args:
+            poll_interval (float): Seconds between status checks
+            timeout (float, optional): Give up after this many seconds
+            
+        Returns:
+            dict: Mapping of key to generated text
+            
+        Raises:
+            TimeoutError: If the batch is still running after timeout seconds
+            RuntimeError: If the batch ended in a state other than succeeded
+        """
+        self.submit()
+        started = time.monotonic()
+        
+        while True:
+            operation = self.poll()
+            if self.is_done(operation):
+                break
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(f"Batch {self.batch_name} still running after {timeout} seconds")
+            time.sleep(poll_interval)
+        
+        state = operation.get("metadata", {}).get("state")
+        if operation.get("error") or state not in (None, "BATCH_STATE_SUCCEEDED"):
+            message = operation.get("error", {}).get("message", state)
+            raise RuntimeError(f"Batch {self.batch_name} failed: {message}")
+        
+        return self.results(operation)
@@ -0,0 +1,269 @@
+import argparse
+import sqlite3
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+
+class TargetHealth:
+    """
+    Per-target health records with automatic quarantine, stored in SQLite.
+
+    Every listing fetch and every article extraction of a target is
+    recorded. A listing that can't be fetched or whose list_pattern matches
+    no links, and an article that can't be fetched or whose content selector
+    comes back empty, count as failures. A good listing only clears the
+    listing failures of the streak: every article is preceded by its
+    listing, so a target whose article selectors broke would otherwise
+    never build one. After failure_threshold consecutive failures the
+    target is quarantined: it is skipped, saving fetches and
+    Gemini calls, until its re-probe time. The first run after that probes
+    it again; a success releases it, another failure quarantines it for
+    twice as long (up to probe_max).
+    """
+
+    def __init__(self, db_path: str = "target_health.db", failure_threshold: int = 3,
+                 probe_base: float = 3600, probe_max: float = 7 * 86400):
+        """Initialize the database connection and create table if it doesn't exist.
+
+        Args:
+            db_path: Path to the SQLite database file
+            failure_threshold: Consecutive failures that quarantine a target
+            probe_base: Seconds until the first re-probe of a quarantined target
+            probe_max: Upper bound in seconds on the re-probe delay
+        """
+        self.db_path = db_path
+        self.failure_threshold = failure_threshold
+        self.probe_base = probe_base
+        self.probe_max = probe_max
+        self._ensure_table_exists()
+
+    def _get_connection(self) -> Tuple[sqlite3.Connection, sqlite3.Cursor]:
+        """Create and return a database connection and cursor.
+
+        Returns:
+            Tuple of (connection, cursor)
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        return conn, cursor
+
+    def _ensure_table_exists(self) -> None:
+        """Create the table if it doesn't already exist."""
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS target_health (
+                    ctr TEXT PRIMARY KEY,
+                    url TEXT,
+                    listing_fetches INTEGER NOT NULL DEFAULT 0,
+                    listing_errors INTEGER NOT NULL DEFAULT 0,
+                    empty_listings INTEGER NOT NULL DEFAULT 0,
+                    links_found INTEGER NOT NULL DEFAULT 0,
+                    article_fetches INTEGER NOT NULL DEFAULT 0,
+                    article_errors INTEGER NOT NULL DEFAULT 0,
+                    empty_extractions INTEGER NOT NULL DEFAULT 0,
+                    articles_extracted INTEGER NOT NULL DEFAULT 0,
+                    consecutive_failures INTEGER NOT NULL DEFAULT 0,
+                    article_failures INTEGER NOT NULL DEFAULT 0,
+                    quarantine_count INTEGER NOT NULL DEFAULT 0,
+                    quarantined_until REAL NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    last_success_at REAL,
+                    updated_at REAL
+                )
+            """)
+
+            # Databases from before the article streak was kept apart
+            cursor.execute("PRAGMA table_info(target_health)")
+            if "article_failures" not in {row["name"] for row in cursor.fetchall()}:
+                cursor.execute("ALTER TABLE target_health ADD COLUMN article_failures INTEGER NOT NULL DEFAULT 0")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _record(self, ctr: str, url: Optional[str], counters: Dict[str, int], error: Optional[str],
+                article: bool = False) -> bool:
+        """Add to a target's counters and update its failure streak and quarantine.
+
+        Args:
+            ctr: Target id
+            url: Target listing URL, kept for the report
+            counters: Column -> increment
+            error: Failure description, or None for a success
+            article: True for an article record, False for a listing record
+
+        Returns:
+            True if this record put the target into quarantine
+        """
+        now = time.time()
+        conn, cursor = self._get_connection()
+        try:
+            # Read-modify-write of the streak, so concurrent writers must not interleave
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("INSERT OR IGNORE INTO target_health (ctr) VALUES (?)", (ctr,))
+            cursor.execute("SELECT * FROM target_health WHERE ctr = ?", (ctr,))
+            row = dict(cursor.fetchone())
+
+            updates = {column: row[column] + value for column, value in counters.items()}
+            updates["updated_at"] = now
+            if url:
+                updates["url"] = url
+
+            quarantined = False
+            if error is None and (article or not row["article_failures"]):
+                if row["quarantine_count"]:
+                    print(f"Target {ctr} recovered after {row['quarantine_count']} quarantine(s)")
+                updates.update(consecutive_failures=0, article_failures=0, quarantine_count=0, quarantined_until=0,
+                               last_success_at=now)
+            elif error is None:
+                # A good listing says nothing about the article failures, which stay in the streak
+                updates.update(consecutive_failures=row["article_failures"], last_success_at=now)
+            else:
+                failures = row["consecutive_failures"] + 1
+                updates.update(consecutive_failures=failures, last_error=error)
+                if article:
+                    updates["article_failures"] = row["article_failures"] + 1
+                # A target on probation (quarantined before, no success since) goes back on the first failure
+                if row["quarantine_count"] or failures >= self.failure_threshold:
+                    delay = min(self.probe_base * (2 ** row["quarantine_count"]), self.probe_max)
+                    updates.update(quarantine_count=row["quarantine_count"] + 1, quarantined_until=now + delay)
+                    quarantined = True
+                    print(f"Target {ctr} quarantined for {delay / 3600:.1f}h after {failures} consecutive failures: {error}")
+
+            assignments = ", ".join(f"{column} = ?" for column in updates)
+            cursor.execute(
+                f"UPDATE target_health SET {assignments} WHERE ctr = ?",
+                (*updates.values(), ctr)
+            )
+            conn.commit()
+            return quarantined
+        finally:
+            conn.close()
+
+    def record_listing(self, ctr: str, url: Optional[str] = None, links: int = 0, fetched: bool = True) -> bool:
+        """Record a listing page fetch.
+
+        Args:
+            ctr: Target id
+            url: Listing URL
+            links: Number of links the list_pattern selectors matched
+            fetched: False if the page couldn't be fetched
+
+        Returns:
+            True if the target was quarantined by this record
+        """
+        counters = {"listing_fetches": 1, "links_found": links}
+        error = None
+        if not fetched:
+            counters["listing_errors"] = 1
+            error = "listing fetch failed"
+        elif not links:
+            counters["empty_listings"] = 1
+            error = "list_pattern matched no links"
+        return self._record(ctr, url, counters, error)
+
+    def record_article(self, ctr: str, fetched: bool = True, extracted: bool = True) -> bool:
+        """Record an article fetch and extraction.
+
+        Args:
+            ctr: Target id
+            fetched: False if the article page couldn't be fetched
+            extracted: False if the content selector came back empty
+
+        Returns:
+            True if the target was quarantined by this record
+        """
+        counters = {"article_fetches": 1}
+        error = None
+        if not fetched:
+            counters["article_errors"] = 1
+            error = "article fetch failed"
+        elif not extracted:
+            counters["empty_extractions"] = 1
+            error = "content selector matched nothing"
+        else:
+            counters["articles_extracted"] = 1
+        return self._record(ctr, None, counters, error, article=True)
+
+    def is_available(self, ctr: str, now: Optional[float] = None) -> bool:
+        """Return False while a target is quarantined and its re-probe time hasn't come yet.
+
+        Args:
+            ctr: Target id
+            now: Current time (defaults to time.time())
+        """
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute("SELECT quarantined_until FROM target_health WHERE ctr = ?", (ctr,))
+            row = cursor.fetchone()
+            return row is None or row["quarantined_until"] <= (now if now is not None else time.time())
+        finally:
+            conn.close()
+
+    def release(self, ctr: str) -> bool:
+        """Lift a target's quarantine and reset its failure streak, e.g. after fixing its selectors.
+
+        Returns:
+            True if the target had a health record
+        """
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute(
+                "UPDATE target_health SET consecutive_failures = 0, article_failures = 0, quarantine_count = 0, "
+                "quarantined_until = 0 "
+                "WHERE ctr = ?",
+                (ctr,)
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Return every target's record with its error rate and extraction yield.
+
+        Returns:
+            A list of dictionaries, one per target, with "error_rate" (failed
+            fetches per fetch) and "yield" (articles with content per article fetched)
+        """
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute("SELECT * FROM target_health ORDER BY ctr")
+            rows = [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+        for row in rows:
+            fetches = row["listing_fetches"] + row["article_fetches"]
+            row["error_rate"] = (row["listing_errors"] + row["article_errors"]) / fetches if fetches else 0.0
+            row["yield"] = row["articles_extracted"] / row["article_fetches"] if row["article_fetches"] else None
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show target health or release quarantined targets")
+    parser.add_argument("--db", type=str, default="target_health.db", help="Target health database")
+    parser.add_argument("--release", nargs="+", metavar="CTR", default=[], help="Lift the quarantine of these targets")
+    args = parser.parse_args()
+
+    health = TargetHealth(db_path=args.db)
+    for ctr in args.release:
+        print(f"{ctr}: {'released' if health.release(ctr) else 'no health record'}")
+
+    now = time.time()
+    print(f"{'ctr':12s} {'status':22s} {'errors':>7s} {'yield':>6s} {'links':>7s} {'streak':>6s}  last error")
+    for row in health.report():
+        if row["quarantined_until"] > now:
+            status = f"quarantined {(row['quarantined_until'] - now) / 3600:.1f}h"
+        elif row["quarantine_count"]:
+            status = "probing"
+        else:
+            status = "ok"
+        yield_text = f"{row['yield']:.0%}" if row["yield"] is not None else "-"
+        print(f"{row['ctr']:12s} {status:22s} {row['error_rate']:7.0%} {yield_text:>6s} {row['links_found']:7d} "
+              f"{row['consecutive_failures']:6d}  {row['last_error'] or ''}")
+
+
+if __name__ == "__main__":
+    main()
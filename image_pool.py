@@ -0,0 +1,251 @@
+import json
+import os
+import random
+import threading
+from collections import deque
+from typing import List, Dict, Any, Optional
+
+from unsplash import UnsplashAPI
+
+
+# Topic clusters we publish about, each with the queries used to fill its pool.
+# Gemini keywords are mapped onto a cluster by the words they share with it.
+DEFAULT_TOPICS = {
+    "security": ["cybersecurity", "hacker", "data security"],
+    "cloud": ["cloud computing", "data center", "server room"],
+    "ai": ["artificial intelligence", "robot", "machine learning"],
+    "mobile": ["smartphone", "mobile app", "tablet"],
+    "software": ["software development", "programming", "source code"],
+    "hardware": ["semiconductor", "computer chip", "circuit board"],
+    "business": ["technology business", "startup office", "business meeting"],
+    "technology": ["technology", "computer", "digital"],
+}
+
+DEFAULT_CLUSTER = "technology"
+
+
+class ImagePool:
+    """
+    A rotating pool of pre-fetched Unsplash photo records per topic cluster.
+
+    take() serves a photo from memory in O(1) without touching the network;
+    refill() tops pools up in the background through search_photos and
+    get_random_photos. Photos are de-duplicated across the pool and are not
+    handed out again while they are inside the reuse window. The pool and
+    the reuse window are persisted to a JSON file so short cron runs start
+    warm.
+    """
+
+    def __init__(self, api: UnsplashAPI, topics: Dict[str, List[str]] = None, path: str = "image_pool.json",
+                 target_size: int = 30, low_water: int = 10, reuse_window: int = 300,
+                 max_requests_per_refill: int = 4):
+        """
+        Initialize the pool and load its persisted state.
+
+        Args:
+            api: Client used to refill the pool
+            topics: Mapping of cluster name to the search queries that fill it
+            path: JSON file the pool is persisted to
+            target_size: Number of photos a refill tops each cluster up to
+            low_water: A cluster with fewer photos than this is refilled
+            reuse_window: Number of most recently taken photos that won't be served again
+            max_requests_per_refill: Upper bound on API requests one refill may spend
+        """
+        self.api = api
+        self.topics = topics or DEFAULT_TOPICS
+        self.path = path
+        self.target_size = target_size
+        self.low_water = low_water
+        self.max_requests_per_refill = max_requests_per_refill
+
+        self.pools: Dict[str, deque] = {cluster: deque() for cluster in self.topics}
+        self.recent: deque = deque(maxlen=reuse_window)
+        self._recent_ids = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Word -> cluster lookup for mapping free-form keywords
+        self._word_index: Dict[str, str] = {}
+        for cluster, queries in self.topics.items():
+            self._word_index.setdefault(cluster.lower(), cluster)
+            for query in queries:
+                for word in query.lower().split():
+                    self._word_index.setdefault(word, cluster)
+
+        self.load()
+
+    def cluster_for(self, keyword: str) -> str:
+        """
+        Map a comma-separated keyword list onto a topic cluster.
+
+        Args:
+            keyword: Keywords such as "Cybersecurity, Cloud computing"
+
+        Returns:
+            The cluster sharing the most words with the keywords, or the default cluster
+        """
+        votes: Dict[str, int] = {}
+        for word in (keyword or "").lower().replace(",", " ").split():
+            cluster = self._word_index.get(word)
+            if cluster:
+                votes[cluster] = votes.get(cluster, 0) + 1
+
+        if not votes:
+            return DEFAULT_CLUSTER if DEFAULT_CLUSTER in self.pools else next(iter(self.pools))
+        return max(votes, key=votes.get)
+
+    def _remember(self, photo_id: str) -> None:
+        """Put a photo into the reuse window, forgetting the oldest one if the window is full."""
+        if len(self.recent) == self.recent.maxlen:
+            self._recent_ids.discard(self.recent[0])
+        self.recent.append(photo_id)
+        self._recent_ids.add(photo_id)
+
+    def take(self, keyword: str) -> Dict[str, Any]:
+        """
+        Take a photo for the given keywords without any network call.
+
+        Args:
+            keyword: Keywords of the article
+
+        Returns:
+            Dict containing image information, or an empty dict if the cluster is empty
+        """
+        cluster = self.cluster_for(keyword)
+        with self._lock:
+            pool = self.pools.get(cluster)
+            while pool:
+                photo = pool.popleft()
+                # Refills skip recent ids, so this only loops for entries loaded from an old state
+                if photo.get("id") in self._recent_ids:
+                    continue
+                self._remember(photo.get("id"))
+                return photo
+        return {}
+
+    def add(self, cluster: str, photos: List[Dict[str, Any]]) -> int:
+        """
+        Add photos to a cluster, skipping ones already pooled or recently used.
+
+        Returns:
+            Number of photos added
+        """
+        added = 0
+        with self._lock:
+            pool = self.pools.setdefault(cluster, deque())
+            pooled_ids = {photo.get("id") for photo in pool}
+            for photo in photos:
+                photo_id = photo.get("id")
+                if not photo_id or photo_id in pooled_ids or photo_id in self._recent_ids:
+                    continue
+                if len(pool) >= self.target_size:
+                    break
+                pool.append(photo)
+                pooled_ids.add(photo_id)
+                added += 1
+        return added
+
+    def sizes(self) -> Dict[str, int]:
+        """Return the number of pooled photos per cluster."""
+        with self._lock:
+            return {cluster: len(pool) for cluster, pool in self.pools.items()}
+
+    def refill(self) -> int:
+        """
+        Top up the emptiest clusters below the low-water mark.
+
+        Stops early after max_requests_per_refill requests or when the
+        Unsplash quota runs low, leaving the rest for the next refill.
+
+        Returns:
+            Number of photos added
+        """
+        added = 0
+        requests_left = self.max_requests_per_refill
+        clusters = [cluster for cluster, size in sorted(self.sizes().items(), key=lambda item: item[1])
+                    if size < self.low_water]
+        queries = {cluster: random.sample(self.topics[cluster], len(self.topics[cluster])) for cluster in clusters}
+
+        # Breadth-first, one request per cluster per pass, so a small budget is spread across topics
+        while clusters:
+            for cluster in list(clusters):
+                if self._stop.is_set() or requests_left <= 0 or self.api.quota_low():
+                    return added
+                if not queries[cluster] or self.sizes()[cluster] >= self.target_size:
+                    clusters.remove(cluster)
+                    continue
+
+                query = queries[cluster].pop()
+                requests_left -= 1
+                try:
+                    # Alternate between search pages and random photos so pools don't repeat
+                    if random.random() < 0.5:
+                        photos = self.api.search_photos(query, per_page=30, page=random.randint(1, 3))
+                    else:
+                        photos = self.api.get_random_photos(count=30, keyword=query)
+                except Exception as e:
+                    print(f"Image pool refill failed for '{query}': {e}")
+                    continue
+
+                added += self.add(cluster, photos)
+
+        return added
+
+    def start(self, interval: float = 600) -> None:
+        """
+        Refill the pool on a background thread, immediately and then every interval seconds.
+
+        Args:
+            interval: Seconds between refills
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                added = self.refill()
+                if added:
+                    print(f"Image pool refilled with {added} photos")
+                    self.save()
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=run, name="image-pool-refill", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None) -> None:
+        """Stop the background refill thread and persist the pool."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.save()
+
+    def load(self) -> None:
+        """Load the pool and reuse window from the JSON file, if present."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable image pool {self.path}: {e}")
+            return
+
+        for photo_id in state.get("recent", []):
+            self._remember(photo_id)
+        for cluster, photos in state.get("pools", {}).items():
+            if cluster in self.pools:
+                self.add(cluster, photos)
+
+    def save(self) -> None:
+        """Persist the pool and reuse window atomically."""
+        with self._lock:
+            state = {
+                "pools": {cluster: list(pool) for cluster, pool in self.pools.items()},
+                "recent": list(self.recent),
+            }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,36 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Return a module that is only executed on its first attribute access.
+
+    app.py is started by cron, and many runs end early (missing keys,
+    nothing new to crawl) without touching the HTTP, parsing and AI client
+    modules. Importing those lazily keeps their import time, and that of
+    requests, bs4, jwt and Pillow, off such runs.
+
+    The first attribute access must not race between threads (LazyLoader
+    is not thread-safe before Python 3.12), so touch the module on the main
+    thread before handing it to workers.
+
+    Args:
+        name (str): Module name
+
+    Returns:
+        module: The module, loaded already if it was imported before
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
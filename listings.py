@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Any, List, Tuple
+
+
+class ListingState:
+    """
+    Remembers which listing pages had no uncrawled links left.
+
+    After a target is processed, its listing page is stored by fingerprint
+    together with the number of its links that are still uncrawled. When
+    the next run fetches the same listing unchanged and nothing was left,
+    the target can be skipped without parsing the page, and a run in which
+    every target is skipped can exit before loading the parsing and AI
+    stacks at all.
+    """
+
+    def __init__(self, path: str = "listing_state.json"):
+        """
+        Args:
+            path: JSON file the state is kept in
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.listings: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable listing state {self.path}: {e}")
+            return {}
+
+    def _save(self) -> None:
+        """Write the state atomically. Callers hold self._lock."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.listings, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def fingerprint(html: str) -> str:
+        return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+    def is_exhausted(self, ctr: str, html: str) -> bool:
+        """Return True if this exact listing page was seen before with every link already crawled."""
+        with self._lock:
+            entry = self.listings.get(ctr)
+        return bool(html) and entry is not None and entry["remaining"] == 0 and entry["fingerprint"] == self.fingerprint(html)
+
+    def update(self, ctr: str, html: str, remaining: int) -> None:
+        """
+        Record a processed listing page.
+
+        Args:
+            ctr: Target id
+            html: Listing page as fetched
+            remaining: Links on the page that are still uncrawled
+        """
+        with self._lock:
+            self.listings[ctr] = {"fingerprint": self.fingerprint(html), "remaining": remaining}
+            self._save()
+
+
+class LinkSnapshots:
+    """
+    The link set each target's listing had last time, as a sorted array of 64-bit hashes.
+
+    Comparing a fresh listing against its snapshot finds the links that
+    newly appeared with one binary search per link, so only those need to
+    be checked against the URL database and queued. A snapshot costs 8
+    bytes per link and is replaced atomically.
+    """
+
+    MAGIC = b"LSN1"
+
+    def __init__(self, directory: str = "link_snapshots"):
+        """
+        Args:
+            directory: Directory holding one <ctr>.snap file per target
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def link_hash(link: str) -> int:
+        return int.from_bytes(hashlib.blake2b(link.encode("utf-8"), digest_size=8).digest(), "little")
+
+    def _path(self, ctr: str) -> str:
+        return os.path.join(self.directory, f"{ctr}.snap")
+
+    def load(self, ctr: str) -> array:
+        """Return a target's snapshot (sorted hashes), empty if there is none."""
+        hashes = array("Q")
+        try:
+            with open(self._path(ctr), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return hashes
+        if data[:4] != self.MAGIC:
+            print(f"Ignoring unreadable link snapshot {self._path(ctr)}")
+            return hashes
+        hashes.frombytes(data[4:])
+        if sys.byteorder != "little":
+            hashes.byteswap()
+        return hashes
+
+    def diff(self, ctr: str, links: List[str]) -> Tuple[List[str], array]:
+        """
+        Compare links against a target's snapshot.
+
+        Args:
+            ctr: Target id
+            links: Normalized links currently on the listing
+
+        Returns:
+            tuple: (links not in the snapshot, in their original order; the
+            new snapshot to save once those links are safely queued)
+        """
+        old = self.load(ctr)
+        values = [self.link_hash(link) for link in links]
+        new_links = []
+        for link, value in zip(links, values):
+            position = bisect_left(old, value)
+            if position == len(old) or old[position] != value:
+                new_links.append(link)
+        return new_links, array("Q", sorted(set(values)))
+
+    def save(self, ctr: str, hashes: array) -> None:
+        """Replace a target's snapshot atomically."""
+        data = array("Q", hashes)
+        if sys.byteorder != "little":
+            data.byteswap()
+        path = self._path(ctr)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.MAGIC)
+            f.write(data.tobytes())
+        os.replace(tmp_path, path)
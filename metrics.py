@@ -0,0 +1,262 @@
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, Any, Tuple, Optional
+from urllib.parse import urlparse
+
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+HELP = {
+    "stage_seconds": "Time spent per pipeline stage",
+    "fetch_bytes_total": "Response bytes fetched from target sites",
+    "http_responses_total": "HTTP responses by stage and status code",
+    "retries_total": "Retried requests by stage",
+    "gemini_tokens_total": "Gemini tokens by kind (prompt, output)",
+    "cache_requests_total": "Cache lookups by cache and result (hit, stale, miss)",
+    "articles_total": "Articles by outcome",
+}
+
+
+def host(url: str) -> str:
+    """Return the host of a URL, used as the "host" label."""
+    return urlparse(url).netloc or "unknown"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _NullTimer:
+    """Timer handed out while metrics are disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        for listener in stage_listeners:
+            listener(self.labels["stage"], self.labels, True)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        for listener in stage_listeners:
+            listener(self.labels["stage"], self.labels, False)
+        return False
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, as exposed by Prometheus."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, fraction: float) -> Optional[float]:
+        """Estimate a quantile as the upper bound of the bucket it falls in (the maximum for the last bucket)."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """
+    Counters and latency histograms per pipeline stage and target host.
+
+    Metrics are keyed by name plus a set of labels (e.g. stage="fetch",
+    host="example.com"). While disabled, every method returns immediately
+    and timer() hands out a shared no-op context manager, so instrumented
+    code pays one attribute check per call.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self.histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+        self.started_at = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Add value to a counter."""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Record one latency observation."""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def timer(self, stage: str, **labels):
+        """Context manager recording the duration of its block under stage_seconds."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, "stage_seconds", {"stage": stage, **labels})
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started_at = time.time()
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Return the run summary as a JSON-serializable dict.
+
+        Returns:
+            Dict with "counters" and "histograms" lists, each entry holding
+            the metric name, its labels and its values
+        """
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": round(histogram.sum, 6),
+                    "max": round(histogram.max, 6),
+                    "p50": histogram.quantile(0.5),
+                    "p99": histogram.quantile(0.99),
+                }
+                for (name, labels), histogram in sorted(self.histograms.items())
+            ]
+        return {
+            "started_at": self.started_at,
+            "duration_seconds": round(time.time() - self.started_at, 3),
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        def render_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + "}"
+
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                describe(name, "counter")
+                lines.append(f"{name}{render_labels(labels)} {value:g}")
+
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                describe(name, "histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else f"{bound:g}"
+                    lines.append(f"{name}_bucket{render_labels(labels, [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{render_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{render_labels(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Write the metrics atomically, as a Prometheus textfile for .prom paths and as a JSON summary otherwise.
+
+        Args:
+            path: Output file, e.g. for node_exporter's textfile collector
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if path.endswith(".prom"):
+                f.write(self.prometheus())
+            else:
+                json.dump(self.summary(), f, indent=2)
+        os.replace(tmp_path, path)
+
+
+# Process-wide registry used by the instrumented modules; disabled until enable() is called
+registry = Metrics()
+
+# Callables notified as listener(stage, labels, entering) at every timer() boundary,
+# e.g. by the profiler to attribute samples and allocations to stages
+stage_listeners = []
+
+
+def enable() -> Metrics:
+    registry.enabled = True
+    registry.reset()
+    return registry
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    if registry.enabled:
+        registry.inc(name, value, **labels)
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    if registry.enabled:
+        registry.observe(name, seconds, **labels)
+
+
+def timer(stage: str, **labels):
+    if not registry.enabled and not stage_listeners:
+        return _NULL_TIMER
+    return _Timer(registry, "stage_seconds", {"stage": stage, **labels})
@@ -0,0 +1,465 @@
+import sqlite3
+import hashlib
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+
+import requests
+
+import metrics
+
+if TYPE_CHECKING:  # Only an annotation here; importing it would pull in jwt at startup
+    from cms_client import GhostCmsClient
+
+
+def slug_for(canonical_url: str) -> str:
+    """Derive a stable Ghost slug from an article's source URL.
+
+    The same source article always maps to the same slug, which is what lets
+    a retried publish detect that an earlier attempt already went through.
+
+    Args:
+        canonical_url: Source URL of the article
+
+    Returns:
+        A slug such as "crawled-3f2a9c0b1d4e5f60"
+    """
+    return "crawled-" + hashlib.sha1(canonical_url.encode("utf-8")).hexdigest()[:16]
+
+
+def content_hash(text: str) -> str:
+    """Hash article source content, ignoring whitespace-only differences.
+
+    Args:
+        text: Extracted source content of an article
+
+    Returns:
+        SHA-256 hex digest
+    """
+    return hashlib.sha256(" ".join((text or "").split()).encode("utf-8")).hexdigest()
+
+
+class Outbox:
+    """A durable SQLite queue of generated posts waiting to be published to Ghost."""
+
+    PENDING = "pending"
+    PUBLISHING = "publishing"
+    PUBLISHED = "published"
+    FAILED = "failed"
+
+    def __init__(self, db_path: str = "outbox.db"):
+        """Initialize the database connection and create table if it doesn't exist.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = db_path
+        self._ensure_table_exists()
+
+    def _get_connection(self) -> Tuple[sqlite3.Connection, sqlite3.Cursor]:
+        """Create and return a database connection and cursor.
+
+        Returns:
+            Tuple of (connection, cursor)
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        return conn, cursor
+
+    def _ensure_table_exists(self) -> None:
+        """Create the table if it doesn't already exist."""
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    slug TEXT NOT NULL UNIQUE,
+                    canonical_url TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    post_id TEXT,
+                    content_hash TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Outboxes created before upserts existed lack the hash column
+            cursor.execute("PRAGMA table_info(outbox)")
+            if "content_hash" not in {row["name"] for row in cursor.fetchall()}:
+                cursor.execute("ALTER TABLE outbox ADD COLUMN content_hash TEXT")
+
+            # Due items are claimed by status and time
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at)
+            """)
+
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_outbox_canonical_url ON outbox(canonical_url)
+            """)
+
+            conn.commit()
+        finally:
+            conn.close()
+
+    def enqueue(self, canonical_url: str, post_data: Dict[str, Any], slug: str = None) -> bool:
+        """Add a post to the outbox. A post whose slug is already queued is ignored.
+
+        Args:
+            canonical_url: Source URL of the article
+            post_data: Payload from GhostCmsClient.build_post_data
+            slug: Slug of the post (derived from canonical_url if omitted)
+
+        Returns:
+            True if the post was added, False if it was already queued
+        """
+        slug = slug or slug_for(canonical_url)
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute(
+                "INSERT OR IGNORE INTO outbox (slug, canonical_url, payload) VALUES (?, ?, ?)",
+                (slug, canonical_url, json.dumps(post_data, ensure_ascii=False))
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def upsert(self, canonical_url: str, post_data: Dict[str, Any], content_hash: str, slug: str = None) -> str:
+        """Queue a post, or an update of it if its source content changed since it was queued.
+
+        Args:
+            canonical_url: Source URL of the article
+            post_data: Payload from GhostCmsClient.build_post_data
+            content_hash: Hash of the article's source content (see content_hash())
+            slug: Slug of the post (derived from canonical_url if omitted)
+
+        Returns:
+            "created", "updated", or "unchanged" if the stored hash matches and nothing was queued
+        """
+        slug = slug or slug_for(canonical_url)
+        payload = json.dumps(post_data, ensure_ascii=False)
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT id, content_hash FROM outbox WHERE slug = ?", (slug,))
+            row = cursor.fetchone()
+
+            if row is None:
+                cursor.execute(
+                    "INSERT INTO outbox (slug, canonical_url, payload, content_hash) VALUES (?, ?, ?, ?)",
+                    (slug, canonical_url, payload, content_hash)
+                )
+                result = "created"
+            elif row["content_hash"] == content_hash:
+                result = "unchanged"
+            else:
+                # post_id is kept, which is what turns the next publish into an update
+                cursor.execute(
+                    """UPDATE outbox SET payload = ?, content_hash = ?, status = ?, attempts = 0,
+                       next_attempt_at = 0, last_error = NULL, updated_at = CURRENT_TIMESTAMP WHERE id = ?""",
+                    (payload, content_hash, self.PENDING, row["id"])
+                )
+                result = "updated"
+
+            conn.commit()
+            return result
+        finally:
+            conn.close()
+
+    def set_payload(self, canonical_url: str, post_data: Dict[str, Any], slug: str = None) -> bool:
+        """Replace the payload of a queued post that no publisher has claimed yet.
+
+        Args:
+            canonical_url: Source URL of the article
+            post_data: Payload from GhostCmsClient.build_post_data
+            slug: Slug of the post (derived from canonical_url if omitted)
+
+        Returns:
+            True if the payload was replaced, False if the post is not pending
+        """
+        slug = slug or slug_for(canonical_url)
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute(
+                "UPDATE outbox SET payload = ?, updated_at = CURRENT_TIMESTAMP WHERE slug = ? AND status = ?",
+                (json.dumps(post_data, ensure_ascii=False), slug, self.PENDING)
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def stored_hash(self, canonical_url: str) -> Optional[str]:
+        """Return the content hash last queued for a source URL, or None if it was never queued."""
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute(
+                "SELECT content_hash FROM outbox WHERE canonical_url = ? ORDER BY id DESC LIMIT 1",
+                (canonical_url,)
+            )
+            row = cursor.fetchone()
+            return row["content_hash"] if row else None
+        finally:
+            conn.close()
+
+    def recover(self) -> int:
+        """Return items left in 'publishing' by a crashed run to 'pending'.
+
+        Returns:
+            Number of recovered items
+        """
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute(
+                "UPDATE outbox SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE status = ?",
+                (self.PENDING, self.PUBLISHING)
+            )
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def claim_due(self, limit: int) -> List[Dict[str, Any]]:
+        """Mark up to limit due items as publishing and return them.
+
+        Claiming counts as an attempt, so an item that was claimed before is
+        known to have possibly reached Ghost already.
+
+        Args:
+            limit: Maximum number of items to claim
+
+        Returns:
+            A list of dictionaries with the decoded payload under "post_data"
+        """
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(
+                "SELECT * FROM outbox WHERE status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?",
+                (self.PENDING, time.time(), limit)
+            )
+            rows = [dict(row) for row in cursor.fetchall()]
+            for row in rows:
+                cursor.execute(
+                    "UPDATE outbox SET status = ?, attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    (self.PUBLISHING, row["id"])
+                )
+                row["attempts"] += 1
+                row["post_data"] = json.loads(row.pop("payload"))
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+    def next_due_at(self) -> Optional[float]:
+        """Return when the earliest pending item becomes due, or None if nothing is pending."""
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = ?",
+                (self.PENDING,)
+            )
+            return cursor.fetchone()[0]
+        finally:
+            conn.close()
+
+    def _set_status(self, item_id: int, status: str, **fields) -> None:
+        assignments = ["status = ?", "updated_at = CURRENT_TIMESTAMP"]
+        params: List[Any] = [status]
+        for column, value in fields.items():
+            assignments.append(f"{column} = ?")
+            params.append(value)
+        params.append(item_id)
+
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute(f"UPDATE outbox SET {', '.join(assignments)} WHERE id = ?", params)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def mark_published(self, item_id: int, post_id: str) -> None:
+        """Record that an item is live on Ghost."""
+        self._set_status(item_id, self.PUBLISHED, post_id=post_id, last_error=None)
+
+    def mark_retry(self, item_id: int, error: str, delay: float) -> None:
+        """Put an item back in the queue, due again after delay seconds."""
+        self._set_status(item_id, self.PENDING, last_error=error, next_attempt_at=time.time() + delay)
+
+    def mark_failed(self, item_id: int, error: str) -> None:
+        """Give up on an item. It stays in the table for inspection and can be requeued by hand."""
+        self._set_status(item_id, self.FAILED, last_error=error)
+
+    def counts(self) -> Dict[str, int]:
+        """Return the number of items per status."""
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status")
+            return {row[0]: row[1] for row in cursor.fetchall()}
+        finally:
+            conn.close()
+
+
+class Publisher:
+    """
+    Publishes outbox items to Ghost on a bounded pool of worker threads.
+
+    All workers share the GhostCmsClient and therefore its requests.Session.
+    429 and 5xx responses (and connection errors) are retried with
+    exponential backoff, honouring Retry-After. Before retrying an item that
+    may already have reached Ghost, the publisher looks the post up by its
+    canonical source URL, so a retry can never create a duplicate. Items
+    that were published before are sent as an update (PUT) of that post.
+    """
+
+    # 409 is Ghost's update collision: the post changed since updated_at was read
+    RETRY_STATUSES = (409, 429, 500, 502, 503, 504)
+
+    def __init__(self, client: "GhostCmsClient", outbox: Outbox, max_workers: int = 4,
+                 max_attempts: int = 6, backoff_base: float = 2.0, backoff_max: float = 300.0):
+        """
+        Initialize the publisher.
+
+        Args:
+            client: Ghost client shared by all workers
+            outbox: Queue to publish from
+            max_workers: Maximum number of concurrent publishes
+            max_attempts: Attempts before an item is marked failed
+            backoff_base: Delay in seconds before the first retry, doubled per attempt
+            backoff_max: Upper bound on the retry delay in seconds
+        """
+        self.client = client
+        self.outbox = outbox
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._published = 0
+        self._lock = threading.Lock()
+
+    def backoff(self, attempts: int, retry_after: Optional[str] = None) -> float:
+        """
+        Return the delay before the next attempt.
+
+        Args:
+            attempts: Attempts made so far
+            retry_after: Value of a Retry-After header, in seconds or as an HTTP date
+
+        Returns:
+            Delay in seconds
+        """
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                try:
+                    return min(max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0), self.backoff_max)
+                except (TypeError, ValueError):
+                    pass
+
+        delay = self.backoff_base * (2 ** (attempts - 1))
+        # Jitter keeps concurrent workers from retrying in lockstep
+        return min(delay * random.uniform(0.5, 1.0), self.backoff_max)
+
+    def _retry_or_fail(self, item: Dict[str, Any], error: str, retry_after: Optional[str] = None) -> None:
+        if item["attempts"] >= self.max_attempts:
+            print(f"Giving up on '{item['slug']}' after {item['attempts']} attempts: {error}")
+            self.outbox.mark_failed(item["id"], error)
+            metrics.inc("articles_total", outcome="publish_failed")
+        else:
+            self.outbox.mark_retry(item["id"], error, self.backoff(item["attempts"], retry_after))
+            metrics.inc("retries_total", stage="publish")
+
+    def publish_item(self, item: Dict[str, Any]) -> bool:
+        """
+        Publish one claimed outbox item.
+
+        Args:
+            item: An item returned by Outbox.claim_due
+
+        Returns:
+            True if the post is live on Ghost
+        """
+        is_update = bool(item.get("post_id"))
+        try:
+            existing = None
+            # Updates need the post's current updated_at, and a retried create
+            # may have reached Ghost before failing or crashing
+            if is_update or item["attempts"] > 1:
+                existing = self.client.find_post_by_canonical_url(item["canonical_url"])
+
+            if existing and is_update:
+                response = self.client.update_post(existing["id"], item["post_data"], existing["updated_at"])
+            elif existing:
+                self.outbox.mark_published(item["id"], existing["id"])
+                return True
+            else:
+                response = self.client.send_post(item["post_data"])
+        except requests.RequestException as e:
+            self._retry_or_fail(item, str(e))
+            return False
+
+        if response is None:
+            self._retry_or_fail(item, "Failed to get authentication token")
+            return False
+
+        if response.status_code in (200, 201):
+            post = response.json()["posts"][0]
+            self.outbox.mark_published(item["id"], post["id"])
+            metrics.inc("articles_total", outcome="updated" if is_update else "published")
+            print(f"Post '{post.get('title')}' {'updated' if is_update else 'created'} successfully")
+            with self._lock:
+                self._published += 1
+            return True
+
+        error = f"{response.status_code}: {response.text[:500]}"
+        if response.status_code in self.RETRY_STATUSES:
+            self._retry_or_fail(item, error, response.headers.get("Retry-After"))
+        else:
+            # Validation and permission errors won't succeed on retry
+            print(f"Failed to create post: {error}")
+            self.outbox.mark_failed(item["id"], error)
+            metrics.inc("articles_total", outcome="publish_failed")
+        return False
+
+    def drain(self, timeout: float = 120) -> int:
+        """
+        Publish everything due, waiting for scheduled retries until timeout.
+
+        Items whose retry falls after the timeout stay in the outbox for the next run.
+
+        Args:
+            timeout: Seconds to keep waiting for retries
+
+        Returns:
+            Number of posts published
+        """
+        self.outbox.recover()
+        deadline = time.monotonic() + timeout
+        self._published = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ghost-publisher") as executor:
+            while True:
+                items = self.outbox.claim_due(limit=self.max_workers * 2)
+                if items:
+                    list(executor.map(self.publish_item, items))
+                    continue
+
+                next_due = self.outbox.next_due_at()
+                if next_due is None:
+                    break
+                wait = next_due - time.time()
+                if time.monotonic() + wait > deadline:
+                    break
+                time.sleep(max(wait, 0))
+
+        return self._published
@@ -0,0 +1,127 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+import crawler
+import extraction
+import targets
+
+# Compiled targets of a worker process, by ctr
+_targets: Dict[str, Dict[str, Any]] = {}
+
+
+def _init_worker(targets_path: str) -> None:
+    """Compile the targets once per worker, so tasks only carry a ctr and the page."""
+    _targets.update((target["ctr"], target) for target in targets.load_targets(targets_path))
+
+
+def _article_fields(ctr: str, html_content: str):
+    return extraction.parse_fields(html_content, _targets[ctr]["pattern"])
+
+
+def _listing_links(ctr: str, html_content: str) -> List[str]:
+    return crawler.parse_links(html_content, _targets[ctr]["list_pattern"])
+
+
+class ParserPool:
+    """
+    Process pool parsing listing and article pages off the main process.
+
+    BeautifulSoup parsing and selector matching are pure Python, so threads
+    can't run them on more than one core. Each worker compiles the target
+    configuration once at start-up; a task then only sends a target's ctr
+    and the page's HTML, and gets back the extracted links or fields, never
+    a parsed tree.
+
+    Workers are replaced after about max_tasks_per_child pages each, so
+    memory held on to by the parser doesn't keep growing over a long run:
+    once a pool has been given workers * max_tasks_per_child pages, new
+    pages go to a fresh pool while the old one finishes its pages and
+    exits. (ProcessPoolExecutor's own max_tasks_per_child can hang on
+    Python 3.11 when tasks are queued faster than workers are replaced.)
+    A pool broken by a worker that died is replaced the same way; the
+    pages it held fail with BrokenProcessPool.
+    Workers are spawned rather than forked, as the publisher and image
+    pool threads are running by the time pages are parsed.
+    """
+
+    def __init__(self, workers: Optional[int] = None, targets_path: str = targets.DEFAULT_PATH,
+                 max_tasks_per_child: int = 200):
+        """
+        Args:
+            workers: Worker processes; defaults to the number of CPUs
+            targets_path: Target configuration the workers compile
+            max_tasks_per_child: Pages a worker parses before it is replaced
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.targets_path = targets_path
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._submitted = 0
+        self._lock = threading.Lock()
+
+    def _replace_executor(self) -> None:
+        """Start a fresh pool, letting the old one finish its pages. Callers hold self._lock."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.targets_path,),
+        )
+        self._submitted = 0
+
+    def _submit(self, fn, *args) -> "Future":
+        with self._lock:
+            if self._executor is None or self._submitted >= self.workers * self.max_tasks_per_child:
+                self._replace_executor()
+            self._submitted += 1
+            try:
+                return self._executor.submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died; its pages fail, but later ones go to a new pool
+                self._replace_executor()
+                self._submitted = 1
+                return self._executor.submit(fn, *args)
+
+    def article_fields(self, ctr: str, html_content: str) -> "Future":
+        """
+        Start extracting an article's fields with its target's "pattern".
+
+        Returns:
+            Future: Resolves to the fields, as GeminiClient.extract_fields returns them
+        """
+        future = self._submit(_article_fields, ctr, html_content)
+        result = Future()
+
+        def done(task):
+            try:
+                fields, fallback = task.result()
+            except BaseException as e:
+                result.set_exception(e)
+                return
+            extraction.count_fallback(fallback)
+            result.set_result(fields)
+
+        future.add_done_callback(done)
+        return result
+
+    def listing_links(self, ctr: str, html_content: str) -> "Future":
+        """
+        Start extracting the links of a listing page with its target's "list_pattern".
+
+        Returns:
+            Future: Resolves to the links, as WebCrawler.links_from_html returns them
+        """
+        return self._submit(_listing_links, ctr, html_content)
+
+    def close(self) -> None:
+        """Stop the workers, cancelling pages not started yet."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,246 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+from requests.exceptions import RequestException
+
+import metrics
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """
+    Parse a Retry-After header value.
+
+    Args:
+        value: Header value, in seconds or as an HTTP date
+
+    Returns:
+        Seconds to wait (never negative), or None if the value is missing or malformed
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+class TokenBucket:
+    """
+    Token bucket pacing requests to `rate` per second with bursts of up to `burst`.
+
+    reserve() never blocks: it takes a token, going into debt if none is
+    left, and returns how long the caller has to wait for it. Concurrent
+    callers therefore queue up behind each other instead of all waking at
+    the same moment.
+    """
+
+    def __init__(self, rate: float, burst: float = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self, now: Optional[float] = None) -> float:
+        """Take a token and return the seconds until it is available."""
+        now = now if now is not None else time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class _Host:
+    """Politeness state of one host."""
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.robots: Optional[RobotFileParser] = None
+        self.not_before = 0.0
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial = False
+
+
+class Politeness:
+    """
+    Per-host request scheduler for WebCrawler.
+
+    Before every request, acquire() checks the host's robots.txt (fetched
+    once and cached), waits for the host's token bucket, paced at `rate`
+    requests per second or the robots.txt Crawl-delay if that is slower, and
+    for any Retry-After the host sent. After every response, record() tracks
+    the host's consecutive failures (429, 5xx and connection errors): after
+    `breaker_threshold` of them the host's circuit opens and requests to it
+    fail fast for `breaker_cooldown` seconds. The first request after the
+    cool-down is a trial; if it fails too, the circuit opens again.
+
+    All state is kept per host and shared by the threads using the crawler.
+    """
+
+    FAILURE_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, user_agent: str = "*", rate: float = 1.0, burst: float = 2,
+                 breaker_threshold: int = 5, breaker_cooldown: float = 300,
+                 backoff_base: float = 2.0, max_wait: float = 60,
+                 robots_ttl: float = 24 * 3600, robots_error_ttl: float = 600, timeout: float = 10):
+        """
+        Args:
+            user_agent: User agent matched against robots.txt groups
+            rate: Requests per second per host
+            burst: Requests a host may receive back to back after being idle
+            breaker_threshold: Consecutive failures that open a host's circuit
+            breaker_cooldown: Seconds a circuit stays open
+            backoff_base: Pause in seconds after a failure without Retry-After, doubled per consecutive failure
+            max_wait: Longest acquire() waits; a host asking for a longer pause is skipped instead
+            robots_ttl: Seconds a fetched robots.txt is reused
+            robots_error_ttl: Seconds before retrying a robots.txt that couldn't be fetched
+            timeout: robots.txt request timeout in seconds
+        """
+        self.user_agent = user_agent
+        self.rate = rate
+        self.burst = burst
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.backoff_base = backoff_base
+        self.max_wait = max_wait
+        self.robots_ttl = robots_ttl
+        self.robots_error_ttl = robots_error_ttl
+        self.timeout = timeout
+        self._hosts: Dict[str, _Host] = {}
+        self._lock = threading.Lock()
+        self._robots_locks: Dict[str, threading.Lock] = {}
+
+    def _host(self, netloc: str) -> _Host:
+        """Return a host's state, creating it. Must hold self._lock."""
+        state = self._hosts.get(netloc)
+        if state is None:
+            state = self._hosts[netloc] = _Host(TokenBucket(self.rate, self.burst))
+            self._robots_locks[netloc] = threading.Lock()
+        return state
+
+    def _fetch_robots(self, scheme: str, netloc: str) -> RobotFileParser:
+        """
+        Fetch and parse a host's robots.txt.
+
+        Following RFC 9309, a missing robots.txt (4xx) allows everything,
+        while a server error or unreachable host disallows everything until
+        it is retried after robots_error_ttl.
+        """
+        parser = RobotFileParser(f"{scheme}://{netloc}/robots.txt")
+        ttl = self.robots_ttl
+        try:
+            response = requests.get(parser.url, headers={"User-Agent": self.user_agent}, timeout=self.timeout)
+            if response.status_code == 200:
+                parser.parse(response.text.splitlines())
+            elif 400 <= response.status_code < 500:
+                parser.allow_all = True
+            else:
+                parser.disallow_all = True
+                ttl = self.robots_error_ttl
+        except RequestException:
+            parser.disallow_all = True
+            ttl = self.robots_error_ttl
+
+        parser.modified()
+        parser.expires = time.time() + ttl
+        return parser
+
+    def robots(self, url: str) -> RobotFileParser:
+        """Return the cached robots.txt rules of a URL's host, fetching them if needed."""
+        parsed = urlparse(url)
+        with self._lock:
+            state = self._host(parsed.netloc)
+            robots_lock = self._robots_locks[parsed.netloc]
+
+        # One fetch per host even when several threads ask at once
+        with robots_lock:
+            if state.robots is None or state.robots.expires <= time.time():
+                parser = self._fetch_robots(parsed.scheme or "https", parsed.netloc)
+                delay = parser.crawl_delay(self.user_agent)
+                with self._lock:
+                    state.robots = parser
+                    if delay:
+                        # Crawl-delay can only slow a host down
+                        state.bucket.rate = min(self.rate, 1 / float(delay))
+                        state.bucket.burst = 1
+            return state.robots
+
+    def acquire(self, url: str) -> bool:
+        """
+        Wait until a request to the URL is allowed.
+
+        Returns:
+            False if the request must not be made at all: robots.txt
+            disallows it, the host's circuit is open, or the host asked for
+            a pause longer than max_wait
+        """
+        host = urlparse(url).netloc
+        if not self.robots(url).can_fetch(self.user_agent, url):
+            print(f"Disallowed by robots.txt ({url})")
+            metrics.inc("politeness_skips_total", reason="robots", host=host)
+            return False
+
+        with self._lock:
+            state = self._host(host)
+            now = time.time()
+            if state.open_until > now or (state.open_until and state.trial):
+                metrics.inc("politeness_skips_total", reason="circuit_open", host=host)
+                return False
+            if state.open_until:
+                # Cool-down over: let one trial request through
+                state.trial = True
+            if state.not_before - now > self.max_wait:
+                print(f"{host} asked for a {state.not_before - now:.0f}s pause, skipping ({url})")
+                metrics.inc("politeness_skips_total", reason="retry_after", host=host)
+                return False
+            wait = max(state.bucket.reserve(), state.not_before - now)
+
+        if wait > 0:
+            metrics.observe("politeness_wait_seconds", wait, host=host)
+            time.sleep(wait)
+        return True
+
+    def record(self, url: str, status: Optional[int] = None, retry_after=None) -> None:
+        """
+        Record the outcome of a request.
+
+        Args:
+            url: Requested URL
+            status: HTTP status code, or None if the request failed without a response
+            retry_after: Retry-After header value of the response
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            state = self._host(host)
+            now = time.time()
+            if status is not None and status not in self.FAILURE_STATUSES:
+                state.failures = 0
+                state.open_until = 0.0
+                state.trial = False
+                return
+
+            state.failures += 1
+            pause = parse_retry_after(retry_after)
+            if pause is None:
+                pause = min(self.backoff_base * (2 ** (state.failures - 1)), self.breaker_cooldown)
+            state.not_before = max(state.not_before, now + pause)
+
+            if state.trial or state.failures >= self.breaker_threshold:
+                state.open_until = now + self.breaker_cooldown
+                state.trial = False
+                print(f"Circuit open for {host} for {self.breaker_cooldown:.0f}s after {state.failures} consecutive failures")
+                metrics.inc("circuit_opened_total", host=host)
+
+    def is_open(self, url: str) -> bool:
+        """Return True while the circuit of a URL's host is open."""
+        with self._lock:
+            state = self._hosts.get(urlparse(url).netloc)
+            return state is not None and state.open_until > time.time()
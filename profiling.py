@@ -0,0 +1,220 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import metrics
+
+
+# Stages whose allocations are snapshotted: BeautifulSoup construction and selector matching
+PARSE_STAGES = ("parse", "parse_links")
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """
+    Sampling CPU profiler and allocation tracker scoped to pipeline stages.
+
+    Stages are the metrics.timer() blocks (article, fetch, parse, generate,
+    image, ...), which the profiler follows through metrics.stage_listeners.
+
+    A background thread samples the stack of every thread at a fixed
+    interval. Samples are wall-clock: a thread waiting on Gemini or Ghost is
+    counted too, which is what a slow run needs to show. Stacks are written
+    in the folded format ("frame;frame;frame count") that flamegraph.pl,
+    speedscope and inferno read, rooted at the innermost active stage.
+    cProfile isn't used because it only sees the thread that enabled it,
+    while the pipeline's work is spread over worker threads.
+
+    With memory tracking, tracemalloc records the allocation peak of every
+    stage and every article, and the first calls of each parse stage get a
+    snapshot diff of their top allocation sites. Peaks are process-wide, so
+    with concurrent workers they include other threads' allocations.
+    """
+
+    def __init__(self, output_dir: str = "profiles", interval: float = 0.005, memory: bool = True,
+                 snapshots_per_stage: int = 3, tracemalloc_frames: int = 10):
+        """
+        Initialize the profiler.
+
+        Args:
+            output_dir: Directory receiving one sub-directory per run
+            interval: Seconds between stack samples
+            memory: Track allocations with tracemalloc (slows the run down noticeably)
+            snapshots_per_stage: Parse stage calls per stage that get a snapshot diff
+            tracemalloc_frames: Frames stored per allocation traceback
+        """
+        self.output_dir = output_dir
+        self.interval = interval
+        self.memory = memory
+        self.snapshots_per_stage = snapshots_per_stage
+        self.tracemalloc_frames = tracemalloc_frames
+
+        self.samples: Counter = Counter()
+        self.stage_samples: Dict[str, Counter] = {}
+        self.stage_peaks: Dict[str, List[int]] = {}
+        self.article_peaks: List[Tuple[int, str, float]] = []
+        self.snapshot_diffs: Dict[str, List[Any]] = {}
+
+        self._lock = threading.Lock()
+        self._open_stages: Dict[int, List[Dict[str, Any]]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_tracemalloc = False
+        self.started_at = None
+
+    def start(self) -> None:
+        """Start sampling and hook into the metrics stage boundaries."""
+        self.started_at = datetime.now()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+            self._started_tracemalloc = True
+
+        metrics.stage_listeners.append(self._on_stage)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        """
+        Stop profiling and write the run's output files.
+
+        Returns:
+            Directory the files were written to
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self._on_stage in metrics.stage_listeners:
+            metrics.stage_listeners.remove(self._on_stage)
+
+        path = self.write()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        return path
+
+    # --- Sampling ------------------------------------------------------------
+
+    def _sample_loop(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                stages = {thread_id: open_stages[-1]["stage"]
+                          for thread_id, open_stages in self._open_stages.items() if open_stages}
+
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stage = stages.get(thread_id, "no stage")
+                stack.append(f"[{stage}]")
+                stack.reverse()
+
+                self.samples[";".join(stack)] += 1
+                self.stage_samples.setdefault(stage, Counter())[stack[-1]] += 1
+
+    # --- Stage boundaries ----------------------------------------------------
+
+    def _fold_peak(self) -> None:
+        """Credit the peak since the last reset to every open stage, then reset it. Callers hold self._lock."""
+        _, peak = tracemalloc.get_traced_memory()
+        for open_stages in self._open_stages.values():
+            for entry in open_stages:
+                entry["peak"] = max(entry["peak"], peak - entry["baseline"])
+        tracemalloc.reset_peak()
+
+    def _on_stage(self, stage: str, labels: Dict[str, Any], entering: bool) -> None:
+        thread_id = threading.get_ident()
+        tracing = self.memory and tracemalloc.is_tracing()
+
+        if entering:
+            snapshot = None
+            if tracing and stage in PARSE_STAGES:
+                with self._lock:
+                    taken = len(self.snapshot_diffs.get(stage, []))
+                if taken < self.snapshots_per_stage:
+                    snapshot = tracemalloc.take_snapshot()
+
+            with self._lock:
+                if tracing:
+                    self._fold_peak()
+                baseline = tracemalloc.get_traced_memory()[0] if tracing else 0
+                self._open_stages.setdefault(thread_id, []).append({
+                    "stage": stage,
+                    "labels": labels,
+                    "baseline": baseline,
+                    "peak": 0,
+                    "snapshot": snapshot,
+                    "started": time.perf_counter(),
+                })
+            return
+
+        with self._lock:
+            open_stages = self._open_stages.get(thread_id)
+            if not open_stages:
+                return
+            if tracing:
+                self._fold_peak()
+            entry = open_stages.pop()
+            if tracing:
+                self.stage_peaks.setdefault(stage, []).append(entry["peak"])
+                if stage == "article":
+                    self.article_peaks.append((entry["peak"], labels.get("host", ""),
+                                               time.perf_counter() - entry["started"]))
+
+        if entry["snapshot"] is not None:
+            diff = tracemalloc.take_snapshot().compare_to(entry["snapshot"], "lineno")
+            with self._lock:
+                self.snapshot_diffs.setdefault(stage, []).append(diff[:10])
+
+    # --- Output --------------------------------------------------------------
+
+    def write(self) -> str:
+        """Write cpu.folded, stages.txt and (with memory tracking) memory.txt into a new run directory."""
+        run_dir = os.path.join(self.output_dir, (self.started_at or datetime.now()).strftime("%Y%m%d-%H%M%S"))
+        os.makedirs(run_dir, exist_ok=True)
+
+        with open(os.path.join(run_dir, "cpu.folded"), "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+
+        with open(os.path.join(run_dir, "stages.txt"), "w", encoding="utf-8") as f:
+            total = sum(self.samples.values()) or 1
+            for stage, counter in sorted(self.stage_samples.items(), key=lambda item: -sum(item[1].values())):
+                stage_total = sum(counter.values())
+                f.write(f"[{stage}] {stage_total} samples ({stage_total / total:.1%}), self time by function:\n")
+                for name, count in counter.most_common(15):
+                    f.write(f"  {count:8d}  {count / stage_total:6.1%}  {name}\n")
+                f.write("\n")
+
+        if self.memory:
+            with open(os.path.join(run_dir, "memory.txt"), "w", encoding="utf-8") as f:
+                f.write("Allocation peak per stage (KiB): calls, median, max\n")
+                for stage, peaks in sorted(self.stage_peaks.items()):
+                    ordered = sorted(peaks)
+                    f.write(f"  {stage:16s} {len(ordered):6d} {ordered[len(ordered) // 2] / 1024:10.1f} {ordered[-1] / 1024:10.1f}\n")
+
+                f.write("\nLargest per-article allocation peaks (KiB, host, seconds)\n")
+                for peak, host, seconds in sorted(self.article_peaks, reverse=True)[:20]:
+                    f.write(f"  {peak / 1024:10.1f}  {host}  {seconds:.2f}s\n")
+
+                for stage, diffs in sorted(self.snapshot_diffs.items()):
+                    for index, diff in enumerate(diffs, 1):
+                        f.write(f"\nTop allocation sites during {stage} call {index}\n")
+                        for stat in diff:
+                            f.write(f"  {stat}\n")
+
+        return run_dir
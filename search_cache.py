@@ -0,0 +1,161 @@
+import sqlite3
+import json
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+
+class SearchCache:
+    """A persistent keyword -> search results cache for the Unsplash API, stored in SQLite."""
+
+    def __init__(self, db_path: str = "unsplash_cache.db", ttl: float = 7 * 24 * 3600,
+                 max_entries: int = 500, refresh_margin: float = 0.2):
+        """Initialize the cache and create its table if it doesn't exist.
+
+        Args:
+            db_path: Path to the SQLite database file
+            ttl: Seconds a cached result set stays valid
+            max_entries: Maximum number of keyword sets kept; least recently used are evicted first
+            refresh_margin: Fraction of the TTL before expiry at which an entry should be refreshed
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.refresh_margin = refresh_margin
+        self._ensure_table_exists()
+
+    def _get_connection(self) -> Tuple[sqlite3.Connection, sqlite3.Cursor]:
+        """Create and return a database connection and cursor.
+
+        Returns:
+            Tuple of (connection, cursor)
+        """
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        return conn, cursor
+
+    def _ensure_table_exists(self) -> None:
+        """Create the table if it doesn't already exist."""
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS search_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    results TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+
+            # Eviction walks entries from least to most recently used
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_search_cache_last_used ON search_cache(last_used)
+            """)
+
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def normalize(keyword: str) -> str:
+        """Normalize a comma-separated keyword list into a cache key.
+
+        "Cloud computing, Cybersecurity" and "cybersecurity,cloud computing"
+        map to the same key.
+
+        Args:
+            keyword: Comma-separated keywords
+
+        Returns:
+            The lowercased, de-duplicated and sorted keywords joined by ","
+        """
+        parts = {" ".join(part.lower().split()) for part in (keyword or "").split(",")}
+        parts.discard("")
+        return ",".join(sorted(parts))
+
+    def get(self, keyword: str, allow_stale: bool = False) -> Optional[Dict[str, Any]]:
+        """Look up the cached results for a keyword set.
+
+        Args:
+            keyword: Comma-separated keywords
+            allow_stale: Also return entries past their TTL
+
+        Returns:
+            Dict with "results", "fetched_at" and "expires_at", or None on a miss
+        """
+        key = self.normalize(keyword)
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute(
+                "SELECT results, fetched_at FROM search_cache WHERE cache_key = ?",
+                (key,)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+
+            now = time.time()
+            expires_at = row["fetched_at"] + self.ttl
+            if expires_at <= now and not allow_stale:
+                return None
+
+            cursor.execute(
+                "UPDATE search_cache SET last_used = ? WHERE cache_key = ?",
+                (now, key)
+            )
+            conn.commit()
+
+            return {
+                "results": json.loads(row["results"]),
+                "fetched_at": row["fetched_at"],
+                "expires_at": expires_at,
+            }
+        finally:
+            conn.close()
+
+    def put(self, keyword: str, results: List[Dict[str, Any]]) -> None:
+        """Store the results for a keyword set and evict entries over the size bound.
+
+        Args:
+            keyword: Comma-separated keywords
+            results: Photo info dicts returned by the search
+        """
+        key = self.normalize(keyword)
+        now = time.time()
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute(
+                "INSERT OR REPLACE INTO search_cache (cache_key, results, fetched_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(results, ensure_ascii=False), now, now)
+            )
+
+            # Drop expired entries first, then the least recently used ones over the bound
+            cursor.execute(
+                "DELETE FROM search_cache WHERE fetched_at <= ?",
+                (now - self.ttl,)
+            )
+            cursor.execute("""
+                DELETE FROM search_cache WHERE cache_key IN (
+                    SELECT cache_key FROM search_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+            conn.commit()
+        finally:
+            conn.close()
+
+    def needs_refresh(self, entry: Dict[str, Any]) -> bool:
+        """Return True if an entry returned by get() is close enough to expiry to refresh it.
+
+        Args:
+            entry: An entry returned by get()
+        """
+        return entry["expires_at"] - time.time() <= self.ttl * self.refresh_margin
+
+    def __len__(self) -> int:
+        conn, cursor = self._get_connection()
+        try:
+            cursor.execute("SELECT COUNT(*) FROM search_cache")
+            return cursor.fetchone()[0]
+        finally:
+            conn.close()
@@ -0,0 +1,82 @@
+import hashlib
+import os
+from typing import Any, Dict, List
+from urllib.parse import urlparse
+
+
+class Shard:
+    """
+    One of `count` partitions of the targets, for running the crawler on several nodes.
+
+    Every node is started with the same target list and its own
+    `--shard index/count`, and keeps its crawl state (URL database and
+    frontier, outbox, target health, listing state, link snapshots, image
+    pool and image caches) in its own directory. Targets are assigned by rendezvous hashing
+    of their listing host: each node computes the owner of every host by
+    itself, so no coordination is needed, every host is crawled by exactly
+    one node (which keeps per-host politeness intact), and growing from N to
+    N+1 nodes only moves about 1/(N+1) of the hosts, all to the new node.
+    Links found on a target's listing belong to the target's shard, so
+    discovered URLs are partitioned the same way.
+    """
+
+    def __init__(self, index: int = 0, count: int = 1, state_dir: str = None):
+        """
+        Args:
+            index: This shard, from 0 to count - 1
+            count: Number of shards
+            state_dir: Directory of this shard's state files; defaults to the
+                working directory when unsharded, and to shard-<index>-of-<count> otherwise
+
+        Raises:
+            ValueError: If index is not within the shard count
+        """
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Invalid shard {index}/{count}: need 0 <= index < count")
+        self.index = index
+        self.count = count
+        if state_dir is None:
+            state_dir = "." if count == 1 else f"shard-{index}-of-{count}"
+        self.state_dir = state_dir
+
+    @classmethod
+    def parse(cls, value: str, state_dir: str = None) -> "Shard":
+        """
+        Parse a shard given as "index/count", e.g. "0/4".
+
+        Raises:
+            ValueError: If the value is malformed or out of range
+        """
+        index, separator, count = value.partition("/")
+        if not separator or not index.strip().isdigit() or not count.strip().isdigit():
+            raise ValueError(f"Invalid shard {value!r}: expected index/count, e.g. 0/4")
+        return cls(int(index), int(count), state_dir=state_dir)
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    @staticmethod
+    def weight(key: str, index: int) -> int:
+        digest = hashlib.blake2b(f"{index}:{key}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    def owner(self, key: str) -> int:
+        """Return the shard a key belongs to: the one with the highest weight for it."""
+        return max(range(self.count), key=lambda index: self.weight(key, index))
+
+    def owns(self, key: str) -> bool:
+        return self.count == 1 or self.owner(key) == self.index
+
+    @staticmethod
+    def target_key(target: Dict[str, Any]) -> str:
+        """Key a target is sharded by: the host of its listing page."""
+        return urlparse(target["url"]).netloc.lower()
+
+    def select(self, targets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return the targets this shard owns, in their original order."""
+        return [target for target in targets if self.owns(self.target_key(target))]
+
+    def path(self, name: str) -> str:
+        """Return the path of a state file in this shard's directory, creating the directory."""
+        os.makedirs(self.state_dir, exist_ok=True)
+        return os.path.join(self.state_dir, name)
@@ -1,10 +1,35 @@
+import argparse
+import hashlib
 import sqlite3
-from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 import os
 
+
+def url_hash(domain: str, uripath: str) -> int:
+    """Return the 64-bit key of a URL, as a signed integer so SQLite stores it in 8 bytes.
+    
+    Args:
+        domain: The domain name
+        uripath: The URI path
+        
+    Returns:
+        The URL's key
+    """
+    digest = hashlib.blake2b(f"{domain}\n{uripath}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
 class URLDatabase:
-    """A class for managing URL entries in a SQLite database."""
+    """A class for managing URL entries in a SQLite database.
+    
+    Entries are unique by url_hash, a 64-bit key of domain and uripath, so
+    exact lookups go through a compact integer index instead of one over
+    the full strings. search() uses an FTS5 trigram index when SQLite has
+    one. compact() moves old entries to an archive database and leaves only
+    their keys behind, so they still count as crawled.
+    """
     
     def __init__(self, db_path: str = "urls.db"):
         """Initialize the database connection and create table if it doesn't exist.
@@ -13,41 +38,155 @@ class URLDatabase:
             db_path: Path to the SQLite database file
         """
         self.db_path = db_path
+        self.fts = False
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
         self._ensure_table_exists()
     
-    def _get_connection(self) -> Tuple[sqlite3.Connection, sqlite3.Cursor]:
-        """Create and return a database connection and cursor.
+    def _get_connection(self) -> sqlite3.Connection:
+        """Return the database's connection, opening it on first use.
+        
+        The connection is kept for the life of the object: opening one per
+        call re-reads the schema (FTS5 table, triggers) and re-registers
+        url_hash, which costs more than the lookups themselves. Callers go
+        through _cursor(), which serializes threads on it.
         
         Returns:
+            The connection
+        """
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row  # Returns rows as dictionary-like objects
+            conn.create_function("url_hash", 2, url_hash, deterministic=True)
+            self._conn = conn
+        return self._conn
+    
+    @contextmanager
+    def _cursor(self) -> Iterator[Tuple[sqlite3.Connection, sqlite3.Cursor]]:
+        """Hold the connection and yield it with a new cursor.
+        
+        A transaction left open by an exception is rolled back, as closing
+        a per-call connection used to do.
+        
+        Yields:
             Tuple of (connection, cursor)
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Returns rows as dictionary-like objects
-        cursor = conn.cursor()
-        return conn, cursor
+        with self._lock:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            try:
+                yield conn, cursor
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            finally:
+                cursor.close()
+    
+    def close(self) -> None:
+        """Close the connection; the next call opens a new one."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
     
     def _ensure_table_exists(self) -> None:
-        """Create the table if it doesn't already exist."""
-        conn, cursor = self._get_connection()
-        try:
+        """Create the tables if they don't already exist, migrating older layouts."""
+        with self._cursor() as (conn, cursor):
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS urls (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url_hash INTEGER NOT NULL,
                     domain TEXT NOT NULL,
                     uripath TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(domain, uripath)
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
             
+            # Databases created before url_hash existed are unique by
+            # (domain, uripath); rebuild them keyed by hash, keeping their ids
+            cursor.execute("PRAGMA table_info(urls)")
+            if "url_hash" not in {row["name"] for row in cursor.fetchall()}:
+                cursor.execute("BEGIN")
+                cursor.execute("ALTER TABLE urls RENAME TO urls_old")
+                cursor.execute("""
+                    CREATE TABLE urls (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        url_hash INTEGER NOT NULL,
+                        domain TEXT NOT NULL,
+                        uripath TEXT NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                cursor.execute("""
+                    INSERT INTO urls (id, url_hash, domain, uripath, created_at)
+                    SELECT id, url_hash(domain, uripath), domain, uripath, created_at FROM urls_old ORDER BY id
+                """)
+                cursor.execute("DROP TABLE urls_old")
+                conn.commit()
+            
+            # Exact lookups; the index holds the key and rowid only, which
+            # also covers existence checks
+            cursor.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_urls_hash ON urls(url_hash)
+            """)
+            
             # Create index on domain column for faster lookups
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_domain ON urls(domain)
             """)
             
+            # Keys of entries compact() moved to the archive database
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS url_tombstones (
+                    url_hash INTEGER PRIMARY KEY
+                ) WITHOUT ROWID
+            """)
+            
             conn.commit()
-        finally:
-            conn.close()
+            self.fts = self._ensure_fts(conn, cursor)
+    
+    def _ensure_fts(self, conn: sqlite3.Connection, cursor: sqlite3.Cursor) -> bool:
+        """Create the FTS5 trigram index of the urls table and the triggers keeping it current.
+        
+        Returns:
+            False if this SQLite lacks FTS5 or its trigram tokenizer (3.34+),
+            in which case search() falls back to LIKE
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'urls_fts'")
+        if cursor.fetchone():
+            return True
+        try:
+            cursor.execute("BEGIN")
+            cursor.execute("""
+                CREATE VIRTUAL TABLE urls_fts USING fts5(
+                    domain, uripath, content='urls', content_rowid='id', tokenize='trigram', columnsize=0
+                )
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS urls_fts_insert AFTER INSERT ON urls BEGIN
+                    INSERT INTO urls_fts (rowid, domain, uripath) VALUES (new.id, new.domain, new.uripath);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS urls_fts_delete AFTER DELETE ON urls BEGIN
+                    INSERT INTO urls_fts (urls_fts, rowid, domain, uripath) VALUES ('delete', old.id, old.domain, old.uripath);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS urls_fts_update AFTER UPDATE OF domain, uripath ON urls BEGIN
+                    INSERT INTO urls_fts (urls_fts, rowid, domain, uripath) VALUES ('delete', old.id, old.domain, old.uripath);
+                    INSERT INTO urls_fts (rowid, domain, uripath) VALUES (new.id, new.domain, new.uripath);
+                END
+            """)
+            # Index the entries that predate the index
+            cursor.execute("INSERT INTO urls_fts (urls_fts) VALUES ('rebuild')")
+            conn.commit()
+            return True
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            print(f"Full-text search unavailable, searching with LIKE: {e}")
+            return False
     
     def create(self, domain: str, uripath: str) -> int:
         """Create a new URL entry.
@@ -62,16 +201,13 @@ class URLDatabase:
         Raises:
             sqlite3.IntegrityError: If the domain+uripath combination already exists
         """
-        conn, cursor = self._get_connection()
-        try:
+        with self._cursor() as (conn, cursor):
             cursor.execute(
-                "INSERT INTO urls (domain, uripath) VALUES (?, ?)",
-                (domain, uripath)
+                "INSERT INTO urls (url_hash, domain, uripath) VALUES (?, ?, ?)",
+                (url_hash(domain, uripath), domain, uripath)
             )
             conn.commit()
             return cursor.lastrowid
-        finally:
-            conn.close()
     
     def read(self, url_id: int = None) -> List[Dict[str, Any]]:
         """Read URL entries from the database.
@@ -82,16 +218,13 @@ class URLDatabase:
         Returns:
             A list of dictionaries representing URL entries
         """
-        conn, cursor = self._get_connection()
-        try:
+        with self._cursor() as (conn, cursor):
             if url_id is not None:
                 cursor.execute("SELECT * FROM urls WHERE id = ?", (url_id,))
             else:
                 cursor.execute("SELECT * FROM urls")
             
             return [dict(row) for row in cursor.fetchall()]
-        finally:
-            conn.close()
     
     def read_by_domain(self, domain: str) -> List[Dict[str, Any]]:
         """Read URL entries for a specific domain.
@@ -102,12 +235,9 @@ class URLDatabase:
         Returns:
             A list of dictionaries representing URL entries
         """
-        conn, cursor = self._get_connection()
-        try:
+        with self._cursor() as (conn, cursor):
             cursor.execute("SELECT * FROM urls WHERE domain = ?", (domain,))
             return [dict(row) for row in cursor.fetchall()]
-        finally:
-            conn.close()
             
     def read_by_domain_and_path(self, domain: str, uripath: str) -> Optional[Dict[str, Any]]:
         """Read a URL entry for a specific domain and path combination.
@@ -117,18 +247,23 @@ class URLDatabase:
             uripath: The URI path to filter by
             
         Returns:
-            A dictionary representing the URL entry if found, or None if not found
+            A dictionary representing the URL entry if found, or None if not found.
+            An entry moved to the archive by compact() is returned with id and
+            created_at None.
         """
-        conn, cursor = self._get_connection()
-        try:
+        key = url_hash(domain, uripath)
+        with self._cursor() as (conn, cursor):
             cursor.execute(
-                "SELECT * FROM urls WHERE domain = ? AND uripath = ?", 
-                (domain, uripath)
+                "SELECT id, url_hash, domain, uripath, created_at FROM urls WHERE url_hash = ? AND domain = ? AND uripath = ?",
+                (key, domain, uripath)
             )
             result = cursor.fetchone()
-            return dict(result) if result else None
-        finally:
-            conn.close()
+            if result:
+                return dict(result)
+            cursor.execute("SELECT 1 FROM url_tombstones WHERE url_hash = ?", (key,))
+            if cursor.fetchone():
+                return {"id": None, "url_hash": key, "domain": domain, "uripath": uripath, "created_at": None}
+            return None
             
     
     def update(self, url_id: int, domain: str = None, uripath: str = None) -> bool:
@@ -148,8 +283,7 @@ class URLDatabase:
         if domain is None and uripath is None:
             return False
         
-        conn, cursor = self._get_connection()
-        try:
+        with self._cursor() as (conn, cursor):
             update_parts = []
             params = []
             
@@ -161,6 +295,10 @@ class URLDatabase:
                 update_parts.append("uripath = ?")
                 params.append(uripath)
                 
+            # The key follows the new domain and uripath
+            update_parts.append("url_hash = url_hash(COALESCE(?, domain), COALESCE(?, uripath))")
+            params.extend([domain, uripath])
+                
             params.append(url_id)
             
             query = f"UPDATE urls SET {', '.join(update_parts)} WHERE id = ?"
@@ -168,8 +306,6 @@ class URLDatabase:
             conn.commit()
             
             return cursor.rowcount > 0
-        finally:
-            conn.close()
     
     def delete(self, url_id: int) -> bool:
         """Delete a URL entry.
@@ -180,16 +316,17 @@ class URLDatabase:
         Returns:
             True if a row was deleted, False otherwise
         """
-        conn, cursor = self._get_connection()
-        try:
+        with self._cursor() as (conn, cursor):
             cursor.execute("DELETE FROM urls WHERE id = ?", (url_id,))
             conn.commit()
             return cursor.rowcount > 0
-        finally:
-            conn.close()
     
     def search(self, query: str) -> List[Dict[str, Any]]:
-        """Search for URL entries matching a query.
+        """Search for URL entries whose domain or path contains a query (case-insensitively).
+        
+        Queries of three or more characters are answered from the trigram
+        index; shorter ones, which trigrams can't match, scan the table.
+        Entries moved to the archive by compact() are not searched.
         
         Args:
             query: The search query
@@ -197,14 +334,254 @@ class URLDatabase:
         Returns:
             A list of dictionaries representing matching URL entries
         """
-        conn, cursor = self._get_connection()
+        with self._cursor() as (conn, cursor):
+            if self.fts and len(query) >= 3:
+                # A quoted phrase matches the query as a plain substring
+                phrase = '"' + query.replace('"', '""') + '"'
+                cursor.execute(
+                    "SELECT urls.* FROM urls_fts JOIN urls ON urls.id = urls_fts.rowid WHERE urls_fts MATCH ? ORDER BY urls.id",
+                    (phrase,)
+                )
+            else:
+                pattern = f"%{query}%"
+                cursor.execute(
+                    "SELECT * FROM urls WHERE domain LIKE ? OR uripath LIKE ?",
+                    (pattern, pattern)
+                )
+            return [dict(row) for row in cursor.fetchall()]
+    
+    @contextmanager
+    def _attached(self, conn: sqlite3.Connection, cursor: sqlite3.Cursor, path: str, schema: str) -> Iterator[None]:
+        """Attach another database as schema for the duration of a block.
+        
+        The connection outlives the block, so the database is detached even
+        if the block fails, after rolling back what it left uncommitted.
+        """
+        cursor.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
         try:
-            pattern = f"%{query}%"
+            yield
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            cursor.execute(f"DETACH DATABASE {schema}")
+    
+    def merge(self, other_path: str) -> int:
+        """Copy the entries of another URL database (e.g. a shard's) that this one lacks.
+        
+        Entries keep their created_at but get new ids. Merging the same
+        database twice adds nothing the second time.
+        
+        Args:
+            other_path: Path of the SQLite database to merge in
+            
+        Returns:
+            The number of entries added
+            
+        Raises:
+            FileNotFoundError: If other_path doesn't exist
+        """
+        if not os.path.exists(other_path):
+            raise FileNotFoundError(other_path)
+        with self._cursor() as (conn, cursor):
+            with self._attached(conn, cursor, other_path, "other"):
+                # Keys are recomputed, so databases from before url_hash merge too
+                cursor.execute(
+                    """INSERT OR IGNORE INTO urls (url_hash, domain, uripath, created_at)
+                       SELECT url_hash(domain, uripath), domain, uripath, created_at FROM other.urls
+                       WHERE url_hash(domain, uripath) NOT IN (SELECT url_hash FROM url_tombstones)
+                       ORDER BY created_at, id"""
+                )
+                added = cursor.rowcount
+                cursor.execute("SELECT 1 FROM other.sqlite_master WHERE name = 'url_tombstones'")
+                if cursor.fetchone():
+                    cursor.execute("INSERT OR IGNORE INTO url_tombstones SELECT url_hash FROM other.url_tombstones")
+                conn.commit()
+            return added
+    
+    def compact(self, days: float, archive_path: str = "urls-archive.db") -> int:
+        """Move entries older than a number of days to an archive database.
+        
+        The entries are copied to the archive's urls table and deleted here,
+        keeping only their url_hash as a tombstone, so read_by_domain_and_path
+        still reports them and they are never crawled again. The database
+        file is then vacuumed, so the hot table and its indexes shrink.
+        
+        Args:
+            days: Age in days above which entries are archived
+            archive_path: SQLite database receiving the archived entries
+            
+        Returns:
+            The number of entries archived
+        """
+        with self._cursor() as (conn, cursor):
+            cutoff = f"-{days} days"
+            with self._attached(conn, cursor, archive_path, "archive"):
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS archive.urls (
+                        id INTEGER PRIMARY KEY,
+                        url_hash INTEGER NOT NULL UNIQUE,
+                        domain TEXT NOT NULL,
+                        uripath TEXT NOT NULL,
+                        created_at TIMESTAMP
+                    )
+                """)
+                cursor.execute(
+                    """INSERT OR IGNORE INTO archive.urls (id, url_hash, domain, uripath, created_at)
+                       SELECT id, url_hash, domain, uripath, created_at FROM urls WHERE created_at < datetime('now', ?)""",
+                    (cutoff,)
+                )
+                cursor.execute(
+                    "INSERT OR IGNORE INTO url_tombstones SELECT url_hash FROM urls WHERE created_at < datetime('now', ?)",
+                    (cutoff,)
+                )
+                cursor.execute("DELETE FROM urls WHERE created_at < datetime('now', ?)", (cutoff,))
+                archived = cursor.rowcount
+                conn.commit()
+            
+            if archived:
+                if self.fts:
+                    cursor.execute("INSERT INTO urls_fts (urls_fts) VALUES ('optimize')")
+                    conn.commit()
+                cursor.execute("VACUUM")
+            return archived
+
+
+
+class Frontier:
+    """
+    Discovered article links waiting to be crawled, kept next to the urls table.
+
+    Links enter the frontier once, when they first appear on a target's
+    listing, and leave it when they are crawled. Links already in the urls
+    table, or archived from it, are never queued. Cron crawls only a link
+    per target and run, while listings keep adding more, so links are
+    served newest first, and those past max_age_days or beyond the newest
+    max_pending of their target are dropped as stale news.
+    """
+
+    def __init__(self, urls: URLDatabase, max_pending: int = 100, max_age_days: float = 7):
+        """Create the frontier table in the URL database if it doesn't exist.
+
+        Args:
+            urls: The URL database whose crawled entries the frontier skips
+            max_pending: Links kept per target
+            max_age_days: Age in days after which a link is dropped
+        """
+        self.urls = urls
+        self.max_pending = max_pending
+        self.max_age_days = max_age_days
+        self._ensure_table_exists()
+
+    def _ensure_table_exists(self) -> None:
+        """Create the table if it doesn't already exist."""
+        with self.urls._cursor() as (conn, cursor):
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS frontier (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ctr TEXT NOT NULL,
+                    domain TEXT NOT NULL,
+                    uripath TEXT NOT NULL,
+                    discovered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(domain, uripath)
+                )
+            """)
+
+            # Pending links are read per target, newest first
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_frontier_ctr ON frontier(ctr, id)
+            """)
+
+            conn.commit()
+
+    def push(self, ctr: str, links: List[Tuple[str, str]]) -> int:
+        """Queue links that are neither crawled nor queued yet, then trim the target's queue.
+
+        Args:
+            ctr: Target the links were found on
+            links: (domain, uripath) pairs, newest first, as listings show them
+
+        Returns:
+            The number of links added
+        """
+        with self.urls._cursor() as (conn, cursor):
+            # Both checks are answered from the url_hash indexes alone. Inserted
+            # in reverse, so the newest link gets the highest id
+            cursor.executemany(
+                """INSERT OR IGNORE INTO frontier (ctr, domain, uripath)
+                   SELECT ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM urls WHERE url_hash = ?)
+                   AND NOT EXISTS (SELECT 1 FROM url_tombstones WHERE url_hash = ?4)""",
+                [(ctr, domain, uripath, url_hash(domain, uripath)) for domain, uripath in reversed(links)]
+            )
+            added = cursor.rowcount
+            cursor.execute(
+                """DELETE FROM frontier WHERE ctr = ?1 AND (discovered_at < datetime('now', ?2)
+                   OR id NOT IN (SELECT id FROM frontier WHERE ctr = ?1 ORDER BY id DESC LIMIT ?3))""",
+                (ctr, f"-{self.max_age_days} days", self.max_pending)
+            )
+            conn.commit()
+            return added
+
+    def pending(self, ctr: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Read a target's queued links, newest first.
+
+        Args:
+            ctr: Target id
+            limit: Maximum number of entries returned
+
+        Returns:
+            A list of dictionaries representing frontier entries
+        """
+        with self.urls._cursor() as (conn, cursor):
             cursor.execute(
-                "SELECT * FROM urls WHERE domain LIKE ? OR uripath LIKE ?",
-                (pattern, pattern)
+                "SELECT * FROM frontier WHERE ctr = ? ORDER BY id DESC LIMIT ?",
+                (ctr, -1 if limit is None else limit)
             )
             return [dict(row) for row in cursor.fetchall()]
-        finally:
-            conn.close()
 
+    def remove(self, domain: str, uripath: str) -> bool:
+        """Take a link out of the frontier, e.g. once it is crawled.
+
+        Returns:
+            True if the link was queued
+        """
+        with self.urls._cursor() as (conn, cursor):
+            cursor.execute("DELETE FROM frontier WHERE domain = ? AND uripath = ?", (domain, uripath))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def count(self, ctr: Optional[str] = None) -> int:
+        """Return the number of queued links, of one target or of all."""
+        with self.urls._cursor() as (conn, cursor):
+            if ctr is None:
+                cursor.execute("SELECT COUNT(*) FROM frontier")
+            else:
+                cursor.execute("SELECT COUNT(*) FROM frontier WHERE ctr = ?", (ctr,))
+            return cursor.fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolidate URL databases (e.g. those of crawler shards) and archive old entries")
+    parser.add_argument("--db", type=str, default="urls.db", help="URL database to work on")
+    parser.add_argument("--merge", nargs="+", metavar="DB", default=[], help="URL databases to merge in")
+    parser.add_argument("--compact", type=float, metavar="DAYS", default=None, help="Move entries older than DAYS days to --archive-db, keeping only their keys")
+    parser.add_argument("--archive-db", type=str, default="urls-archive.db", help="Database receiving compacted entries")
+    args = parser.parse_args()
+
+    urls = URLDatabase(db_path=args.db)
+    for path in args.merge:
+        if os.path.abspath(path) == os.path.abspath(args.db):
+            continue
+        print(f"{path}: {urls.merge(path)} entries added")
+
+    if args.compact is not None:
+        print(f"{urls.compact(args.compact, archive_path=args.archive_db)} entries older than {args.compact:g} days moved to {args.archive_db}")
+
+    with urls._cursor() as (conn, cursor):
+        cursor.execute("SELECT COUNT(*) FROM urls")
+        entries = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM url_tombstones")
+        print(f"{args.db}: {entries} entries, {cursor.fetchone()[0]} archived")
+
+
+if __name__ == "__main__":
+    main()
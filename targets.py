@@ -0,0 +1,251 @@
+import json
+import os
+import threading
+from typing import List, Dict, Any, Tuple
+from urllib.parse import urlparse
+
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "targeturl_base.json")
+
+REQUIRED_KEYS = ("ctr", "url", "list_pattern", "pattern")
+# Cheaper sources of new article URLs than scraping the listing page
+OPTIONAL_KEYS = ("feed_url", "sitemap_url")
+
+# (path, compiled) -> (mtime_ns, size, targets, problems of the targets left out)
+_cache: Dict[Tuple[str, bool], Tuple[int, int, List[Dict[str, Any]], List[str]]] = {}
+_cache_lock = threading.Lock()
+
+
+class TargetConfigError(ValueError):
+    """Raised when the target configuration is missing, unreadable or invalid."""
+
+    def __init__(self, path: str, problems: List[str]):
+        self.path = path
+        self.problems = problems
+        super().__init__(f"Invalid target configuration {path}:\n" + "\n".join(f"  - {problem}" for problem in problems))
+
+
+def select(soup, selector):
+    """
+    Return the elements of a parsed page that match a selector.
+
+    Args:
+        soup: BeautifulSoup document or tag
+        selector: CSS selector string, or a selector pre-compiled by this module
+
+    Returns:
+        list: Matching elements
+    """
+    if isinstance(selector, str):
+        return soup.select(selector)
+    return selector.select(soup)
+
+
+def selector_text(selector) -> str:
+    """Return the source text of a selector, compiled or not."""
+    return selector if isinstance(selector, str) else selector.pattern
+
+
+def _check_selector(selector, where: str, problems: List[str]) -> None:
+    if not isinstance(selector, str) or not selector.strip():
+        problems.append(f"{where}: expected a non-empty CSS selector string, got {selector!r}")
+
+
+def _compile(selector, where: str, problems: List[str]):
+    # soupsieve imports bs4; runs that end before parsing a page load neither
+    import soupsieve
+
+    if not isinstance(selector, str):
+        return selector
+    try:
+        return soupsieve.compile(selector)
+    except soupsieve.SelectorSyntaxError as e:
+        problems.append(f"{where}: invalid selector {selector!r}: {str(e).splitlines()[0]}")
+        return None
+
+
+def _compile_target(target: Dict[str, Any], where: str, problems: List[str]) -> Dict[str, Any]:
+    """Return a validated target with its selectors compiled, adding invalid selectors to problems."""
+    return {
+        **target,
+        "list_pattern": [
+            _compile(selector, f"{where} list_pattern[{position}]", problems)
+            for position, selector in enumerate(target["list_pattern"])
+        ],
+        "pattern": {
+            field: _compile(selector, f"{where} pattern.{field}", problems)
+            for field, selector in target["pattern"].items()
+        },
+    }
+
+
+def compile_targets(raw: Any, path: str = "<targets>", problems: List[str] = None,
+                    compile: bool = True) -> List[Dict[str, Any]]:
+    """
+    Validate target definitions and pre-compile their selectors.
+
+    The returned targets keep the targeturl_base.json shape, but the
+    entries of "list_pattern" and the values of "pattern" are compiled
+    soupsieve selectors, which WebCrawler.extract_links and
+    GeminiClient.format_extracted accept in place of strings.
+
+    A target with a missing or unknown key, a bad URL or an invalid
+    selector is left out, so one broken site doesn't stop the others; its
+    problems are added to `problems`. Only errors in the file as a whole,
+    a root that isn't a list or a ctr used twice, fail the load.
+
+    Args:
+        raw: Parsed JSON content (a list of target objects)
+        path: Source of the definitions, used in error messages
+        problems: List receiving the problems of the targets left out
+        compile: False to only validate the definitions and keep the
+            selectors as strings, without loading soupsieve and bs4; see compile_selectors
+
+    Returns:
+        list: The valid targets
+
+    Raises:
+        TargetConfigError: On an error in the file as a whole, listing every problem found
+    """
+    if not isinstance(raw, list):
+        raise TargetConfigError(path, [f"expected a list of targets, got {type(raw).__name__}"])
+
+    found: List[str] = []
+    fatal = False
+    valid_targets = []
+    seen_ctrs = set()
+
+    for index, target in enumerate(raw):
+        where = f"target {index}"
+        if not isinstance(target, dict):
+            found.append(f"{where}: expected an object, got {type(target).__name__}")
+            continue
+        if isinstance(target.get("ctr"), str):
+            where = f"target {index} ({target['ctr']})"
+        target_problems: List[str] = []
+
+        for key in REQUIRED_KEYS:
+            if key not in target:
+                target_problems.append(f"{where}: missing \"{key}\"")
+        for key in target:
+            if key not in REQUIRED_KEYS + OPTIONAL_KEYS:
+                target_problems.append(f"{where}: unknown key \"{key}\"")
+
+        ctr = target.get("ctr")
+        if "ctr" in target:
+            if not isinstance(ctr, str) or not ctr:
+                target_problems.append(f"{where}: \"ctr\" must be a non-empty string")
+            elif ctr in seen_ctrs:
+                # State files are keyed by ctr; two targets would share them
+                target_problems.append(f"{where}: duplicate ctr \"{ctr}\"")
+                fatal = True
+            seen_ctrs.add(ctr)
+
+        for key in ("url",) + OPTIONAL_KEYS:
+            if key in target:
+                url = target[key]
+                parsed = urlparse(url) if isinstance(url, str) else None
+                if not parsed or parsed.scheme not in ("http", "https") or not parsed.netloc:
+                    target_problems.append(f"{where}: \"{key}\" must be an http(s) URL, got {url!r}")
+
+        list_pattern = target.get("list_pattern")
+        if "list_pattern" in target:
+            if not isinstance(list_pattern, list) or not list_pattern:
+                target_problems.append(f"{where}: \"list_pattern\" must be a non-empty list of selectors")
+            else:
+                for position, selector in enumerate(list_pattern):
+                    _check_selector(selector, f"{where} list_pattern[{position}]", target_problems)
+
+        pattern = target.get("pattern")
+        if "pattern" in target:
+            if not isinstance(pattern, dict) or not pattern:
+                target_problems.append(f"{where}: \"pattern\" must be a non-empty object of field -> selector")
+            else:
+                if "content" not in pattern:
+                    target_problems.append(f"{where}: \"pattern\" has no \"content\" selector")
+                for field, selector in pattern.items():
+                    _check_selector(selector, f"{where} pattern.{field}", target_problems)
+
+        if not target_problems and compile:
+            target = _compile_target(target, where, target_problems)
+        if target_problems:
+            found.extend(target_problems)
+            continue
+        valid_targets.append(target)
+
+    if fatal:
+        raise TargetConfigError(path, found)
+    if problems is not None:
+        problems.extend(found)
+    return valid_targets
+
+
+def compile_selectors(target_list: List[Dict[str, Any]], problems: List[str] = None) -> List[Dict[str, Any]]:
+    """
+    Compile the selectors of targets loaded with compile=False.
+
+    Args:
+        target_list: Validated targets
+        problems: List receiving the problems of the targets left out for an invalid selector
+
+    Returns:
+        list: The targets with compiled selectors, in the same order
+    """
+    compiled = []
+    for target in target_list:
+        target_problems: List[str] = []
+        target = _compile_target(target, f"target {target['ctr']}", target_problems)
+        if target_problems:
+            if problems is not None:
+                problems.extend(target_problems)
+            continue
+        compiled.append(target)
+    return compiled
+
+
+def load_targets(path: str = DEFAULT_PATH, problems: List[str] = None, compile: bool = True) -> List[Dict[str, Any]]:
+    """
+    Load, validate and compile the target configuration.
+
+    The compiled targets are cached per path and reused until the file's
+    modification time or size changes, so a long-running process picks up
+    edits without re-compiling on every call.
+
+    Args:
+        path: Target configuration file
+        problems: List receiving the problems of invalid targets, which are left out (see compile_targets)
+        compile: False to keep the selectors as strings (see compile_targets)
+
+    Returns:
+        list: Compiled valid targets (shared; don't modify them)
+
+    Raises:
+        TargetConfigError: If the file can't be read, isn't a list of targets or repeats a ctr
+    """
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        raise TargetConfigError(path, [f"cannot read file: {e}"])
+
+    with _cache_lock:
+        cached = _cache.get((path, compile))
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            if problems is not None:
+                problems.extend(cached[3])
+            return cached[2]
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except OSError as e:
+        raise TargetConfigError(path, [f"cannot read file: {e}"])
+    except ValueError as e:
+        raise TargetConfigError(path, [f"invalid JSON: {e}"])
+
+    found: List[str] = []
+    loaded = compile_targets(raw, path, problems=found, compile=compile)
+    with _cache_lock:
+        _cache[(path, compile)] = (stat.st_mtime_ns, stat.st_size, loaded, found)
+    if problems is not None:
+        problems.extend(found)
+    return loaded
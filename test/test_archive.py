@@ -0,0 +1,112 @@
+import os
+import pytest
+from unittest.mock import patch, Mock
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app
+from archive import PageArchive, ReplayCrawler
+from crawler import WebCrawler
+
+
+HTML = "<html><body><div class='article-body'>Zürich ünd Seoul 서울</div></body></html>"
+
+
+@pytest.fixture
+def page_archive(tmp_path):
+    return PageArchive(directory=str(tmp_path / "archive"))
+
+
+def segment_files(page_archive):
+    return [name for name in os.listdir(page_archive.directory) if name.startswith("pages-")]
+
+
+class TestPageArchive:
+
+    def test_store_and_get(self, page_archive):
+        """저장한 페이지를 URL로 다시 읽을 수 있는지 테스트"""
+        headers = {"Content-Type": "text/html; charset=utf-8", "ETag": '"abc"'}
+        digest = page_archive.store("https://a.example/a/1", 200, headers, HTML.encode("utf-8"), fetched_at=1000.0)
+
+        page = page_archive.get("https://a.example/a/1")
+        assert page["body"] == HTML.encode("utf-8")
+        assert page["headers"] == headers
+        assert (page["status"], page["digest"], page["fetched_at"]) == (200, digest, 1000.0)
+        assert page_archive.get_text("https://a.example/a/1") == HTML
+        assert page_archive.get("https://a.example/missing") is None
+        assert page_archive.get_text("https://a.example/missing") == ""
+
+
+    def test_identical_bodies_stored_once(self, page_archive):
+        """같은 본문은 한 번만 저장되고 이후 캡처는 revisit 레코드로 남는지 테스트"""
+        body = os.urandom(8192)
+        page_archive.store("https://a.example/a/1", 200, {}, body)
+        size = page_archive.stats()["bytes"]
+        page_archive.store("https://a.example/a/2", 200, {}, body)
+        page_archive.store("https://a.example/a/1", 200, {}, body)
+
+        stats = page_archive.stats()
+        assert (stats["captures"], stats["urls"], stats["payloads"]) == (3, 2, 1)
+        assert stats["bytes"] - size < size
+        assert page_archive.get("https://a.example/a/2")["body"] == body
+
+
+    def test_latest_capture_and_reopen(self, page_archive):
+        """최신 캡처가 반환되고, 다시 연 아카이브에서도 읽히는지 테스트"""
+        page_archive.store("https://a.example/a/1", 200, {}, b"old", fetched_at=1000.0)
+        page_archive.store("https://a.example/a/1", 200, {}, b"new", fetched_at=2000.0)
+        page_archive.store("https://b.example/", 200, {}, b"other")
+        page_archive.close()
+
+        reopened = PageArchive(directory=page_archive.directory)
+        assert reopened.get("https://a.example/a/1")["body"] == b"new"
+        assert list(reopened.urls("a.example")) == ["https://a.example/a/1"]
+        assert len(list(reopened.urls())) == 2
+
+
+    def test_segment_rotation(self, tmp_path):
+        """세그먼트가 최대 크기를 넘으면 새 파일로 넘어가는지 테스트"""
+        page_archive = PageArchive(directory=str(tmp_path / "archive"), max_segment_bytes=1)
+        for number in range(3):
+            page_archive.store(f"https://a.example/a/{number}", 200, {}, f"body {number}".encode())
+
+        assert len(segment_files(page_archive)) == 3
+        assert page_archive.get("https://a.example/a/0")["body"] == b"body 0"
+
+
+class TestArchiveCrawling:
+
+    @patch('requests.get')
+    def test_crawler_archives_fetched_pages(self, mock_get, page_archive):
+        """크롤러가 성공한 응답을 아카이브에 기록하는지 테스트"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.text = HTML
+        mock_response.content = HTML.encode("utf-8")
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        mock_get.return_value = mock_response
+
+        crawler = WebCrawler(archive=page_archive)
+        assert crawler.get_page_content("https://a.example/a/1") == HTML
+
+        mock_response.status_code = 404
+        assert crawler.get_page_content("https://a.example/a/2") == ""
+
+        assert list(page_archive.urls()) == ["https://a.example/a/1"]
+
+
+    @patch('requests.get')
+    def test_replay_does_not_fetch(self, mock_get, page_archive):
+        """재처리 모드가 네트워크 없이 아카이브에서 페이지를 읽는지 테스트"""
+        page_archive.store("https://a.example/list/", 200, {}, b"<ul></ul>")
+        page_archive.store("https://a.example/a/1", 200, {}, HTML.encode("utf-8"))
+        page_archive.store("https://b.example/a/9", 200, {}, b"elsewhere")
+
+        crawler = ReplayCrawler(page_archive)
+        assert crawler.get_page_content("https://a.example/a/1") == HTML
+        assert crawler.get_page_content("https://a.example/a/2") == ""
+        mock_get.assert_not_called()
+
+        target_urls = [{"ctr": "us1", "url": "https://a.example/list/"}]
+        assert app.archived_article_urls(target_urls, page_archive) == ["https://a.example/a/1"]
@@ -0,0 +1,104 @@
+import pytest
+import requests
+from unittest.mock import patch
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app
+from benchmarks import corpus, startup
+from benchmarks.fakes import FakeServices, ServiceProfile
+from cms_client import GhostCmsClient
+from crawler import WebCrawler
+from google_ai_studio import GeminiClient
+from outbox import Outbox, Publisher
+from store import URLDatabase
+from unsplash import UnsplashAPI
+
+
+TARGETS = corpus.load_targets()
+
+
+class TestBenchmarkCorpus:
+
+    @pytest.mark.parametrize("target", TARGETS, ids=lambda target: target["ctr"])
+    def test_corpus_is_up_to_date(self, target):
+        """기록된 코퍼스가 현재 targeturl_base.json으로 생성한 페이지와 같은지 테스트"""
+        for kind in ("listing", "article"):
+            assert corpus.load(target["ctr"], kind) == corpus.build_page(target, kind)
+
+
+    @pytest.mark.parametrize("target", TARGETS, ids=lambda target: target["ctr"])
+    def test_corpus_matches_selectors(self, target):
+        """코퍼스 페이지에서 각 타겟의 셀렉터로 링크와 본문이 추출되는지 테스트"""
+        crawler = WebCrawler()
+        with patch.object(WebCrawler, "get_page_content", return_value=corpus.load(target["ctr"], "listing")):
+            links = crawler.extract_links(target["url"], target["list_pattern"])
+        assert len(links) > 0
+
+        extracted = GeminiClient(api_key="").format_extracted(corpus.load(target["ctr"], "article"), target["pattern"])
+        content_line = next(line for line in extracted.splitlines() if line.startswith("-content : "))
+        assert content_line != "-content : "
+
+
+@pytest.fixture
+def fakes():
+    services = FakeServices(sites=1, articles_per_site=3).start()
+    yield services
+    services.stop()
+
+
+class TestFakeServices:
+
+    def test_pipeline_publishes_through_fakes(self, fakes, tmp_path):
+        """가짜 서비스만으로 크롤링부터 Ghost 게시까지 파이프라인이 동작하는지 테스트"""
+        image = UnsplashAPI(access_key="test", base_url=fakes.unsplash_url)
+        ghost_client = GhostCmsClient(url=fakes.ghost_url, admin_api_key="test:" + "00" * 32)
+        posts = Outbox(db_path=str(tmp_path / "outbox.db"))
+        pipeline = app.Pipeline(
+            s3=URLDatabase(db_path=str(tmp_path / "urls.db")),
+            craw=WebCrawler(),
+            ai=GeminiClient(api_key="test", base_url=fakes.gemini_url),
+            image=image,
+            ghost_client=ghost_client,
+            outbox=posts,
+        )
+        target = fakes.targets()[0]
+
+        links = pipeline.craw.extract_links(target["url"], target["list_pattern"])
+        domain, path = app.resolve_link(target["url"], links[0])
+        assert len(links) == 3
+
+        assert pipeline.process_article(f"{domain}{path}", target["pattern"]) is True
+        assert Publisher(client=ghost_client, outbox=posts).drain(timeout=0) == 1
+
+        post = ghost_client.find_post_by_canonical_url(f"{domain}{path}")
+        assert post["title"] == "[USA] Cloud platform update"
+        assert post["feature_image"].startswith(fakes.unsplash_url)
+        assert fakes.stats()["gemini"] == {200: 3}
+
+
+    def test_injected_throttling(self, tmp_path):
+        """설정한 비율로 429 응답과 Retry-After 헤더가 주입되는지 테스트"""
+        services = FakeServices(profiles={"ghost": ServiceProfile(throttle_rate=1.0, retry_after=7)}).start()
+        try:
+            response = requests.get(f"{services.ghost_url}/ghost/api/admin/tags/")
+        finally:
+            services.stop()
+
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "7"
+        assert services.stats() == {"ghost": {429: 1}}
+
+
+class TestStartup:
+
+    @pytest.mark.parametrize("scenario", startup.EARLY_EXIT_SCENARIOS)
+    def test_early_exit_stays_lean(self, scenario):
+        """API 키 누락 등으로 일찍 끝나는 실행이 파싱/AI 관련 모듈을 불러오지 않는지 테스트"""
+        modules = startup.import_times(startup.SCENARIOS[scenario])
+        loaded = {name.split(".")[0] for name, _, _, _ in modules}
+
+        assert "metrics" in loaded
+        assert [name for name in startup.forbidden_modules(scenario) if name in loaded] == []
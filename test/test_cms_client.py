@@ -0,0 +1,124 @@
+import pytest
+import json
+from unittest.mock import Mock
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cms_client import GhostCmsClient
+
+
+def make_response(status_code, body=None):
+    response = Mock()
+    response.status_code = status_code
+    response.text = json.dumps(body or {})
+    response.json.return_value = body or {}
+    return response
+
+
+class FakeGhost:
+    """Ghost Admin API 의 tags / users / posts 엔드포인트를 흉내내는 세션"""
+
+    def __init__(self):
+        self.tags = [{"id": "t1", "name": "News", "slug": "news"}]
+        self.users = [{"id": "u1", "name": "Editor", "slug": "editor", "email": "editor@example.com"}]
+        self.calls = []
+        self.params = []
+
+    def request(self, method, url, headers=None, json=None, **kwargs):
+        path = url.split("/ghost/api/admin/", 1)[1]
+        self.calls.append((method, path, json))
+        self.params.append(kwargs.get("params"))
+
+        if method == "GET" and path.startswith("tags/"):
+            return make_response(200, {"tags": list(self.tags)})
+        if method == "GET" and path.startswith("users/"):
+            return make_response(200, {"users": list(self.users)})
+        if method == "POST" and path == "tags/":
+            tag = {"id": f"t{len(self.tags) + 1}", "name": json["tags"][0]["name"]}
+            self.tags.append(tag)
+            return make_response(201, {"tags": [tag]})
+        if method == "GET" and path.startswith("posts/"):
+            return make_response(200, {"posts": []})
+        if method == "POST" and path.startswith("posts/"):
+            return make_response(201, {"posts": [dict(json["posts"][0], id="p1")]})
+        return make_response(404)
+
+
+@pytest.fixture
+def ghost():
+    return FakeGhost()
+
+
+@pytest.fixture
+def client(ghost):
+    client = GhostCmsClient(url="https://blog.example/", admin_api_key="abc:" + "00" * 32)
+    client.session = ghost
+    return client
+
+
+
+
+class TestGhostCmsClient:
+
+
+    def test_resolve_tags_creates_missing_once(self, client, ghost):
+        """태그 이름을 id 로 변환하고 없는 태그는 한 번만 생성하는지 테스트"""
+        first = client.resolve_tags([{"name": "News"}, {"name": "crawled"}, "news"])
+        second = client.resolve_tags([{"name": "crawled"}])
+
+        assert first == [{"id": "t1"}, {"id": "t2"}, {"id": "t1"}]
+        assert second == [{"id": "t2"}]
+
+        methods = [(method, path.split("?")[0]) for method, path, _ in ghost.calls]
+        assert methods.count(("GET", "tags/")) == 1
+        assert methods.count(("POST", "tags/")) == 1
+
+
+    def test_tags_refresh_after_interval(self, client, ghost):
+        """갱신 주기가 지나거나 캐시에 없는 태그가 있으면 태그 목록을 다시 가져오는지 테스트"""
+        client.resolve_tags(["News"])
+        ghost.tags.append({"id": "t9", "name": "Security"})
+
+        # 사이트에 이미 있는 태그는 새로 만들지 않는다
+        assert client.resolve_tags(["Security"]) == [{"id": "t9"}]
+        assert not any(method == "POST" for method, _, _ in ghost.calls)
+
+        ghost.tags.append({"id": "t10", "name": "Cloud"})
+        assert "cloud" not in client.get_tags()
+        client.metadata_refresh_interval = 0
+        assert "cloud" in client.get_tags()
+
+
+    def test_create_post_sends_ids(self, client, ghost):
+        """게시 요청에 태그와 작성자가 id 로 전송되는지 테스트"""
+        result = client.create_post(
+            title="Title",
+            content="<p>body</p>",
+            tags=[{"name": "News"}],
+            authors=[{"email": "Editor@example.com"}, {"email": "nobody@example.com"}],
+        )
+
+        post = result["posts"][0]
+        assert post["tags"] == [{"id": "t1"}]
+        assert post["authors"] == [{"id": "u1"}]
+
+
+    def test_update_post_sends_updated_at(self, client, ghost):
+        """게시글 갱신 시 updated_at 을 포함한 PUT 요청을 보내는지 테스트"""
+        post_data = client.build_post_data("Title", "<p>new</p>", status="published", tags=[{"name": "News"}])
+        client.update_post("p1", post_data, "2025-01-01T00:00:00.000Z")
+
+        method, path, body = ghost.calls[-1]
+        assert method == "PUT"
+        assert path == "posts/p1/?source=html"
+        assert body["posts"][0]["updated_at"] == "2025-01-01T00:00:00.000Z"
+        assert "published_at" not in body["posts"][0]
+        assert body["posts"][0]["tags"] == [{"id": "t1"}]
+
+
+    def test_canonical_url_filter_is_escaped(self, client, ghost):
+        """작은따옴표와 역슬래시가 든 원문 URL 도 NQL 필터가 깨지지 않게 이스케이프되는지 테스트"""
+        assert client.find_post_by_canonical_url("https://news.example/it's\\1") is None
+        assert ghost.params[-1]["filter"] == "canonical_url:'https://news.example/it\\'s\\\\1'"
@@ -1,5 +1,7 @@
+import gzip
 import pytest
 import requests
+import tracemalloc
 from unittest.mock import patch, Mock
 from bs4 import BeautifulSoup
 
@@ -7,7 +9,9 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from crawler import WebCrawler
+import app
+from crawler import WebCrawler, parse_feed, _feed_date
+from benchmarks.fakes import FakeServices
 
 
 @pytest.fixture
@@ -117,3 +121,123 @@ class TestWebCrawler:
         assert "/page1" in links
         assert "/page2" in links
         assert "/page3" in links
+
+
+
+ATOM = b"""<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+    <title>News</title>
+    <link href="https://a.example/" rel="alternate"/>
+    <entry>
+        <title>One</title>
+        <link rel="enclosure" href="https://a.example/one.mp3"/>
+        <link href="https://a.example/a/1"/>
+        <updated>2026-10-18T09:00:00Z</updated>
+    </entry>
+    <entry>
+        <title>Two</title>
+        <link rel="alternate" href="https://a.example/a/2"/>
+        <published>2026-10-19T09:00:00+09:00</published>
+    </entry>
+</feed>"""
+
+NEWS_SITEMAP = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+        xmlns:news="http://www.google.com/schemas/sitemap-news/0.9"
+        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">
+    <url>
+        <loc>https://a.example/a/3</loc>
+        <image:image><image:loc>https://a.example/3.jpg</image:loc></image:image>
+        <news:news><news:publication_date>2026-10-19T01:00:00Z</news:publication_date></news:news>
+        <lastmod>2026-10-19T05:00:00Z</lastmod>
+    </url>
+    <url><loc>https://a.example/a/4</loc></url>
+</urlset>"""
+
+
+class TestFeedDiscovery:
+
+    def test_parse_atom_in_small_chunks(self):
+        """Atom 피드를 조각난 입력으로도 파싱하고 alternate 링크와 날짜를 읽는지 테스트"""
+        entries = list(parse_feed(ATOM[n:n + 7] for n in range(0, len(ATOM), 7)))
+
+        assert [(kind, url) for kind, url, _ in entries] == [("entry", "https://a.example/a/1"), ("entry", "https://a.example/a/2")]
+        assert entries[0][2].isoformat() == "2026-10-18T09:00:00+00:00"
+        assert entries[1][2].isoformat() == "2026-10-19T09:00:00+09:00"
+
+
+    def test_parse_gzipped_news_sitemap(self):
+        """gzip 압축된 뉴스 사이트맵에서 기사 URL과 게시일을 읽는지 테스트"""
+        data = gzip.compress(NEWS_SITEMAP)
+
+        entries = list(parse_feed([data[:10], data[10:]]))
+
+        assert [url for _, url, _ in entries] == ["https://a.example/a/3", "https://a.example/a/4"]
+        assert entries[0][2].isoformat() == "2026-10-19T01:00:00+00:00"
+        assert entries[1][2] is None
+
+
+    def test_parse_feed_memory_is_flat(self):
+        """항목 수가 많아도 파싱이 끝난 항목을 트리에 남기지 않아 메모리가 늘지 않는지 테스트"""
+        def sitemap(count):
+            yield b'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            for n in range(count):
+                yield f'<url><loc>https://a.example/a/{n}</loc><lastmod>2026-10-19</lastmod></url>'.encode()
+            yield b'</urlset>'
+
+        tracemalloc.start()
+        try:
+            assert sum(1 for _ in parse_feed(sitemap(20000))) == 20000
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        # 항목을 부모에 남겨 두면 약 1.5 MiB
+        assert peak < 200 * 1024
+
+
+    def test_sitemap_index_follows_newest_children(self, crawler):
+        """사이트맵 인덱스에서 최근 수정된 하위 사이트맵만 읽는지 테스트"""
+        documents = {
+            "https://a.example/sitemap.xml": [
+                ("sitemap", "https://a.example/sitemap-old.xml", _feed_date("2020-01-01")),
+                ("sitemap", "https://a.example/sitemap-new.xml", _feed_date("2026-10-19")),
+            ],
+            "https://a.example/sitemap-new.xml": [("entry", "https://a.example/a/5", None)],
+            "https://a.example/sitemap-old.xml": [("entry", "https://a.example/a/0", None)],
+        }
+        with patch.object(WebCrawler, '_feed_entries', side_effect=lambda url: documents[url]):
+            links = crawler.feed_links("https://a.example/sitemap.xml", max_child_sitemaps=1)
+
+        assert links == ["https://a.example/a/5"]
+
+
+    def test_feed_links_newest_first(self, crawler):
+        """피드 링크가 최신순으로 정렬되고 오래된 항목과 개수 제한이 적용되는지 테스트"""
+        services = FakeServices(sites=1, articles_per_site=30).start()
+        try:
+            feed_url = services.targets(feeds=True)[0]["feed_url"]
+            links = crawler.feed_links(feed_url, limit=5)
+            recent = crawler.feed_links(feed_url, max_age=10 * 3600 - 60)
+        finally:
+            services.stop()
+
+        assert links == [f"{services.url}/site0/articles/{n}.html" for n in range(5)]
+        assert len(recent) == 10
+
+
+    def test_listing_fallback_without_feed_links(self, crawler):
+        """피드에서 링크를 찾지 못하면 목록 페이지 스크래핑으로 대체하는지 테스트"""
+        services = FakeServices(sites=1, articles_per_site=3).start()
+        try:
+            target = services.targets(feeds=True)[0]
+            page, links = app.fetch_listing(crawler, target)
+            assert links[0] == f"{services.url}/site0/articles/0.html"
+            assert page == "\n".join(links)
+
+            target["feed_url"] = f"{services.url}/site0/missing.xml"
+            page, links = app.fetch_listing(crawler, target)
+            assert links is None
+            assert 'class="article-list"' in page
+        finally:
+            services.stop()
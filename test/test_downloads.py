@@ -0,0 +1,98 @@
+import pytest
+import os
+import threading
+import time
+from unittest.mock import Mock
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from downloads import DownloadManager, stream_to_file
+
+
+IMAGES = {
+    "a": b"jpeg-bytes-a" * 1000,
+    "b": b"jpeg-bytes-b" * 1000,
+    "same-as-a": b"jpeg-bytes-a" * 1000,
+}
+
+
+def make_image_response(data, content_type="image/jpeg"):
+    response = Mock()
+    response.headers = {"Content-Type": content_type}
+    response.iter_content.side_effect = lambda chunk_size: (data[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+    return response
+
+
+@pytest.fixture
+def api():
+    """다운로드 엔드포인트와 세션을 흉내낸 API"""
+    api = Mock()
+    api.active = 0
+    api.max_active = 0
+    lock = threading.Lock()
+
+    def track_download(photo_id):
+        return f"https://images.example/{photo_id}"
+
+    def get_image(url, stream, timeout):
+        with lock:
+            api.active += 1
+            api.max_active = max(api.max_active, api.active)
+        time.sleep(0.02)
+        with lock:
+            api.active -= 1
+        return make_image_response(IMAGES[url.rsplit("/", 1)[-1]])
+
+    api.track_download.side_effect = track_download
+    api.session.get.side_effect = get_image
+    return api
+
+
+@pytest.fixture
+def manager(api, tmp_path):
+    return DownloadManager(api=api, cache_dir=str(tmp_path / "cache"), max_workers=2, chunk_size=1024)
+
+
+
+
+class TestDownloadManager:
+
+
+    def test_stream_to_file(self, tmp_path):
+        """청크 단위 저장과 해시 계산 테스트"""
+        path = str(tmp_path / "out" / "image.jpg")
+        sha256 = stream_to_file(make_image_response(IMAGES["a"]), path, chunk_size=100)
+
+        with open(path, "rb") as f:
+            assert f.read() == IMAGES["a"]
+        assert len(sha256) == 64
+        assert os.listdir(tmp_path / "out") == ["image.jpg"]
+
+
+    def test_download_skips_cached(self, manager, api):
+        """이미 캐시된 사진은 다시 다운로드하지 않는지 테스트"""
+        first = manager.download({"id": "a"})
+        second = manager.download("a")
+
+        assert first == second
+        assert api.session.get.call_count == 1
+
+        reloaded = DownloadManager(api=api, cache_dir=manager.cache_dir)
+        assert reloaded.cached_path("a") == first
+
+
+    def test_content_addressed(self, manager):
+        """내용이 같은 사진은 한 파일을 공유하는지 테스트"""
+        assert manager.download("a") == manager.download("same-as-a")
+        assert manager.download("b") != manager.download("a")
+
+
+    def test_download_many_bounded(self, manager, api):
+        """동시 다운로드 수가 워커 수로 제한되는지 테스트"""
+        results = manager.download_many(["a", "b", "same-as-a", "a"])
+
+        assert set(results) == {"a", "b", "same-as-a"}
+        assert all(os.path.exists(path) for path in results.values())
+        assert api.session.get.call_count == 3
+        assert api.max_active <= 2
@@ -0,0 +1,68 @@
+import os
+from bs4 import BeautifulSoup
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from extraction import element_text, main_content
+from google_ai_studio import GeminiClient
+
+
+ARTICLE = """
+<html><head><style>.a{color:red}</style><script>var tracking = 1;</script></head><body>
+<header><nav><ul>
+    <li><a href="/news">News</a></li><li><a href="/tech">Tech</a></li><li><a href="/biz">Business</a></li>
+</ul></nav></header>
+<div class="layout">
+    <div class="story">
+        <h1 class="headline">Chip   maker
+            reports record revenue</h1>
+        <div class="body">
+            <p>The company said on Monday that revenue grew by a third, driven by data center demand.</p>
+            <script>ads.push({slot: "inline"});</script>
+            <p>Analysts had expected <b>slower</b> growth, citing weaker demand for consumer devices.</p>
+            <div class="ad-inline">Buy now</div>
+            <p>Shares rose six percent in early trading, the biggest gain in more than a year.</p>
+            <div class="share-buttons"><a href="https://share.example/x">x</a><button>Copy link</button></div>
+        </div>
+    </div>
+    <aside class="related-articles"><ul>
+        <li><a href="/a/1">Another chip maker reports its own quarterly revenue figures today</a></li>
+        <li><a href="/a/2">Data center demand keeps growing across the industry this year</a></li>
+        <li><a href="/a/3">Consumer devices see weaker sales in the third quarter of the year</a></li>
+    </ul></aside>
+</div>
+<footer><a href="/about">About us</a></footer>
+</body></html>
+"""
+
+BODY = (
+    "The company said on Monday that revenue grew by a third, driven by data center demand.\n"
+    "Analysts had expected slower growth, citing weaker demand for consumer devices.\n"
+    "Shares rose six percent in early trading, the biggest gain in more than a year."
+)
+
+
+class TestExtraction:
+
+    def test_element_text_strips_boilerplate(self):
+        """스크립트, 광고, 공유 버튼을 빼고 문단마다 한 줄로 정규화된 텍스트를 반환하는지 테스트"""
+        soup = BeautifulSoup(ARTICLE, 'html.parser')
+
+        assert element_text(soup.select_one("div.body")) == BODY
+        assert element_text(soup.select_one("h1")) == "Chip maker reports record revenue"
+
+
+    def test_main_content_finds_article_body(self):
+        """셀렉터 없이 내비게이션과 관련 기사 목록이 아닌 본문 요소를 찾는지 테스트"""
+        soup = BeautifulSoup(ARTICLE, 'html.parser')
+
+        assert main_content(soup) is soup.select_one("div.body")
+        assert main_content(BeautifulSoup("<html><body><p>Too short.</p></body></html>", 'html.parser')) is None
+
+
+    def test_content_falls_back_when_selector_misses(self):
+        """본문 셀렉터가 아무것도 찾지 못하면 본문 추출 대체 경로를 사용하는지 테스트"""
+        fields = GeminiClient(api_key="").extract_fields(ARTICLE, {"title": "h1.headline", "content": "#missing"})
+
+        assert fields == {"title": "Chip maker reports record revenue", "content": BODY}
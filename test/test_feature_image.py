@@ -0,0 +1,97 @@
+import pytest
+import requests
+from unittest.mock import Mock
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from feature_image import FeatureImageStage
+
+
+@pytest.fixture
+def source_image(tmp_path):
+    """3000px 너비의 원본 JPEG"""
+    Image = pytest.importorskip("PIL.Image")
+    path = str(tmp_path / "original.jpg")
+    Image.new("RGB", (3000, 1500), (200, 30, 30)).save(path, format="JPEG")
+    return path
+
+
+@pytest.fixture
+def stage(source_image, tmp_path):
+    downloads = Mock()
+    downloads.cache_dir = str(tmp_path / "cache")
+    downloads.download.return_value = source_image
+
+    ghost_client = Mock()
+    ghost_client.upload_image.side_effect = lambda path, ref: f"https://blog.example/content/images/{os.path.basename(path)}"
+
+    return FeatureImageStage(ghost_client=ghost_client, downloads=downloads,
+                             cache_path=str(tmp_path / "ghost_images.json"), breakpoints=(600, 2000))
+
+
+
+
+class TestFeatureImageStage:
+
+
+    def test_optimize_resizes_and_reencodes(self, stage, source_image):
+        """가장 큰 breakpoint 로 줄이고 WebP 로 재인코딩하는지 테스트"""
+        from PIL import Image
+
+        path = stage.optimize(source_image, "abc")
+
+        assert path.endswith("abc-w2000.webp")
+        with Image.open(path) as image:
+            assert image.format == "WEBP"
+            assert image.size == (2000, 1000)
+
+
+    def test_prepare_uploads_once(self, stage, tmp_path):
+        """같은 사진은 한 번만 업로드하고 캐시된 Ghost URL 을 사용하는지 테스트"""
+        photo = {"id": "abc", "url": "https://images.unsplash.com/abc", "user": "tester"}
+
+        first = stage.prepare(photo)
+        second = stage.prepare(dict(photo))
+
+        assert first["url"] == "https://blog.example/content/images/abc-w2000.webp"
+        assert second["url"] == first["url"]
+        assert first["user"] == "tester"
+        assert stage.ghost_client.upload_image.call_count == 1
+
+        reloaded = FeatureImageStage(ghost_client=stage.ghost_client, downloads=stage.downloads,
+                                     cache_path=str(tmp_path / "ghost_images.json"))
+        assert reloaded.prepare(photo)["url"] == first["url"]
+        assert stage.ghost_client.upload_image.call_count == 1
+
+
+    def test_prepare_falls_back_on_failure(self, stage):
+        """업로드 실패 시 원래 Unsplash URL 을 유지하는지 테스트"""
+        stage.ghost_client.upload_image.side_effect = None
+        stage.ghost_client.upload_image.return_value = None
+        photo = {"id": "xyz", "url": "https://images.unsplash.com/xyz"}
+
+        assert stage.prepare(photo) == photo
+        assert "xyz" not in stage.uploaded
+
+
+    def test_prepare_falls_back_on_upload_error(self, stage):
+        """업로드 요청이 예외를 던져도 원래 Unsplash URL 을 유지하는지 테스트"""
+        stage.ghost_client.upload_image.side_effect = requests.ConnectionError("connection refused")
+        photo = {"id": "err", "url": "https://images.unsplash.com/err"}
+
+        assert stage.prepare(photo) == photo
+        assert "err" not in stage.uploaded
+
+
+    def test_cache_write_leaves_other_temp_files(self, stage, tmp_path):
+        """캐시 저장이 고정된 임시 파일 이름을 쓰지 않아 다른 프로세스의 임시 파일을 건드리지 않는지 테스트"""
+        other = tmp_path / "ghost_images.json.tmp"
+        other.write_text("{}")
+
+        stage.prepare({"id": "abc", "url": "https://images.unsplash.com/abc"})
+
+        assert other.read_text() == "{}"
+        assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp") and name != other.name]
+        assert "abc" in stage.uploaded
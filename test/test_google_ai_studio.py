@@ -0,0 +1,182 @@
+import pytest
+import json
+import threading
+from unittest.mock import MagicMock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app
+from google_ai_studio import GeminiClient, GeminiBatch
+from store import URLDatabase
+
+
+class FakeBatchHandler(BaseHTTPRequestHandler):
+    """Gemini batch API 를 흉내내는 로컬 서버 핸들러"""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length))
+        state = self.server.state
+        state['submits'] += 1
+
+        requests = body['batch']['input_config']['requests']['requests']
+        state['requests'] = requests
+        self._send(200, {"name": "batches/test-1", "metadata": {"state": "BATCH_STATE_PENDING"}})
+
+    def do_GET(self):
+        state = self.server.state
+        state['polls'] += 1
+
+        if state.get('fail'):
+            self._send(200, {"name": "batches/test-1", "done": True, "metadata": {"state": "BATCH_STATE_FAILED"}})
+            return
+
+        # 두 번째 조회부터 완료 상태로 응답
+        if state['polls'] < 2 or state.get('running'):
+            self._send(200, {"name": "batches/test-1", "metadata": {"state": "BATCH_STATE_RUNNING"}})
+            return
+
+        inlined = []
+        for item in state['requests']:
+            prompt = item['request']['contents'][0]['parts'][0]['text']
+            inlined.append({
+                "metadata": item['metadata'],
+                "response": {"candidates": [{"content": {"parts": [{"text": prompt.upper()}]}}]},
+            })
+        self._send(200, {
+            "name": "batches/test-1",
+            "done": True,
+            "metadata": {"state": "BATCH_STATE_SUCCEEDED"},
+            "response": {"inlinedResponses": {"inlinedResponses": inlined}},
+        })
+
+
+@pytest.fixture
+def batch_server():
+    """로컬 batch 대체 서버를 띄우고 base URL 을 반환"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeBatchHandler)
+    server.state = {'submits': 0, 'polls': 0, 'requests': []}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(batch_server):
+    host, port = batch_server.server_address
+    return GeminiClient(api_key="test-key", base_url=f"http://{host}:{port}/v1beta")
+
+
+
+
+class TestGeminiBatch:
+
+
+    def test_add_writes_jsonl(self, client, tmp_path):
+        """프롬프트 추가 시 JSONL 작업 파일 기록 테스트"""
+        job_path = str(tmp_path / "job.jsonl")
+        batch = GeminiBatch(client, job_path=job_path)
+        batch.add("1:title", "hello", temperature=0.2)
+        batch.add("1:content", "world")
+
+        lines = batch.requests()
+        assert [line['key'] for line in lines] == ["1:title", "1:content"]
+        assert lines[0]['request']['generationConfig'] == {"temperature": 0.2}
+        assert lines[1]['request']['contents'][0]['parts'][0]['text'] == "world"
+
+
+    def test_wait_returns_results_by_key(self, client, batch_server, tmp_path):
+        """제출, 폴링, 키별 결과 매핑 테스트"""
+        batch = GeminiBatch(client, job_path=str(tmp_path / "job.jsonl"))
+        batch.add("7:title", "title prompt")
+        batch.add("7:keyword", "keyword prompt")
+
+        results = batch.wait(poll_interval=0)
+
+        assert results == {"7:title": "TITLE PROMPT", "7:keyword": "KEYWORD PROMPT"}
+        assert batch_server.state['submits'] == 1
+        assert batch_server.state['polls'] == 2
+
+
+    def test_resume_does_not_resubmit(self, client, batch_server, tmp_path):
+        """이미 제출된 작업 파일로 재시작 시 재제출하지 않는지 테스트"""
+        job_path = str(tmp_path / "job.jsonl")
+        batch = GeminiBatch(client, job_path=job_path)
+        batch.add("3:title", "prompt")
+        batch.submit()
+
+        resumed = GeminiBatch(client, job_path=job_path)
+        assert resumed.batch_name == "batches/test-1"
+
+        results = resumed.wait(poll_interval=0)
+        assert results == {"3:title": "PROMPT"}
+        assert batch_server.state['submits'] == 1
+
+        with pytest.raises(RuntimeError):
+            resumed.add("4:title", "late prompt")
+
+
+class TestPipelineBatch:
+
+
+    def run(self, client, tmp_path, **kwargs):
+        craw = MagicMock()
+        craw.get_page_content.return_value = "<html><p>Batch article body</p></html>"
+        craw.links_from_html.return_value = ["/news/1", "/news/2"]
+        s3 = URLDatabase(db_path=str(tmp_path / "urls.db"))
+        ghost_client = MagicMock()
+        pipeline = app.Pipeline(s3=s3, craw=craw, ai=client, image=MagicMock(), ghost_client=ghost_client)
+        target = {"ctr": "t1", "url": "https://news.example/list", "pattern": {"content": "p"}, "list_pattern": "a"}
+
+        pipeline.run_batch([target], job_path=str(tmp_path / "job.jsonl"), poll_interval=0, **kwargs)
+        return s3, ghost_client
+
+
+    def test_publishes_results(self, client, batch_server, tmp_path):
+        """배치 결과가 기사별로 게시되고 URL 이 수집 완료로 남는지 테스트"""
+        s3, ghost_client = self.run(client, tmp_path)
+
+        assert ghost_client.create_post.call_count == 2
+        assert [row["uripath"] for row in s3.read()] == ["/news/1", "/news/2"]
+
+
+    def test_failed_batch_releases_urls(self, client, batch_server, tmp_path):
+        """배치가 실패하면 예외 없이 URL 표시를 되돌려 다음 실행에서 다시 수집되는지 테스트"""
+        batch_server.state['fail'] = True
+        s3, ghost_client = self.run(client, tmp_path)
+
+        assert not ghost_client.create_post.called
+        assert s3.read() == []
+
+
+    def test_stuck_batch_releases_urls_and_resumes(self, client, batch_server, tmp_path, capsys):
+        """배치가 기한 안에 끝나지 않으면 URL 표시를 되돌리고, 나중에 작업 파일로 이어서 게시할 수 있는지 테스트"""
+        batch_server.state['running'] = True
+        s3, ghost_client = self.run(client, tmp_path, timeout=0)
+
+        assert not ghost_client.create_post.called
+        assert s3.read() == []
+        assert f"Resume with --batch-job {tmp_path / 'job.jsonl'}" in capsys.readouterr().out
+
+        batch_server.state['running'] = False
+        s3, ghost_client = self.run(client, tmp_path)
+
+        assert batch_server.state['submits'] == 1
+        assert ghost_client.create_post.call_count == 2
+        assert [row["uripath"] for row in s3.read()] == ["/news/1", "/news/2"]
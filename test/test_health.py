@@ -0,0 +1,167 @@
+import pytest
+from unittest.mock import MagicMock
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app
+from health import TargetHealth
+
+
+@pytest.fixture
+def health(tmp_path):
+    return TargetHealth(db_path=str(tmp_path / "health.db"), failure_threshold=3, probe_base=60, probe_max=300)
+
+
+def quarantined_for(health, ctr):
+    row = next(row for row in health.report() if row["ctr"] == ctr)
+    return row["quarantined_until"] - row["updated_at"]
+
+
+class TestTargetHealth:
+
+    def test_quarantine_after_consecutive_failures(self, health):
+        """연속 실패가 임계값에 도달하면 타겟이 격리되는지 테스트"""
+        assert health.record_listing("us1", url="https://a.example/", links=0) is False
+        assert health.record_article("us1", extracted=False) is False
+        assert health.is_available("us1")
+
+        assert health.record_listing("us1", fetched=False) is True
+        assert not health.is_available("us1")
+        assert health.is_available("us1", now=10**12)
+        assert health.is_available("unknown")
+
+
+    def test_success_resets_streak(self, health):
+        """성공이 연속 실패 횟수를 초기화하는지 테스트"""
+        health.record_article("us1", extracted=False)
+        health.record_article("us1", extracted=False)
+        health.record_article("us1")
+        health.record_article("us1", extracted=False)
+
+        assert health.is_available("us1")
+        assert health.report()[0]["consecutive_failures"] == 1
+
+
+    def test_listing_success_keeps_article_streak(self, health):
+        """목록 성공이 기사 추출 실패의 연속 횟수를 초기화하지 않아, 기사 셀렉터가 깨진 타겟도 격리되는지 테스트"""
+        assert health.record_listing("us1", links=20) is False
+        assert health.record_article("us1", extracted=False) is False
+        assert health.record_listing("us1", links=20) is False
+        assert health.record_article("us1", extracted=False) is False
+        assert health.record_listing("us1", links=20) is False
+        assert health.record_article("us1", extracted=False) is True
+        assert not health.is_available("us1")
+
+        # The re-probe's listing is fine, but only a good article releases the target
+        health.record_listing("us1", links=20)
+        assert health.report()[0]["quarantine_count"] == 1
+        assert health.record_article("us1", extracted=False) is True
+        health.record_listing("us1", links=20)
+        health.record_article("us1")
+        row = health.report()[0]
+        assert (row["quarantine_count"], row["consecutive_failures"], row["article_failures"]) == (0, 0, 0)
+
+
+    def test_listing_success_clears_listing_failures(self, health):
+        """목록 성공은 목록 실패만 연속 횟수에서 지우는지 테스트"""
+        health.record_listing("us1", fetched=False)
+        health.record_article("us1", extracted=False)
+        health.record_listing("us1", fetched=False)
+        health.record_listing("us1", links=5)
+
+        assert health.report()[0]["consecutive_failures"] == 1
+
+
+    def test_migrates_old_database(self, tmp_path):
+        """article_failures 열이 없던 기존 DB에 열을 추가하는지 테스트"""
+        import sqlite3
+        path = str(tmp_path / "old.db")
+        TargetHealth(db_path=path).record_listing("us1", links=0)
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.execute("ALTER TABLE target_health DROP COLUMN article_failures")
+        conn.close()
+
+        health = TargetHealth(db_path=path)
+        health.record_article("us1", extracted=False)
+        row = health.report()[0]
+        assert (row["consecutive_failures"], row["article_failures"]) == (2, 1)
+
+
+    def test_reprobe_backoff_and_recovery(self, health):
+        """재시도에서 다시 실패하면 격리 기간이 두 배가 되고, 성공하면 해제되는지 테스트"""
+        for _ in range(3):
+            health.record_listing("us1", links=0)
+        assert quarantined_for(health, "us1") == pytest.approx(60)
+
+        # On probation a single failure is enough
+        assert health.record_listing("us1", links=0) is True
+        assert quarantined_for(health, "us1") == pytest.approx(120)
+        for _ in range(3):
+            health.record_listing("us1", links=0)
+        assert quarantined_for(health, "us1") == pytest.approx(300)
+
+        health.record_listing("us1", links=5)
+        row = health.report()[0]
+        assert health.is_available("us1")
+        assert (row["quarantine_count"], row["consecutive_failures"]) == (0, 0)
+
+
+    def test_release(self, health):
+        """수동 해제가 격리를 해제하는지 테스트"""
+        for _ in range(3):
+            health.record_listing("us1", fetched=False)
+
+        assert health.release("us1") is True
+        assert health.is_available("us1")
+        assert health.release("missing") is False
+
+
+    def test_report_rates(self, health):
+        """오류율과 추출 수율이 계산되는지 테스트"""
+        health.record_listing("us1", url="https://a.example/", links=4)
+        health.record_article("us1")
+        health.record_article("us1", extracted=False)
+        health.record_article("us1", fetched=False)
+
+        row = health.report()[0]
+        assert row["url"] == "https://a.example/"
+        assert row["links_found"] == 4
+        assert row["error_rate"] == pytest.approx(1 / 4)
+        assert row["yield"] == pytest.approx(1 / 3)
+        assert row["last_error"] == "article fetch failed"
+
+
+class TestPipelineHealth:
+
+    def make_pipeline(self, health, html):
+        craw = MagicMock()
+        craw.get_page_content.return_value = html
+        ai = MagicMock()
+        ai.extract_fields.return_value = {"title": "Title", "content": ""}
+        return app.Pipeline(s3=MagicMock(), craw=craw, ai=ai, image=MagicMock(),
+                            ghost_client=MagicMock(), outbox=MagicMock(), health=health)
+
+
+    def test_empty_content_skips_gemini(self, health):
+        """본문이 비어 있으면 Gemini를 호출하지 않고 실패로 기록하는지 테스트"""
+        pipeline = self.make_pipeline(health, "<html></html>")
+
+        assert pipeline.process_article("https://a.example/a/1", {"content": "div"}, ctr="us1") is False
+
+        pipeline.ai.get_text_response.assert_not_called()
+        assert health.report()[0]["empty_extractions"] == 1
+
+
+    def test_quarantined_target_skipped(self, health):
+        """격리된 타겟은 목록 페이지를 가져오지 않는지 테스트"""
+        for _ in range(3):
+            health.record_listing("us1", fetched=False)
+        pipeline = self.make_pipeline(health, "")
+        target = {"ctr": "us1", "url": "https://a.example/", "list_pattern": ["li"], "pattern": {"content": "div"}}
+
+        pipeline.run_interactive([target])
+
+        pipeline.craw.get_page_content.assert_not_called()
@@ -0,0 +1,90 @@
+import pytest
+from unittest.mock import Mock
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from image_pool import ImagePool
+
+
+TOPICS = {
+    "security": ["cybersecurity", "hacker"],
+    "cloud": ["cloud computing", "data center"],
+    "technology": ["technology"],
+}
+
+
+@pytest.fixture
+def api():
+    api = Mock()
+    api.quota_low.return_value = False
+    api.search_photos.side_effect = lambda query, per_page, page: [{"id": f"{query}-{i}"} for i in range(3)]
+    api.get_random_photos.side_effect = lambda count, keyword: [{"id": f"{keyword}-{i}"} for i in range(3)]
+    return api
+
+
+@pytest.fixture
+def pool(api, tmp_path):
+    return ImagePool(api=api, topics=TOPICS, path=str(tmp_path / "pool.json"),
+                     target_size=5, low_water=2, reuse_window=3)
+
+
+
+
+class TestImagePool:
+
+
+    def test_cluster_for(self, pool):
+        """키워드를 토픽 클러스터로 매핑하는 기능 테스트"""
+        assert pool.cluster_for("Cybersecurity, Ransomware") == "security"
+        assert pool.cluster_for("Cloud computing, Data center, Hacker") == "cloud"
+        assert pool.cluster_for("Electric scooter") == "technology"
+
+
+    def test_take_without_network(self, pool, api):
+        """네트워크 호출 없이 풀에서 사진을 꺼내는지 테스트"""
+        pool.add("security", [{"id": "a"}, {"id": "b"}, {"id": "a"}])
+
+        assert pool.take("cybersecurity")["id"] == "a"
+        assert pool.take("cybersecurity")["id"] == "b"
+        assert pool.take("cybersecurity") == {}
+        api.search_photos.assert_not_called()
+        api.get_random_photos.assert_not_called()
+
+
+    def test_reuse_window(self, pool):
+        """재사용 윈도우 안의 사진은 다시 풀에 들어가지 않는지 테스트"""
+        pool.add("cloud", [{"id": "x"}])
+        pool.take("cloud")
+
+        assert pool.add("cloud", [{"id": "x"}, {"id": "y"}]) == 1
+        for photo_id in ("y", "p", "q"):
+            pool.add("cloud", [{"id": photo_id}])
+            pool.take("cloud")
+
+        # 윈도우(3개)를 벗어난 x 는 다시 사용 가능
+        assert pool.add("cloud", [{"id": "x"}]) == 1
+
+
+    def test_refill_and_persist(self, pool, api, tmp_path):
+        """리필 후 저장된 풀을 다시 불러오는지 테스트"""
+        added = pool.refill()
+        assert added > 0
+        assert all(size >= 2 for size in pool.sizes().values())
+
+        taken = pool.take("hacker")
+        pool.save()
+
+        reloaded = ImagePool(api=api, topics=TOPICS, path=str(tmp_path / "pool.json"),
+                             target_size=5, low_water=2, reuse_window=3)
+        assert reloaded.sizes() == pool.sizes()
+        assert taken["id"] in reloaded.recent
+
+
+    def test_refill_stops_when_quota_low(self, pool, api):
+        """quota 가 낮으면 리필하지 않는지 테스트"""
+        api.quota_low.return_value = True
+
+        assert pool.refill() == 0
+        api.search_photos.assert_not_called()
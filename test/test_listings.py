@@ -0,0 +1,182 @@
+import sqlite3
+import pytest
+from unittest.mock import patch, MagicMock
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app
+import targets
+from crawler import WebCrawler
+from google_ai_studio import GeminiClient
+from listings import ListingState, LinkSnapshots
+from store import URLDatabase, Frontier
+
+
+LISTING = "<html><body><ul><li><a href='/a/1'>One</a></li><li><a href='/a/2'>Two</a></li></ul></body></html>"
+
+
+@pytest.fixture
+def state(tmp_path):
+    return ListingState(path=str(tmp_path / "listing_state.json"))
+
+
+class TestListingState:
+
+    def test_exhausted_only_when_unchanged_and_nothing_left(self, state):
+        """모든 링크를 수집한 목록 페이지가 바뀌지 않았을 때만 건너뛰는지 테스트"""
+        assert not state.is_exhausted("us1", LISTING)
+
+        state.update("us1", LISTING, remaining=1)
+        assert not state.is_exhausted("us1", LISTING)
+
+        state.update("us1", LISTING, remaining=0)
+        assert state.is_exhausted("us1", LISTING)
+        assert not state.is_exhausted("us1", LISTING + "<!-- new -->")
+        assert not state.is_exhausted("us1", "")
+
+        assert ListingState(path=state.path).is_exhausted("us1", LISTING)
+
+
+    def test_fetch_new_listings(self, state):
+        """바뀌지 않은 목록은 제외하고, 가져오지 못한 목록은 상태 기록을 위해 남기는지 테스트"""
+        target_urls = [
+            {"ctr": "us1", "url": "https://a.example/"},
+            {"ctr": "us2", "url": "https://b.example/"},
+            {"ctr": "us3", "url": "https://c.example/"},
+        ]
+        pages = {"https://a.example/": LISTING, "https://b.example/": LISTING, "https://c.example/": ""}
+        craw = MagicMock()
+        craw.get_page_content.side_effect = lambda url: pages[url]
+        state.update("us1", LISTING, remaining=0)
+
+        assert app.fetch_new_listings(craw, target_urls, state) == {"us2": (LISTING, None), "us3": ("", None)}
+
+
+    def test_run_interactive_records_remaining_links(self, state):
+        """처리 후 목록에 남은 미수집 링크 수가 기록되는지 테스트"""
+        s3 = MagicMock()
+        s3.read_by_domain_and_path.return_value = {"id": 1}
+        craw = WebCrawler()
+        pipeline = app.Pipeline(s3=s3, craw=craw, ai=MagicMock(), image=MagicMock(),
+                                ghost_client=MagicMock(), listings=state)
+        target = targets.compile_targets([{
+            "ctr": "us1", "url": "https://a.example/", "list_pattern": ["ul"], "pattern": {"content": "div"},
+        }])[0]
+
+        with patch.object(WebCrawler, "get_page_content") as mock_get_page_content:
+            pipeline.run_interactive([target], listing_pages={"us1": (LISTING, None)})
+            mock_get_page_content.assert_not_called()
+
+        assert state.listings["us1"]["remaining"] == 0
+        assert state.is_exhausted("us1", LISTING)
+
+
+class TestFastPath:
+
+    def test_nothing_new_skips_clients(self, tmp_path, monkeypatch):
+        """새 링크도 게시 대기 글도 없으면 Gemini/Ghost 클라이언트를 만들지 않고 끝나는지 테스트"""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(sys, "argv", [
+            "app.py", "--unsplash-access-key", "u", "--google-ai-api-key", "g",
+            "--cms-admin-api-key", "id:00", "--cms-url", "https://blog.example",
+        ])
+        state = ListingState()
+        for target in targets.load_targets():
+            state.update(target["ctr"], LISTING, remaining=0)
+
+        with patch.object(WebCrawler, "get_page_content", return_value=LISTING), \
+                patch.object(GeminiClient, "__init__", side_effect=AssertionError("Gemini client created")):
+            app.main()
+
+        assert not os.path.exists(tmp_path / "unsplash_cache.db")
+
+
+class TestLinkSnapshots:
+
+    def test_diff_finds_new_links(self, tmp_path):
+        """스냅샷과 비교해 새로 나타난 링크만 원래 순서대로 찾는지 테스트"""
+        snapshots = LinkSnapshots(directory=str(tmp_path / "snapshots"))
+        first, snapshot = snapshots.diff("us1", ["https://a.example/1", "https://a.example/2"])
+        assert first == ["https://a.example/1", "https://a.example/2"]
+
+        snapshots.save("us1", snapshot)
+        new_links, snapshot = snapshots.diff("us1", ["https://a.example/3", "https://a.example/1", "https://a.example/0"])
+
+        assert new_links == ["https://a.example/3", "https://a.example/0"]
+        assert list(snapshot) == sorted(snapshot)
+        assert os.path.getsize(snapshots._path("us1")) == 4 + 8 * 2
+        assert os.listdir(snapshots.directory) == ["us1.snap"]
+
+
+class TestFrontier:
+
+    @pytest.fixture
+    def pipeline(self, tmp_path):
+        s3 = URLDatabase(db_path=str(tmp_path / "urls.db"))
+        return app.Pipeline(s3=s3, craw=MagicMock(), ai=MagicMock(), image=MagicMock(), ghost_client=MagicMock(),
+                            frontier=Frontier(s3), snapshots=LinkSnapshots(directory=str(tmp_path / "snapshots")))
+
+
+    def test_only_new_links_are_queued(self, pipeline):
+        """크롤링한 링크는 큐에 넣지 않고, 스냅샷에 있던 링크는 DB를 다시 확인하지 않는지 테스트"""
+        target = {"ctr": "us1", "url": "https://a.example/list/"}
+        pipeline.s3.create(domain="https://a.example", uripath="/a/1")
+
+        assert pipeline.queue_new_links(target, ["/a/1", "/a/2", "a/2", "https://a.example/a/3"]) == 2
+        assert [entry["uripath"] for entry in pipeline.frontier.pending("us1")] == ["/a/2", "/a/3"]
+
+        with patch.object(Frontier, "push", wraps=pipeline.frontier.push) as mock_push:
+            assert pipeline.queue_new_links(target, ["/a/4", "/a/2", "/a/3"]) == 1
+        assert mock_push.call_args[0][1] == [("https://a.example", "/a/4")]
+
+
+    def test_next_link_takes_newest(self, pipeline):
+        """다음 링크가 프런티어에서 가장 최근 링크(목록의 위쪽)이고 큐에서 빠지는지 테스트"""
+        target = {"ctr": "us1", "url": "https://a.example/list/"}
+
+        assert pipeline.next_link(target, ["/a/1", "/a/2"]) == ("https://a.example", "/a/1")
+        assert pipeline.next_link(target, ["/a/1", "/a/2"]) == ("https://a.example", "/a/2")
+        assert pipeline.next_link(target, ["/a/1", "/a/2"]) is None
+        assert pipeline.frontier.count() == 0
+
+
+    def test_frontier_stays_bounded_over_runs(self, pipeline):
+        """실행마다 새 링크가 더 많이 쌓여도 최신 기사부터 처리하고 큐가 상한을 넘지 않으며 오래된 링크는 버리는지 테스트"""
+        pipeline.frontier = Frontier(pipeline.s3, max_pending=5)
+        target = {"ctr": "us1", "url": "https://a.example/list/"}
+
+        listing = []
+        for run in range(10):
+            # 목록 맨 위에 새 기사 3개가 올라온다
+            listing = [f"/a/{run}-{n}" for n in range(3)] + listing
+            assert pipeline.next_link(target, listing[:20]) == ("https://a.example", f"/a/{run}-0")
+            assert pipeline.frontier.count("us1") <= 5
+
+        conn = sqlite3.connect(pipeline.s3.db_path)
+        with conn:
+            conn.execute("UPDATE frontier SET discovered_at = datetime('now', '-8 days')")
+        conn.close()
+        assert pipeline.next_link(target, ["/a/new"] + listing[:19]) == ("https://a.example", "/a/new")
+        assert pipeline.frontier.count("us1") == 0
+
+
+    def test_unparsed_article_is_released(self, pipeline):
+        """파서 워커가 죽어 기사를 파싱하지 못하면 URL 표시를 지우고 다음 실행을 위해 다시 큐에 넣는지 테스트"""
+        from concurrent.futures import Future
+        from concurrent.futures.process import BrokenProcessPool
+
+        failed = Future()
+        failed.set_exception(BrokenProcessPool("worker died"))
+        pipeline.parser = MagicMock()
+        pipeline.parser.article_fields.return_value = failed
+        pipeline.craw.get_page_content.return_value = "<html><body><p>article</p></body></html>"
+        pipeline.find_links = MagicMock(return_value=["/a/1"])
+        target = {"ctr": "us1", "url": "https://a.example/list/", "pattern": {"content": "p"}}
+
+        pipeline.run_interactive([target], listing_pages={"us1": ("<html></html>",)})
+
+        assert pipeline.s3.read_by_domain_and_path("https://a.example", "/a/1") is None
+        assert [entry["uripath"] for entry in pipeline.frontier.pending("us1")] == ["/a/1"]
+        pipeline.ai.get_text_response.assert_not_called()
@@ -0,0 +1,138 @@
+import json
+import pytest
+from unittest.mock import Mock, patch
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import metrics
+from metrics import Metrics
+from crawler import WebCrawler
+
+
+@pytest.fixture
+def registry():
+    """테스트 동안만 활성화되는 전역 레지스트리"""
+    metrics.enable()
+    yield metrics.registry
+    metrics.registry.enabled = False
+    metrics.registry.reset()
+
+
+class TestMetrics:
+
+    def test_disabled_records_nothing(self):
+        """비활성화 상태에서는 아무것도 기록하지 않는지 테스트"""
+        registry = Metrics()
+        registry.inc("fetch_bytes_total", 100, host="example.com")
+        with registry.timer("fetch", host="example.com"):
+            pass
+
+        assert registry.counters == {}
+        assert registry.histograms == {}
+        assert registry.timer("fetch") is registry.timer("parse")
+
+
+    def test_counters_and_histograms(self):
+        """라벨별 카운터 합산과 지연 히스토그램 기록 테스트"""
+        registry = Metrics(enabled=True)
+        registry.inc("fetch_bytes_total", 100, host="a.example")
+        registry.inc("fetch_bytes_total", 50, host="a.example")
+        registry.inc("fetch_bytes_total", 10, host="b.example")
+        for seconds in (0.02, 0.03, 0.2, 3.0):
+            registry.observe("stage_seconds", seconds, stage="fetch")
+
+        summary = registry.summary()
+        assert {"name": "fetch_bytes_total", "labels": {"host": "a.example"}, "value": 150} in summary["counters"]
+        histogram = summary["histograms"][0]
+        assert histogram["labels"] == {"stage": "fetch"}
+        assert histogram["count"] == 4
+        assert histogram["p50"] == 0.05
+        assert histogram["p99"] == 3.0
+
+
+    def test_prometheus_textfile(self, tmp_path):
+        """Prometheus 텍스트 형식으로 원자적으로 기록되는지 테스트"""
+        registry = Metrics(enabled=True)
+        registry.inc("retries_total", stage="fetch", host="a.example")
+        registry.observe("stage_seconds", 0.3, stage="gemini")
+
+        path = tmp_path / "pipeline.prom"
+        registry.write(str(path))
+        text = path.read_text()
+
+        assert "# TYPE retries_total counter" in text
+        assert 'retries_total{host="a.example",stage="fetch"} 1' in text
+        assert 'stage_seconds_bucket{stage="gemini",le="0.25"} 0' in text
+        assert 'stage_seconds_bucket{stage="gemini",le="0.5"} 1' in text
+        assert 'stage_seconds_bucket{stage="gemini",le="+Inf"} 1' in text
+        assert 'stage_seconds_count{stage="gemini"} 1' in text
+        assert not os.path.exists(f"{path}.tmp")
+
+
+    def test_json_summary(self, tmp_path):
+        """.prom 이외의 경로에는 JSON 요약이 기록되는지 테스트"""
+        registry = Metrics(enabled=True)
+        registry.inc("cache_requests_total", cache="unsplash_search", result="hit")
+
+        path = tmp_path / "run.json"
+        registry.write(str(path))
+
+        summary = json.loads(path.read_text())
+        assert summary["counters"][0]["value"] == 1
+
+
+    @patch('requests.get')
+    def test_crawler_instrumentation(self, mock_get, registry):
+        """크롤러가 호스트별 응답 수, 바이트 수, 재시도, 소요 시간을 기록하는지 테스트"""
+        throttled = Mock(status_code=503)
+        ok = Mock(status_code=200, text="<html>ok</html>", content=b"<html>ok</html>")
+        mock_get.side_effect = [throttled, ok]
+
+        crawler = WebCrawler(retry_delay=0)
+        assert crawler.get_page_content("https://news.example/a") == "<html>ok</html>"
+
+        counters = {(entry["name"], tuple(sorted(entry["labels"].items()))): entry["value"]
+                    for entry in registry.summary()["counters"]}
+        assert counters[("fetch_bytes_total", (("host", "news.example"),))] == 15
+        assert counters[("retries_total", (("host", "news.example"), ("stage", "fetch")))] == 1
+        assert counters[("http_responses_total", (("host", "news.example"), ("stage", "fetch"), ("status", "503")))] == 1
+        assert registry.summary()["histograms"][0]["labels"] == {"host": "news.example", "stage": "fetch"}
+
+
+    def test_parse_stage_covers_soup(self, registry, tmp_path):
+        """파서 풀 없이도 parse 단계가 BeautifulSoup 파싱을 포함하고, 재처리에서는 article 단계 안에서 파싱하는지 테스트"""
+        import app
+        import extraction
+        from google_ai_studio import GeminiClient
+        from store import URLDatabase
+
+        open_stages = []
+        stages_at_parse = []
+        listener = lambda stage, labels, started: open_stages.append(stage) if started else open_stages.remove(stage)
+        soup = extraction.BeautifulSoup
+
+        def parse(*args, **kwargs):
+            stages_at_parse.append(list(open_stages))
+            return soup(*args, **kwargs)
+
+        craw = Mock()
+        craw.get_page_content.return_value = "<html><body><article><p>" + "text " * 50 + "</p></article></body></html>"
+        pipeline = app.Pipeline(s3=URLDatabase(db_path=str(tmp_path / "urls.db")), craw=craw, ai=GeminiClient(api_key=""),
+                                image=Mock(), ghost_client=Mock())
+        pipeline.generate_article = Mock(return_value=("Title", "Content", "keyword"))
+        pipeline.publish_article = Mock()
+        target = {"ctr": "us1", "url": "https://news.example/", "pattern": {"content": "article"}}
+
+        metrics.stage_listeners.append(listener)
+        try:
+            with patch.object(extraction, "BeautifulSoup", side_effect=parse):
+                assert pipeline.extract_article("https://news.example/a", target["pattern"], ctr="us1")
+                assert pipeline.refresh([target], ["https://news.example/b"]) == 1
+        finally:
+            metrics.stage_listeners.remove(listener)
+
+        assert stages_at_parse == [["parse"], ["article", "parse"]]
+        parse_stage = [entry for entry in registry.summary()["histograms"] if entry["labels"]["stage"] == "parse"]
+        assert sum(entry["count"] for entry in parse_stage) == 2
@@ -0,0 +1,201 @@
+import pytest
+import requests
+from unittest.mock import MagicMock, Mock
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app
+from outbox import Outbox, Publisher, slug_for, content_hash
+
+
+SOURCE_URL = "https://news.example/articles/1"
+
+
+def make_response(status_code, body=None, headers=None):
+    response = Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.text = ""
+    response.json.return_value = body or {}
+    return response
+
+
+@pytest.fixture
+def posts(tmp_path):
+    return Outbox(db_path=str(tmp_path / "outbox.db"))
+
+
+@pytest.fixture
+def client():
+    client = Mock()
+    client.find_post_by_canonical_url.return_value = None
+    return client
+
+
+@pytest.fixture
+def publisher(client, posts):
+    # 재시도 대기 시간을 0 으로 만들어 테스트를 빠르게 한다
+    return Publisher(client=client, outbox=posts, max_workers=2, max_attempts=3, backoff_base=0, backoff_max=0)
+
+
+
+
+class TestOutbox:
+
+
+    def test_slug_is_stable(self):
+        """같은 원문 URL 은 항상 같은 slug 를 만드는지 테스트"""
+        assert slug_for(SOURCE_URL) == slug_for(SOURCE_URL)
+        assert slug_for(SOURCE_URL) != slug_for(SOURCE_URL + "?page=2")
+
+
+    def test_enqueue_is_idempotent(self, posts):
+        """같은 글을 두 번 넣어도 한 번만 저장되는지 테스트"""
+        assert posts.enqueue(SOURCE_URL, {"posts": [{"title": "a"}]})
+        assert not posts.enqueue(SOURCE_URL, {"posts": [{"title": "b"}]})
+        assert posts.counts() == {"pending": 1}
+
+
+    def test_upsert(self, posts):
+        """원문 해시가 같으면 아무것도 하지 않고 다르면 갱신으로 다시 대기시키는지 테스트"""
+        digest = content_hash("-title : A\n-content : body")
+
+        assert posts.upsert(SOURCE_URL, {"posts": [{"title": "a"}]}, digest) == "created"
+        assert posts.upsert(SOURCE_URL, {"posts": [{"title": "b"}]}, content_hash("-title : A  \n-content :   body")) == "unchanged"
+        assert posts.stored_hash(SOURCE_URL) == digest
+
+        item = posts.claim_due(limit=10)[0]
+        posts.mark_published(item["id"], "post-1")
+
+        assert posts.upsert(SOURCE_URL, {"posts": [{"title": "c"}]}, content_hash("changed")) == "updated"
+        item = posts.claim_due(limit=10)[0]
+        assert item["post_id"] == "post-1"
+        assert item["attempts"] == 1
+        assert item["post_data"] == {"posts": [{"title": "c"}]}
+
+
+    def test_recover_after_crash(self, posts):
+        """발행 중 중단된 항목을 다시 대기 상태로 돌리는지 테스트"""
+        posts.enqueue(SOURCE_URL, {"posts": [{}]})
+        assert len(posts.claim_due(limit=10)) == 1
+        assert posts.claim_due(limit=10) == []
+
+        assert posts.recover() == 1
+        assert posts.claim_due(limit=10)[0]["attempts"] == 2
+
+
+    def test_set_payload_only_while_pending(self, posts):
+        """발행이 시작되기 전의 글만 내용을 바꿀 수 있는지 테스트"""
+        posts.enqueue(SOURCE_URL, {"posts": [{"title": "a"}]})
+        assert posts.set_payload(SOURCE_URL, {"posts": [{"title": "a", "feature_image": "x"}]})
+
+        item = posts.claim_due(limit=10)[0]
+        assert item["post_data"] == {"posts": [{"title": "a", "feature_image": "x"}]}
+        assert not posts.set_payload(SOURCE_URL, {"posts": [{"title": "b"}]})
+
+
+    def test_post_is_queued_before_image_stage(self, posts):
+        """이미지 단계가 실패해도 생성된 글이 이미지 없이 outbox 에 저장되는지 테스트"""
+        ghost_client = Mock()
+        ghost_client.build_post_data.side_effect = lambda **post: {"posts": [post]}
+        image = MagicMock()
+        image.search_random_photo.side_effect = requests.ConnectionError("unsplash down")
+        pipeline = app.Pipeline(s3=Mock(), craw=Mock(), ai=Mock(), image=image, ghost_client=ghost_client, outbox=posts)
+
+        pipeline.publish_article(SOURCE_URL, "Title", "<p>body</p>", "keyword", source_hash=content_hash("body"))
+
+        item = posts.claim_due(limit=10)[0]
+        assert item["post_data"]["posts"][0]["title"] == "Title"
+        assert "head_image_data" not in item["post_data"]["posts"][0]
+
+
+    def test_image_is_attached_to_queued_post(self, posts):
+        """이미지 단계가 성공하면 대기 중인 글에 이미지가 붙는지 테스트"""
+        ghost_client = Mock()
+        ghost_client.build_post_data.side_effect = lambda **post: {"posts": [post]}
+        image = MagicMock()
+        image.search_random_photo.side_effect = lambda **kwargs: (
+            {"url": "https://images.example/1"} if posts.counts() == {"pending": 1} else {})
+        pipeline = app.Pipeline(s3=Mock(), craw=Mock(), ai=Mock(), image=image, ghost_client=ghost_client, outbox=posts)
+
+        pipeline.publish_article(SOURCE_URL, "Title", "<p>body</p>", "keyword")
+
+        item = posts.claim_due(limit=10)[0]
+        assert item["post_data"]["posts"][0]["head_image_data"] == {"url": "https://images.example/1"}
+
+
+
+
+class TestPublisher:
+
+
+    def test_retries_5xx_then_publishes(self, publisher, posts, client):
+        """5xx 응답 후 재시도하여 발행하는지 테스트"""
+        posts.enqueue(SOURCE_URL, {"posts": [{"title": "t"}]})
+        client.send_post.side_effect = [
+            make_response(503),
+            make_response(201, {"posts": [{"id": "post-1", "title": "t"}]}),
+        ]
+
+        assert publisher.drain(timeout=5) == 1
+        assert posts.counts() == {"published": 1}
+        assert client.send_post.call_count == 2
+
+
+    def test_retry_does_not_duplicate(self, publisher, posts, client):
+        """이전 시도가 이미 발행된 경우 원문 URL 조회로 중복 발행을 막는지 테스트"""
+        posts.enqueue(SOURCE_URL, {"posts": [{"title": "t"}]})
+        client.send_post.side_effect = requests.ConnectionError("timeout after send")
+        client.find_post_by_canonical_url.return_value = {"id": "post-1"}
+
+        assert publisher.drain(timeout=5) == 0
+        assert posts.counts() == {"published": 1}
+        assert client.send_post.call_count == 1
+        client.find_post_by_canonical_url.assert_called_once_with(SOURCE_URL)
+
+
+    def test_update_uses_put_with_updated_at(self, publisher, posts, client):
+        """이미 발행된 글의 원문이 바뀌면 PUT 으로 갱신하는지 테스트"""
+        posts.upsert(SOURCE_URL, {"posts": [{"title": "t"}]}, content_hash("v1"))
+        client.send_post.return_value = make_response(201, {"posts": [{"id": "post-1", "title": "t"}]})
+        publisher.drain(timeout=5)
+
+        posts.upsert(SOURCE_URL, {"posts": [{"title": "t2"}]}, content_hash("v2"))
+        client.find_post_by_canonical_url.return_value = {"id": "post-1", "updated_at": "2025-01-01T00:00:00.000Z"}
+        client.update_post.return_value = make_response(200, {"posts": [{"id": "post-1", "title": "t2"}]})
+
+        assert publisher.drain(timeout=5) == 1
+        client.update_post.assert_called_once_with("post-1", {"posts": [{"title": "t2"}]}, "2025-01-01T00:00:00.000Z")
+        assert client.send_post.call_count == 1
+        assert posts.counts() == {"published": 1}
+
+
+    def test_client_errors_fail_without_retry(self, publisher, posts, client):
+        """4xx 오류는 재시도하지 않고 실패 처리하는지 테스트"""
+        posts.enqueue(SOURCE_URL, {"posts": [{"title": "t"}]})
+        client.send_post.return_value = make_response(422)
+
+        publisher.drain(timeout=5)
+        assert posts.counts() == {"failed": 1}
+        assert client.send_post.call_count == 1
+
+
+    def test_gives_up_after_max_attempts(self, publisher, posts, client):
+        """최대 시도 횟수 후 실패 처리하는지 테스트"""
+        posts.enqueue(SOURCE_URL, {"posts": [{"title": "t"}]})
+        client.send_post.return_value = make_response(429, headers={"Retry-After": "0"})
+
+        publisher.drain(timeout=5)
+        assert posts.counts() == {"failed": 1}
+        assert client.send_post.call_count == 3
+
+
+    def test_backoff(self, client, posts):
+        """Retry-After 와 지수 백오프 계산 테스트"""
+        publisher = Publisher(client=client, outbox=posts, backoff_base=2, backoff_max=60)
+
+        assert publisher.backoff(1, retry_after="7") == 7
+        assert 8 <= publisher.backoff(4) <= 16
+        assert publisher.backoff(20) == 60
@@ -0,0 +1,75 @@
+import pytest
+from unittest.mock import MagicMock
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app
+from benchmarks import corpus
+from crawler import parse_links
+from google_ai_studio import GeminiClient
+from parsing import ParserPool
+from targets import load_targets
+
+
+TARGETS = load_targets()
+
+
+@pytest.fixture(scope="module")
+def parser():
+    pool = ParserPool(workers=2, max_tasks_per_child=6)
+    yield pool
+    pool.close()
+
+
+class TestParserPool:
+
+    def test_matches_in_process_parsing(self, parser):
+        """워커 프로세스의 추출 결과가 같은 프로세스에서 파싱한 결과와 같은지 테스트 (워커 교체 포함)"""
+        client = GeminiClient(api_key="")
+        fields = [(target, parser.article_fields(target["ctr"], corpus.load(target["ctr"], "article"))) for target in TARGETS]
+        links = [(target, parser.listing_links(target["ctr"], corpus.load(target["ctr"], "listing"))) for target in TARGETS]
+
+        for target, future in fields:
+            assert future.result(timeout=60) == client.extract_fields(corpus.load(target["ctr"], "article"), target["pattern"])
+        for target, future in links:
+            assert future.result(timeout=60) == parse_links(corpus.load(target["ctr"], "listing"), target["list_pattern"])
+
+
+    def test_unknown_target_fails(self, parser):
+        """워커가 모르는 타겟의 페이지는 예외로 돌려주는지 테스트"""
+        with pytest.raises(KeyError):
+            parser.article_fields("missing", "<html></html>").result(timeout=60)
+
+
+    def test_pipeline_extracts_in_order(self, parser):
+        """파이프라인이 미리 여러 기사를 파싱에 넘기면서도 입력 순서대로 결과를 돌려주는지 테스트"""
+        target = TARGETS[0]
+        pages = {f"https://a.example/{n}": corpus.load(target["ctr"], "article") if n % 3 else "" for n in range(8)}
+        craw = MagicMock()
+        craw.get_page_content.side_effect = lambda url: pages[url]
+        pipeline = app.Pipeline(s3=MagicMock(), craw=craw, ai=GeminiClient(api_key=""), image=MagicMock(),
+                                ghost_client=MagicMock(), parser=parser)
+
+        results = list(pipeline.extract_articles((url, target["pattern"], target["ctr"]) for url in pages))
+
+        assert [article[0] for article, _ in results] == list(pages)
+        assert [bool(extracted) for _, extracted in results] == [bool(html) for html in pages.values()]
+        assert results[1][1] == pipeline.extract_article("https://a.example/1", target["pattern"])
+
+
+    def test_pipeline_continues_after_parse_error(self, parser):
+        """워커에서 파싱이 실패한 기사는 건너뛰고 나머지 기사는 계속 추출하는지 테스트"""
+        target = TARGETS[0]
+        craw = MagicMock()
+        craw.get_page_content.return_value = corpus.load(target["ctr"], "article")
+        pipeline = app.Pipeline(s3=MagicMock(), craw=craw, ai=GeminiClient(api_key=""), image=MagicMock(),
+                                ghost_client=MagicMock(), parser=parser)
+
+        articles = [("https://a.example/0", target["pattern"], "missing"), ("https://a.example/1", target["pattern"], target["ctr"])]
+        results = [extracted for _, extracted in pipeline.extract_articles(articles)]
+
+        assert results[0] == ""
+        assert results[1] == pipeline.extract_article("https://a.example/1", target["pattern"], target["ctr"])
+        assert pipeline.extract_article("https://a.example/0", target["pattern"], "missing") is None
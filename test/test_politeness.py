@@ -0,0 +1,143 @@
+import pytest
+from unittest.mock import patch, Mock
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from crawler import WebCrawler
+from politeness import Politeness, TokenBucket, parse_retry_after
+
+
+ROBOTS = """
+User-agent: *
+Disallow: /private/
+Crawl-delay: 4
+"""
+
+
+def response(status, text="", headers=None):
+    mock_response = Mock()
+    mock_response.status_code = status
+    mock_response.text = text
+    mock_response.content = text.encode("utf-8")
+    mock_response.headers = headers or {}
+    return mock_response
+
+
+@pytest.fixture
+def polite():
+    politeness = Politeness(rate=10, burst=1, breaker_threshold=3, breaker_cooldown=60, backoff_base=0)
+    # The test hosts have no robots.txt, which allows everything
+    with patch('requests.get', return_value=response(404)):
+        for host in ("a.example", "b.example"):
+            politeness.robots(f"https://{host}/")
+    return politeness
+
+
+class TestPoliteness:
+
+    def test_token_bucket(self):
+        """토큰 버킷이 버스트 이후 요청을 rate에 맞춰 대기시키는지 테스트"""
+        bucket = TokenBucket(rate=2, burst=2)
+        now = bucket.updated
+
+        assert bucket.reserve(now) == 0
+        assert bucket.reserve(now) == 0
+        assert bucket.reserve(now) == pytest.approx(0.5)
+        assert bucket.reserve(now) == pytest.approx(1.0)
+        assert bucket.reserve(now + 10) == 0
+
+
+    def test_parse_retry_after(self):
+        """Retry-After 헤더(초, HTTP 날짜)를 해석하는지 테스트"""
+        assert parse_retry_after("7") == 7
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+        assert parse_retry_after("soon") is None
+        assert parse_retry_after(None) is None
+
+
+    def test_circuit_breaker(self, polite):
+        """연속 실패 후 회로가 열려 즉시 실패하고, 쿨다운 후 한 번의 시험 요청만 허용하는지 테스트"""
+        url = "https://a.example/a/1"
+        for _ in range(3):
+            assert polite.acquire(url)
+            polite.record(url, 503)
+
+        assert polite.is_open(url)
+        assert not polite.acquire(url)
+        assert polite.acquire("https://b.example/a/1")
+
+        polite._hosts["a.example"].open_until = 1
+        assert polite.acquire(url)
+        assert not polite.acquire(url)
+
+        polite.record(url, 200)
+        assert polite.acquire(url)
+        assert not polite.is_open(url)
+
+
+    def test_failed_trial_reopens(self, polite):
+        """시험 요청이 실패하면 회로가 다시 열리는지 테스트"""
+        url = "https://a.example/a/1"
+        for _ in range(3):
+            polite.record(url)
+        polite._hosts["a.example"].open_until = 1
+
+        assert polite.acquire(url)
+        polite.record(url, 502)
+        assert polite.is_open(url)
+
+
+    def test_long_retry_after_skips_host(self, polite):
+        """max_wait보다 긴 Retry-After를 받은 호스트는 대기하지 않고 건너뛰는지 테스트"""
+        url = "https://a.example/a/1"
+        polite.record(url, 429, retry_after="3600")
+
+        assert not polite.acquire(url)
+
+
+    @patch('requests.get', return_value=response(200, ROBOTS))
+    def test_robots_rules_and_crawl_delay(self, mock_get):
+        """robots.txt가 호스트당 한 번만 요청되고, Disallow와 Crawl-delay가 적용되는지 테스트"""
+        polite = Politeness(rate=10)
+
+        assert not polite.acquire("https://a.example/private/page")
+        assert polite.acquire("https://a.example/a/1")
+        assert polite._hosts["a.example"].bucket.rate == pytest.approx(0.25)
+        mock_get.assert_called_once()
+        assert mock_get.call_args[0][0] == "https://a.example/robots.txt"
+
+
+    @patch('requests.get', return_value=response(503))
+    def test_robots_server_error_disallows(self, mock_get):
+        """robots.txt가 서버 오류이면 해당 호스트를 수집하지 않는지 테스트"""
+        assert not Politeness().acquire("https://a.example/a/1")
+
+
+class TestPoliteCrawler:
+
+    @patch('requests.get')
+    def test_disallowed_url_not_fetched(self, mock_get):
+        """robots.txt가 막은 URL은 요청하지 않는지 테스트"""
+        mock_get.return_value = response(200, ROBOTS)
+
+        crawler = WebCrawler(politeness=Politeness())
+        assert crawler.get_page_content("https://a.example/private/page") == ""
+        assert [call.args[0] for call in mock_get.call_args_list] == ["https://a.example/robots.txt"]
+
+
+    @patch('time.sleep')
+    @patch('requests.get')
+    def test_retry_after_honoured(self, mock_get, mock_sleep, polite):
+        """Retry-After 값만큼 기다린 후 재시도하는지 테스트"""
+        mock_get.side_effect = [response(429, headers={"Retry-After": "5"}), response(200, "ok")]
+
+        crawler = WebCrawler(politeness=polite)
+        assert crawler.get_page_content("https://a.example/a/1") == "ok"
+        assert any(call.args[0] == pytest.approx(5, abs=0.5) for call in mock_sleep.call_args_list)
+
+        mock_sleep.reset_mock()
+        mock_get.side_effect = [response(503, headers={"Retry-After": "3"}), response(200, "ok")]
+        assert WebCrawler().get_page_content("https://a.example/a/1") == "ok"
+        mock_sleep.assert_called_once_with(3.0)
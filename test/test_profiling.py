@@ -0,0 +1,74 @@
+import pytest
+import threading
+import tracemalloc
+from unittest.mock import patch
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import metrics
+from profiling import Profiler
+
+
+def busy_parse(size):
+    """파싱 단계를 흉내내며 CPU와 메모리를 사용"""
+    with metrics.timer("parse", host="news.example"):
+        nodes = [{"tag": "p", "text": "x" * 100} for _ in range(size)]
+        return sum(len(node["text"]) for node in nodes)
+
+
+class TestProfiler:
+
+    def test_profile_run_outputs(self, tmp_path):
+        """단계별 스택 샘플(folded)과 메모리 피크 보고서가 기록되는지 테스트"""
+        profiler = Profiler(output_dir=str(tmp_path), interval=0.001, snapshots_per_stage=1)
+        profiler.start()
+        try:
+            with metrics.timer("article", host="news.example"):
+                for _ in range(5):
+                    busy_parse(5000)
+        finally:
+            run_dir = profiler.stop()
+
+        with open(os.path.join(run_dir, "cpu.folded"), encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        assert any(line.startswith("[parse];") and "busy_parse (test_profiling.py" in line for line in lines)
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+        with open(os.path.join(run_dir, "memory.txt"), encoding="utf-8") as f:
+            report = f.read()
+        assert "  parse " in report
+        assert "news.example" in report
+        assert "Top allocation sites during parse call 1" in report
+
+        peaks = profiler.stage_peaks
+        assert len(peaks["parse"]) == 5
+        # The article spans every parse call, so its peak is at least the largest of them
+        assert peaks["article"][0] >= max(peaks["parse"]) > 0
+
+
+    def test_stop_unhooks_stage_listener(self, tmp_path):
+        """프로파일러 종료 후 메트릭 타이머가 다시 no-op이 되는지 테스트"""
+        profiler = Profiler(output_dir=str(tmp_path), memory=False)
+        profiler.start()
+        assert metrics.timer("parse") is not metrics.timer("fetch")
+        profiler.stop()
+
+        assert metrics.stage_listeners == []
+        assert metrics.timer("parse") is metrics.timer("fetch")
+        assert not os.path.exists(os.path.join(tmp_path, os.listdir(tmp_path)[0], "memory.txt"))
+
+
+    def test_missing_keys_leave_no_profiler_running(self, tmp_path):
+        """API 키가 없어 일찍 종료하는 실행이 샘플러 스레드와 tracemalloc 을 남기지 않는지 테스트"""
+        import app
+
+        threads = set(threading.enumerate())
+        with patch.object(sys, "argv", ["app.py", "--profile", "--profile-dir", str(tmp_path)]):
+            with pytest.raises(SystemExit):
+                app.main()
+
+        assert not tracemalloc.is_tracing()
+        assert metrics.stage_listeners == []
+        assert set(threading.enumerate()) == threads
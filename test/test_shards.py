@@ -0,0 +1,62 @@
+import os
+import pytest
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from shards import Shard
+from store import URLDatabase
+
+
+TARGETS = [{"ctr": f"t{n}", "url": f"https://site{n}.example/news/"} for n in range(200)]
+
+
+class TestShard:
+
+    def test_parse(self):
+        """"I/N" 형식을 해석하고 범위를 벗어난 값은 거부하는지 테스트"""
+        shard = Shard.parse("1/4")
+        assert (shard.index, shard.count, shard.state_dir) == (1, 4, "shard-1-of-4")
+        assert Shard().state_dir == "."
+
+        for value in ("4/4", "1", "-1/4", "a/b", "0/0"):
+            with pytest.raises(ValueError):
+                Shard.parse(value)
+
+
+    def test_targets_are_partitioned(self):
+        """모든 타겟이 정확히 하나의 샤드에 배정되고, 같은 호스트의 타겟은 같은 샤드에 배정되는지 테스트"""
+        targets = TARGETS + [{"ctr": "t0b", "url": "https://site0.example/other/"}]
+        selected = [Shard(index, 4).select(targets) for index in range(4)]
+
+        assert sorted(target["ctr"] for part in selected for target in part) == sorted(target["ctr"] for target in targets)
+        assert all(30 <= len(part) <= 70 for part in selected)
+        assert len({Shard(0, 4).owner(Shard.target_key(target)) for target in targets[:1] + targets[-1:]}) == 1
+
+
+    def test_adding_a_shard_only_moves_targets_to_it(self):
+        """샤드를 하나 늘리면 일부 타겟만, 그것도 새 샤드로만 옮겨지는지 테스트"""
+        before = {target["ctr"]: Shard(0, 4).owner(Shard.target_key(target)) for target in TARGETS}
+        after = {target["ctr"]: Shard(0, 5).owner(Shard.target_key(target)) for target in TARGETS}
+
+        moved = [ctr for ctr in before if before[ctr] != after[ctr]]
+        assert all(after[ctr] == 4 for ctr in moved)
+        assert 20 <= len(moved) <= 60
+
+
+    def test_merge_url_databases(self, tmp_path):
+        """샤드별 URL DB를 합치면 중복 없이 모이고, 다시 합쳐도 변하지 않는지 테스트"""
+        first = URLDatabase(db_path=str(tmp_path / "first.db"))
+        second = URLDatabase(db_path=str(tmp_path / "second.db"))
+        first.create("https://a.example", "/1")
+        second.create("https://a.example", "/1")
+        second.create("https://b.example", "/2")
+
+        merged = URLDatabase(db_path=str(tmp_path / "merged.db"))
+        assert merged.merge(first.db_path) == 1
+        assert merged.merge(second.db_path) == 1
+        assert merged.merge(second.db_path) == 0
+        assert [(row["domain"], row["uripath"]) for row in merged.read()] == [("https://a.example", "/1"), ("https://b.example", "/2")]
+
+        with pytest.raises(FileNotFoundError):
+            merged.merge(str(tmp_path / "missing.db"))
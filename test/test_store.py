@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import pytest
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from store import URLDatabase, Frontier, url_hash
+
+
+@pytest.fixture
+def urls(tmp_path):
+    return URLDatabase(db_path=str(tmp_path / "urls.db"))
+
+
+def age(db, uripath, days):
+    conn = sqlite3.connect(db.db_path)
+    with conn:
+        conn.execute("UPDATE urls SET created_at = datetime('now', ?) WHERE uripath = ?", (f"-{days} days", uripath))
+    conn.close()
+
+
+class TestURLDatabase:
+
+    def test_migrates_old_layout(self, tmp_path):
+        """url_hash가 없던 기존 DB를 id를 유지한 채 해시 키 구조로 옮기는지 테스트"""
+        path = str(tmp_path / "old.db")
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.execute("""CREATE TABLE urls (id INTEGER PRIMARY KEY AUTOINCREMENT, domain TEXT NOT NULL,
+                            uripath TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, UNIQUE(domain, uripath))""")
+            conn.execute("INSERT INTO urls (id, domain, uripath) VALUES (7, 'https://a.example', '/news/1')")
+        conn.close()
+
+        db = URLDatabase(db_path=path)
+
+        assert db.read_by_domain_and_path("https://a.example", "/news/1")["id"] == 7
+        assert db.read_by_domain_and_path("https://a.example", "/news/1")["url_hash"] == url_hash("https://a.example", "/news/1")
+        assert db.create("https://a.example", "/news/2") == 8
+        assert [row["id"] for row in db.search("news")] == [7, 8]
+        with pytest.raises(sqlite3.IntegrityError):
+            db.create("https://a.example", "/news/1")
+
+
+    def test_search(self, urls):
+        """검색이 도메인과 경로의 부분 문자열을 대소문자 구분 없이 찾는지 테스트 (짧은 검색어 포함)"""
+        urls.create("https://a.example", "/news/Articles/4242.html")
+        urls.create("https://b.example", "/blog/1.html")
+        url_id = urls.create("https://c.example", "/x")
+
+        assert urls.fts
+        assert [row["domain"] for row in urls.search("articles/42")] == ["https://a.example"]
+        assert [row["domain"] for row in urls.search("b.exa")] == ["https://b.example"]
+        assert [row["domain"] for row in urls.search("/x")] == ["https://c.example"]
+        assert urls.search('"quoted"') == []
+
+        urls.update(url_id, uripath="/renamed")
+        assert urls.search("/x") == [] and len(urls.search("renamed")) == 1
+        assert urls.read_by_domain_and_path("https://c.example", "/renamed")["id"] == url_id
+
+
+    def test_compact_archives_old_entries(self, urls, tmp_path):
+        """오래된 항목은 아카이브 DB로 옮겨지고, 해시만 남아 여전히 수집한 URL로 취급되는지 테스트"""
+        urls.create("https://a.example", "/old")
+        urls.create("https://a.example", "/new")
+        age(urls, "/old", 40)
+        archive_path = str(tmp_path / "archive.db")
+
+        assert urls.compact(30, archive_path=archive_path) == 1
+
+        assert [row["uripath"] for row in urls.read()] == ["/new"]
+        assert urls.read_by_domain_and_path("https://a.example", "/old")["id"] is None
+        assert urls.search("old") == []
+        conn = sqlite3.connect(archive_path)
+        assert conn.execute("SELECT domain, uripath FROM urls").fetchall() == [("https://a.example", "/old")]
+        conn.close()
+
+        frontier = Frontier(urls)
+        assert frontier.push("us1", [("https://a.example", "/old"), ("https://a.example", "/new"), ("https://a.example", "/next")]) == 1
+        assert urls.compact(30, archive_path=archive_path) == 0
+
+
+    def test_failed_merge_keeps_connection_usable(self, urls, tmp_path):
+        """공유 연결에서 병합이 실패해도 트랜잭션이 롤백되고 DB가 분리되어 이후 호출이 동작하는지 테스트"""
+        broken = str(tmp_path / "broken.db")
+        conn = sqlite3.connect(broken)
+        with conn:
+            conn.execute("CREATE TABLE other_table (x)")
+        conn.close()
+
+        with pytest.raises(sqlite3.OperationalError):
+            urls.merge(broken)
+
+        assert urls.create("https://a.example", "/after") == 1
+        assert urls.read_by_domain_and_path("https://a.example", "/after")["id"] == 1
+        urls.close()
+        assert urls.read_by_domain_and_path("https://a.example", "/after")["id"] == 1
@@ -0,0 +1,137 @@
+import json
+import os
+import pytest
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import targets
+from targets import TargetConfigError, compile_targets, load_targets
+from crawler import WebCrawler
+from google_ai_studio import GeminiClient
+
+
+VALID_TARGET = {
+    "ctr": "us1",
+    "url": "https://news.example/list/",
+    "list_pattern": ["ul.articles li", "#top-stories"],
+    "pattern": {"title": "h1.headline", "content": "div.article-body"},
+}
+
+HTML = """
+<html><body>
+    <h1 class="headline">Headline</h1>
+    <div class="article-body">Body text</div>
+    <ul class="articles"><li><a href="/a/1">One</a></li><li><a href="/a/2">Two</a></li></ul>
+    <div id="top-stories"><a href="/a/3">Three</a></div>
+</body></html>
+"""
+
+
+def write_targets(path, content):
+    path.write_text(json.dumps(content), encoding="utf-8")
+    return str(path)
+
+
+class TestTargets:
+
+    def test_repository_targets_compile(self):
+        """저장소의 targeturl_base.json이 검증 및 컴파일되는지 테스트"""
+        compiled = load_targets()
+
+        assert len(compiled) > 0
+        for target in compiled:
+            assert all(not isinstance(selector, str) for selector in target["list_pattern"])
+            assert "content" in target["pattern"]
+
+
+    def test_invalid_selector_reported_at_load(self, tmp_path):
+        """잘못된 셀렉터가 추출 시점이 아니라 로드 시점에 보고되고, 그 타겟만 빠지는지 테스트"""
+        broken = {**VALID_TARGET, "pattern": {"title": "h1[", "content": "div.article-body"}}
+        unknown = {**VALID_TARGET, "ctr": "us3", "lst_pattern": []}
+        path = write_targets(tmp_path / "targets.json", [broken, {**VALID_TARGET, "ctr": "us2"}, unknown])
+
+        problems = []
+        loaded = load_targets(path, problems=problems)
+
+        assert [target["ctr"] for target in loaded] == ["us2"]
+        assert len(problems) == 2
+        assert "target 0 (us1) pattern.title: invalid selector 'h1['" in problems[0]
+        assert problems[1] == 'target 2 (us3): unknown key "lst_pattern"'
+
+        # 캐시된 결과를 써도 문제는 다시 보고된다
+        again = []
+        assert load_targets(path, problems=again) is loaded
+        assert again == problems
+
+
+    def test_selectors_compiled_later(self, tmp_path):
+        """compile=False 로 로드하면 셀렉터를 문자열로 두고, compile_selectors 에서 컴파일 및 검증하는지 테스트"""
+        broken = {**VALID_TARGET, "ctr": "us2", "list_pattern": ["ul["]}
+        path = write_targets(tmp_path / "targets.json", [VALID_TARGET, broken])
+
+        loaded = load_targets(path, compile=False)
+        assert [target["list_pattern"] for target in loaded] == [VALID_TARGET["list_pattern"], ["ul["]]
+
+        problems = []
+        compiled = targets.compile_selectors(loaded, problems=problems)
+        assert [target["ctr"] for target in compiled] == ["us1"]
+        assert targets.selector_text(compiled[0]["pattern"]["content"]) == "div.article-body"
+        assert problems[0].startswith("target us2 list_pattern[0]: invalid selector 'ul['")
+
+
+    def test_schema_problems_are_all_listed(self):
+        """ctr 중복처럼 파일 전체의 오류가 있으면 로드가 실패하고, 모든 오류가 한 번에 보고되는지 테스트"""
+        raw = [
+            VALID_TARGET,
+            {**VALID_TARGET, "url": "ftp://news.example/", "lst_pattern": [], "feed_url": "/rss.xml"},
+            {"ctr": "us2", "url": "https://b.example/", "list_pattern": [], "pattern": {"title": "h1"}},
+        ]
+
+        with pytest.raises(TargetConfigError) as error:
+            compile_targets(raw)
+
+        assert error.value.problems == [
+            'target 1 (us1): unknown key "lst_pattern"',
+            'target 1 (us1): duplicate ctr "us1"',
+            "target 1 (us1): \"url\" must be an http(s) URL, got 'ftp://news.example/'",
+            "target 1 (us1): \"feed_url\" must be an http(s) URL, got '/rss.xml'",
+            'target 2 (us2): "list_pattern" must be a non-empty list of selectors',
+            'target 2 (us2): "pattern" has no "content" selector',
+        ]
+
+
+    def test_cache_invalidated_by_mtime(self, tmp_path):
+        """파일이 바뀌지 않으면 컴파일 결과를 재사용하고, 바뀌면 다시 로드하는지 테스트"""
+        path = write_targets(tmp_path / "targets.json", [VALID_TARGET])
+
+        first = load_targets(path)
+        assert load_targets(path) is first
+
+        write_targets(tmp_path / "targets.json", [VALID_TARGET, {**VALID_TARGET, "ctr": "us2"}])
+        os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000))
+
+        second = load_targets(path)
+        assert second is not first
+        assert [target["ctr"] for target in second] == ["us1", "us2"]
+
+
+    def test_missing_file(self, tmp_path):
+        """설정 파일이 없으면 TargetConfigError가 발생하는지 테스트"""
+        with pytest.raises(TargetConfigError):
+            load_targets(str(tmp_path / "missing.json"))
+
+
+    @patch.object(WebCrawler, 'get_page_content', return_value=HTML)
+    def test_extractors_accept_compiled_selectors(self, mock_get_page_content):
+        """크롤러와 본문 추출이 컴파일된 셀렉터로 문자열과 같은 결과를 내는지 테스트"""
+        compiled = compile_targets([VALID_TARGET])[0]
+        crawler = WebCrawler()
+        client = GeminiClient(api_key="")
+
+        assert crawler.extract_links(compiled["url"], compiled["list_pattern"]) == \
+            crawler.extract_links(VALID_TARGET["url"], VALID_TARGET["list_pattern"]) == ["/a/1", "/a/2", "/a/3"]
+        assert client.format_extracted(HTML, compiled["pattern"]) == \
+            client.format_extracted(HTML, VALID_TARGET["pattern"]) == "-title : Headline\n-content : Body text\n"
+        assert targets.selector_text(compiled["pattern"]["title"]) == "h1.headline"
@@ -0,0 +1,153 @@
+import pytest
+import time
+from unittest.mock import patch, Mock
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from unsplash import UnsplashAPI, RateLimitQuota
+from search_cache import SearchCache
+
+
+def make_response(results, status_code=200, remaining=None):
+    response = Mock()
+    response.status_code = status_code
+    response.headers = {} if remaining is None else {"X-Ratelimit-Remaining": str(remaining), "X-Ratelimit-Limit": "50"}
+    response.json.return_value = {"results": results}
+    return response
+
+
+def make_photo(photo_id):
+    return {
+        "id": photo_id,
+        "urls": {"regular": f"https://images.example/{photo_id}"},
+        "user": {"name": "tester", "links": {"html": "https://unsplash.com/@tester"}},
+    }
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """임시 파일을 사용하는 검색 캐시"""
+    return SearchCache(db_path=str(tmp_path / "cache.db"), ttl=100, max_entries=2)
+
+
+@pytest.fixture
+def api(cache, monkeypatch):
+    # 프로세스 공유 quota 를 테스트마다 새로 만든다
+    monkeypatch.setattr(UnsplashAPI, "quota", RateLimitQuota())
+    return UnsplashAPI(access_key="test", cache=cache, quota_reserve=2)
+
+
+
+
+class TestSearchCache:
+
+
+    def test_normalize(self):
+        """키워드 정규화 테스트 (소문자, 정렬, 중복 제거)"""
+        assert SearchCache.normalize("Cybersecurity, Cloud  computing") == "cloud computing,cybersecurity"
+        assert SearchCache.normalize("cloud computing,CYBERSECURITY,cybersecurity") == "cloud computing,cybersecurity"
+        assert SearchCache.normalize(" , ") == ""
+
+
+    def test_ttl_expiry(self, cache):
+        """TTL 만료 테스트"""
+        cache.put("Cloud", [{"id": "a"}])
+        assert cache.get("cloud")["results"] == [{"id": "a"}]
+
+        with patch("search_cache.time.time", return_value=time.time() + 101):
+            assert cache.get("cloud") is None
+            assert cache.get("cloud", allow_stale=True)["results"] == [{"id": "a"}]
+
+
+    def test_size_bounded_eviction(self, cache):
+        """최대 개수 초과 시 가장 오래 사용되지 않은 항목 제거 테스트"""
+        cache.put("a", [])
+        time.sleep(0.01)
+        cache.put("b", [])
+        time.sleep(0.01)
+        cache.get("a")
+        time.sleep(0.01)
+        cache.put("c", [])
+
+        assert len(cache) == 2
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+
+
+
+
+class TestUnsplashAPI:
+
+
+    def test_search_random_photo_uses_cache(self, api):
+        """같은 키워드 집합은 한 번만 요청하는지 테스트"""
+        mock_response = make_response([make_photo("p1"), make_photo("p2")])
+
+        with patch.object(api.session, "get", return_value=mock_response) as mock_get:
+            first = api.search_random_photo("Cloud, AI", per_page=16)
+            second = api.search_random_photo("ai,cloud", per_page=16)
+
+        assert mock_get.call_count == 1
+        assert mock_get.call_args.kwargs["params"]["per_page"] == 30
+        assert first["id"] in ("p1", "p2")
+        assert second["id"] in ("p1", "p2")
+
+
+    def test_search_random_photo_refreshes_near_expiry(self, api, cache):
+        """만료 직전 항목은 캐시로 응답하고 백그라운드에서 갱신하는지 테스트"""
+        cache.put("cloud", [make_photo("old") | {"url": "old"}])
+
+        mock_response = make_response([make_photo("new")])
+
+        with patch("search_cache.time.time", return_value=time.time() + 90), \
+                patch.object(api.session, "get", return_value=mock_response):
+            photo = api.search_random_photo("cloud")
+            for thread in __import__("threading").enumerate():
+                if thread.name.startswith("unsplash-refresh-"):
+                    thread.join()
+
+        assert photo["id"] == "old"
+        assert cache.get("cloud", allow_stale=True)["results"][0]["id"] == "new"
+
+
+    def test_quota_tracked_from_headers(self, api):
+        """응답 헤더로 quota 를 추적하는지 테스트"""
+        with patch.object(api.session, "get", return_value=make_response([], remaining=10)):
+            api.search_photos("cloud")
+
+        assert UnsplashAPI.quota.snapshot()["remaining"] == 10
+        assert UnsplashAPI.quota.snapshot()["limit"] == 50
+        assert not api.quota_low()
+
+
+    def test_exhausted_quota_degrades_to_stale_cache(self, api, cache):
+        """quota 소진 시 예외 대신 만료된 캐시로 응답하는지 테스트"""
+        cache.put("cloud", [make_photo("cached")])
+
+        with patch.object(api.session, "get", return_value=make_response([], status_code=403, remaining=0)):
+            assert api.search_random_photo("unknown keyword") == {}
+
+        with patch("search_cache.time.time", return_value=time.time() + 1000), \
+                patch.object(api.session, "get") as mock_get:
+            photo = api.search_random_photo("cloud")
+            assert api.search_random_photo("other") == {}
+
+        assert photo["id"] == "cached"
+        mock_get.assert_not_called()
+
+
+    def test_track_download(self, api):
+        """다운로드 추적 엔드포인트를 호출하고 파일 URL을 돌려주는지 테스트"""
+        mock_response = make_response([])
+        mock_response.json.return_value = {"url": "https://images.example/p1?ixid=1"}
+
+        with patch.object(api.session, "get", return_value=mock_response) as mock_get:
+            assert api.track_download("p1") == "https://images.example/p1?ixid=1"
+        assert mock_get.call_args.args[0] == f"{api.base_url}photos/p1/download"
+
+        mock_response.json.return_value = {}
+        with patch.object(api.session, "get", return_value=mock_response):
+            with pytest.raises(ValueError):
+                api.track_download("p1")
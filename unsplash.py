@@ -1,20 +1,103 @@
 import requests
 import os
+import random
+import threading
+import time
 from typing import List, Dict, Any, Optional
 
+import metrics
+from search_cache import SearchCache
+from downloads import stream_to_file
+
+
+class QuotaExceededError(requests.RequestException):
+    """Raised when the Unsplash hourly request quota is used up."""
+
+
+class RateLimitQuota:
+    """
+    Process-wide view of the Unsplash hourly quota, fed by X-Ratelimit-* response headers.
+    
+    Unsplash reports the remaining requests of a rolling one-hour window, so a
+    reading older than the window says nothing and is treated as unknown.
+    """
+    WINDOW = 3600
+    
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.updated_at: float = 0.0
+        self._lock = threading.Lock()
+    
+    def update(self, headers) -> None:
+        """
+        Record the quota reported by a response.
+        
+        Args:
+            headers: Response headers (case-insensitive mapping)
+        """
+        remaining = headers.get("X-Ratelimit-Remaining")
+        limit = headers.get("X-Ratelimit-Limit")
+        if remaining is None:
+            return
+        
+        with self._lock:
+            try:
+                self.remaining = int(remaining)
+                if limit is not None:
+                    self.limit = int(limit)
+            except ValueError:
+                return
+            self.updated_at = time.time()
+    
+    def mark_exhausted(self) -> None:
+        """Record that the API refused a request for exceeding the quota."""
+        with self._lock:
+            self.remaining = 0
+            self.updated_at = time.time()
+    
+    def current(self) -> Optional[int]:
+        """Return the last known remaining request count, or None if unknown or stale."""
+        with self._lock:
+            if self.remaining is None or time.time() - self.updated_at > self.WINDOW:
+                return None
+            return self.remaining
+    
+    def is_exhausted(self) -> bool:
+        """Return True if no requests are left in the current window."""
+        return self.current() == 0
+    
+    def is_low(self, reserve: int) -> bool:
+        """Return True if at most reserve requests are left in the current window."""
+        remaining = self.current()
+        return remaining is not None and remaining <= reserve
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the quota state as a dict for logging or the pipeline."""
+        return {"limit": self.limit, "remaining": self.current(), "updated_at": self.updated_at}
+
+
 class UnsplashAPI:
     """
     A class to interact with the Unsplash API for fetching images based on keywords.
     """
     BASE_URL = "https://api.unsplash.com/"
     
-    def __init__(self, access_key: str, secret_key: str = None):
+    # Shared by every client in the process, since they all draw from the same hourly quota
+    quota = RateLimitQuota()
+    
+    def __init__(self, access_key: str, secret_key: str = None, cache: Optional[SearchCache] = None,
+                 quota_reserve: int = 5, base_url: Optional[str] = None):
         """
         Initialize the UnsplashAPI with your access key and optional secret key.
         
         Args:
             access_key: Your Unsplash API access key (Client ID)
             secret_key: Your Unsplash API secret key (for OAuth authentication)
+            cache: Optional keyword search cache used by search_random_photo
+            quota_reserve: Remaining requests at or below which the quota counts as low;
+                background refreshes stop and stale cache entries are preferred
+            base_url: Override for the API root (e.g. a local stand-in server)
         """
         self.access_key = access_key
         self.secret_key = secret_key
@@ -23,6 +106,70 @@ class UnsplashAPI:
             "Accept-Version": "v1"
         }
         self.oauth_token = None
+        self.base_url = (base_url or self.BASE_URL).rstrip("/") + "/"
+        self.cache = cache
+        self.quota_reserve = quota_reserve
+        self.session = requests.Session()
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+    
+    @staticmethod
+    def _photo_info(photo: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Convert a photo object from the API into the compact dict used by callers.
+        
+        Args:
+            photo: Photo object as returned by the Unsplash API
+            
+        Returns:
+            Dict containing image information (URL, author, download link, etc.)
+        """
+        return {
+            "id": photo.get("id"),
+            "description": photo.get("description"),
+            "alt_description": photo.get("alt_description"),
+            "url": photo.get("urls", {}).get("regular"),
+            "small_url": photo.get("urls", {}).get("small"),
+            "thumb_url": photo.get("urls", {}).get("thumb"),
+            "download_url": photo.get("links", {}).get("download"),
+            "user": photo.get("user", {}).get("name"),
+            "user_profile": photo.get("user", {}).get("links", {}).get("html")
+        }
+    
+    def _get(self, endpoint: str, params: Dict[str, Any] = None) -> requests.Response:
+        """
+        Send an authenticated GET request over the pooled session.
+        
+        Args:
+            endpoint: Full endpoint URL
+            params: Query parameters
+            
+        Returns:
+            The successful response
+            
+        Raises:
+            QuotaExceededError: If the hourly quota is used up; no request is sent
+                while the quota is known to be exhausted
+        """
+        if self.quota.is_exhausted():
+            raise QuotaExceededError("Unsplash hourly quota exhausted")
+        
+        with metrics.timer("unsplash"):
+            response = self.session.get(endpoint, headers=self.headers, params=params)
+        metrics.inc("http_responses_total", stage="unsplash", status=response.status_code)
+        self.quota.update(response.headers)
+        
+        # Unsplash answers 403 "Rate Limit Exceeded" (or 429) once the quota is gone
+        if response.status_code == 429 or (response.status_code == 403 and self.quota.current() == 0):
+            self.quota.mark_exhausted()
+            raise QuotaExceededError("Unsplash hourly quota exhausted", response=response)
+        
+        response.raise_for_status()
+        return response
+    
+    def quota_low(self) -> bool:
+        """Return True if the shared hourly quota is at or below the reserve."""
+        return self.quota.is_low(self.quota_reserve)
         
     def search_single_photo(self, keyword: str) -> Dict[str, Any]:
         """
@@ -34,37 +181,35 @@ class UnsplashAPI:
         Returns:
             Dict containing image information (URL, author, download link, etc.)
         """
-        endpoint = f"{self.BASE_URL}search/photos"
+        endpoint = f"{self.base_url}search/photos"
         params = {
             "query": keyword,
             "per_page": 1
         }
         
-        response = requests.get(endpoint, headers=self.headers, params=params)
-        response.raise_for_status()
+        response = self._get(endpoint, params=params)
         
         results = response.json().get("results", [])
         if not results:
             return {}
         
         photo = results[0]
-        return {
-            "id": photo.get("id"),
-            "description": photo.get("description"),
-            "alt_description": photo.get("alt_description"),
-            "url": photo.get("urls", {}).get("regular"),
-            "small_url": photo.get("urls", {}).get("small"),
-            "thumb_url": photo.get("urls", {}).get("thumb"),
-            "download_url": photo.get("links", {}).get("download"),
-            "user": photo.get("user", {}).get("name"),
-            "user_profile": photo.get("user", {}).get("links", {}).get("html")
-        }
+        return self._photo_info(photo)
         
         
     def search_random_photo(self, keyword: str, per_page: int = 30) -> Dict[str, Any]:
         """
         Search for photos based on keyword and return a random one from the results.
         
+        With a cache configured, results are served from the cache and only
+        fetched on a miss; entries close to expiry are refreshed in the
+        background while the cached results are still used.
+        
+        When the hourly quota is low, expired cache entries are served
+        instead of spending a request, and when it is exhausted the search
+        returns whatever the cache has (or an empty dict) instead of raising,
+        so the caller can publish without an image or defer the image stage.
+        
         Args:
             keyword: The search term
             per_page: Number of photos to search from before selecting random one (default: 30)
@@ -72,35 +217,69 @@ class UnsplashAPI:
         Returns:
             Dict containing random image information from the search results
         """
-        import random
-        
-        endpoint = f"{self.BASE_URL}search/photos"
-        params = {
-            "query": keyword,
-            "per_page": min(per_page, 30)  # Limit to 30 as that's a reasonable number
-        }
-        
-        response = requests.get(endpoint, headers=self.headers, params=params)
-        response.raise_for_status()
+        try:
+            if self.cache is None:
+                results = self._search_results(keyword, per_page=per_page)
+            else:
+                results = self._cached_search_results(keyword)[:min(per_page, 30)]
+        except QuotaExceededError:
+            print(f"Unsplash quota exhausted, no image for '{keyword}'")
+            return {}
         
-        results = response.json().get("results", [])
         if not results:
             return {}
         
         # Choose a random photo from results
-        photo = random.choice(results)
-        
-        return {
-            "id": photo.get("id"),
-            "description": photo.get("description"),
-            "alt_description": photo.get("alt_description"),
-            "url": photo.get("urls", {}).get("regular"),
-            "small_url": photo.get("urls", {}).get("small"),
-            "thumb_url": photo.get("urls", {}).get("thumb"),
-            "download_url": photo.get("links", {}).get("download"),
-            "user": photo.get("user", {}).get("name"),
-            "user_profile": photo.get("user", {}).get("links", {}).get("html")
+        return random.choice(results)
+    
+    def _cached_search_results(self, keyword: str) -> List[Dict[str, Any]]:
+        """Return search results through the cache, degrading to stale entries when quota is low."""
+        low = self.quota_low()
+        entry = self.cache.get(keyword, allow_stale=low)
+        
+        if entry is None:
+            metrics.inc("cache_requests_total", cache="unsplash_search", result="miss")
+            # Always fill the cache with a full page; it costs the same single request
+            results = self._search_results(keyword, per_page=30)
+            self.cache.put(keyword, results)
+            return results
+        
+        metrics.inc("cache_requests_total", cache="unsplash_search",
+                    result="stale" if entry["expires_at"] <= time.time() else "hit")
+        if not low and self.cache.needs_refresh(entry):
+            self._refresh_in_background(keyword)
+        return entry["results"]
+    
+    def _search_results(self, keyword: str, per_page: int = 30) -> List[Dict[str, Any]]:
+        """Fetch one page of search results as photo info dicts."""
+        endpoint = f"{self.base_url}search/photos"
+        params = {
+            "query": keyword,
+            "per_page": min(per_page, 30)  # Limit to 30 as that's a reasonable number
         }
+        
+        response = self._get(endpoint, params=params)
+        return [self._photo_info(photo) for photo in response.json().get("results", [])]
+    
+    def _refresh_in_background(self, keyword: str) -> None:
+        """Re-fetch a cached keyword on a worker thread, at most one refresh per key at a time."""
+        key = self.cache.normalize(keyword)
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        
+        def refresh():
+            try:
+                self.cache.put(keyword, self._search_results(keyword, per_page=30))
+            except requests.RequestException as e:
+                print(f"Background refresh failed for '{keyword}': {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+        
+        # Not a daemon thread: a short cron run waits for the refresh instead of dropping it
+        threading.Thread(target=refresh, name=f"unsplash-refresh-{key}").start()
     
     
     
@@ -116,31 +295,20 @@ class UnsplashAPI:
         Returns:
             List of dictionaries containing image information
         """
-        endpoint = f"{self.BASE_URL}search/photos"
+        endpoint = f"{self.base_url}search/photos"
         params = {
             "query": keyword,
             "per_page": per_page,
             "page": page
         }
         
-        response = requests.get(endpoint, headers=self.headers, params=params)
-        response.raise_for_status()
+        response = self._get(endpoint, params=params)
         
         results = response.json().get("results", [])
         photos_info = []
         
         for photo in results:
-            photos_info.append({
-                "id": photo.get("id"),
-                "description": photo.get("description"),
-                "alt_description": photo.get("alt_description"),
-                "url": photo.get("urls", {}).get("regular"),
-                "small_url": photo.get("urls", {}).get("small"),
-                "thumb_url": photo.get("urls", {}).get("thumb"),
-                "download_url": photo.get("links", {}).get("download"),
-                "user": photo.get("user", {}).get("name"),
-                "user_profile": photo.get("user", {}).get("links", {}).get("html")
-            })
+            photos_info.append(self._photo_info(photo))
         
         return photos_info
     
@@ -154,27 +322,16 @@ class UnsplashAPI:
         Returns:
             Dict containing image information
         """
-        endpoint = f"{self.BASE_URL}photos/random"
+        endpoint = f"{self.base_url}photos/random"
         params = {}
         
         if keyword:
             params["query"] = keyword
             
-        response = requests.get(endpoint, headers=self.headers, params=params)
-        response.raise_for_status()
+        response = self._get(endpoint, params=params)
         
         photo = response.json()
-        return {
-            "id": photo.get("id"),
-            "description": photo.get("description"),
-            "alt_description": photo.get("alt_description"),
-            "url": photo.get("urls", {}).get("regular"),
-            "small_url": photo.get("urls", {}).get("small"),
-            "thumb_url": photo.get("urls", {}).get("thumb"),
-            "download_url": photo.get("links", {}).get("download"),
-            "user": photo.get("user", {}).get("name"),
-            "user_profile": photo.get("user", {}).get("links", {}).get("html")
-        }
+        return self._photo_info(photo)
     
     def get_random_photos(self, count: int = 3, keyword: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -187,65 +344,69 @@ class UnsplashAPI:
         Returns:
             List of dictionaries containing image information
         """
-        endpoint = f"{self.BASE_URL}photos/random"
+        endpoint = f"{self.base_url}photos/random"
         params = {"count": min(count, 30)}  # Unsplash API limits to 30
         
         if keyword:
             params["query"] = keyword
             
-        response = requests.get(endpoint, headers=self.headers, params=params)
-        response.raise_for_status()
+        response = self._get(endpoint, params=params)
         
         photos = response.json()
         photos_info = []
         
         for photo in photos:
-            photos_info.append({
-                "id": photo.get("id"),
-                "description": photo.get("description"),
-                "alt_description": photo.get("alt_description"),
-                "url": photo.get("urls", {}).get("regular"),
-                "small_url": photo.get("urls", {}).get("small"),
-                "thumb_url": photo.get("urls", {}).get("thumb"),
-                "download_url": photo.get("links", {}).get("download"),
-                "user": photo.get("user", {}).get("name"),
-                "user_profile": photo.get("user", {}).get("links", {}).get("html")
-            })
+            photos_info.append(self._photo_info(photo))
         
         return photos_info
     
-    def download_photo(self, photo_id: str, save_path: str) -> str:
+    def track_download(self, photo_id: str) -> str:
         """
-        Download a photo by its ID and save it to disk.
+        Report a download of a photo to Unsplash, as its API guidelines require, and get the file URL.
         
         Args:
             photo_id: The Unsplash photo ID
-            save_path: Directory where to save the image
             
         Returns:
-            Path to the saved image file
+            URL of the image file
+            
+        Raises:
+            ValueError: If the response has no file URL
         """
-        endpoint = f"{self.BASE_URL}photos/{photo_id}/download"
-        
-        response = requests.get(endpoint, headers=self.headers)
-        response.raise_for_status()
-        
+        response = self._get(f"{self.base_url}photos/{photo_id}/download")
         download_url = response.json().get("url")
         if not download_url:
             raise ValueError("Download URL not found")
+        return download_url
+    
+    def download_photo(self, photo_id: str, save_path: str) -> str:
+        """
+        Download a photo by its ID and save it to disk.
         
-        img_response = requests.get(download_url)
-        img_response.raise_for_status()
-        
-        # Make sure directory exists
-        os.makedirs(save_path, exist_ok=True)
+        The image is streamed to disk in chunks and renamed into place once
+        complete; a photo that was already saved is not downloaded again.
+        For a content-addressed cache with concurrent downloads, use
+        downloads.DownloadManager.
         
+        Args:
+            photo_id: The Unsplash photo ID
+            save_path: Directory where to save the image
+            
+        Returns:
+            Path to the saved image file
+        """
         # Get filename from URL or use photo ID
         filename = photo_id + ".jpg"
         file_path = os.path.join(save_path, filename)
         
-        with open(file_path, "wb") as f:
-            f.write(img_response.content)
+        if os.path.exists(file_path):
+            return file_path
+        
+        download_url = self.track_download(photo_id)
+        
+        img_response = self.session.get(download_url, stream=True)
+        img_response.raise_for_status()
+        
+        stream_to_file(img_response, file_path)
             
         return file_path
-